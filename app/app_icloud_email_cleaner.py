@@ -1,40 +1,50 @@
 import re
 from pathlib import Path
 
-import duckdb
 import pandas as pd
 import streamlit as st
-from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from icloud_mail_cleaner.history import RunHistory
+from icloud_mail_cleaner.session_pool import SessionPool
 
 # Assuming the config.ini is in the parent directory of the current script
 CONFIG_FILE = Path(__file__).parent.parent / "config.ini"
 EMAIL_LIST_PATH = "data/target_email_address.txt"
+SESSION_IDLE_TIMEOUT = 600  # seconds before an unused iCloud login is closed
+
+
+@st.cache_resource
+def get_session_pool():
+    """One pool of logged-in iCloud sessions shared by every rerun and user."""
+    return SessionPool(CONFIG_FILE.as_posix(), idle_timeout=SESSION_IDLE_TIMEOUT)
+
+
+@st.cache_data
+def load_email_list(email_list_path):
+    """Cached read of the target list; call `load_email_list.clear()` after edits."""
+    return EmailManager(email_list_path).load_emails()
+
+
+@st.cache_data
+def email_list_frame(email_list_path):
+    return pd.DataFrame(load_email_list(email_list_path), columns=["Email Addresses"])
 
 
 class EmailDatabaseManager:
-    def __init__(self, db_path):
+    """Target list kept in the DuckDB run-history store."""
+
+    def __init__(self, db_path, list_name="default"):
         self.db_path = db_path
-        self.conn = duckdb.connect(db_path)
-        self.initialise_database()
-
-    def initialise_database(self):
-        self.conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS emails (
-                id INTEGER PRIMARY KEY,
-                email TEXT UNIQUE NOT NULL,
-                added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """
-        )
+        self.list_name = list_name
+        self.history = RunHistory(db_path)
+        # Databases written by older versions keep the list in an `emails` table
+        self.history.migrate_legacy_emails(list_name)
 
     def load_emails(self):
-        result = self.conn.execute("SELECT email FROM emails").fetchall()
-        return [email[0] for email in result]
+        return self.history.load_target_list(self.list_name)
 
     def save_emails(self, emails):
-        for email in emails:
-            self.conn.execute("INSERT OR IGNORE INTO emails (email) VALUES (?)", (email,))
+        # One vectorised insert for the whole list, duplicates skipped
+        return self.history.import_target_list(emails, self.list_name)
 
     # Additional methods for cleaning and validating emails would be similar to those in EmailManager
 
@@ -76,6 +86,7 @@ class EmailManager:
 class ICloudEmailCleanerApp:
     def __init__(self, config_file, email_list_path):
         self.config_file = config_file
+        self.email_list_path = str(email_list_path)
         self.email_manager = EmailManager(email_list_path)
         if "username" not in st.session_state:
             st.session_state["username"] = ""
@@ -98,17 +109,16 @@ class ICloudEmailCleanerApp:
         # Proceed with the rest of the app if credentials are provided
         self.display_sidebar()
 
-        # Load emails and display them
-        emails = self.email_manager.load_emails()
-        emails_df = pd.DataFrame(emails, columns=["Email Addresses"])
-        st.write(emails_df)
+        # Load emails and display them (cached across reruns until the list is edited)
+        emails = list(load_email_list(self.email_list_path))
+        st.write(email_list_frame(self.email_list_path))
 
         # Add new email
         new_email = st.text_input("Add a new email address", "")
         if st.button("Add Email"):
             if new_email and new_email not in emails and EmailManager.is_valid_email(new_email):
                 emails.append(new_email)
-                self.email_manager.save_emails(emails)
+                self.save_emails(emails)
                 st.success("Email added successfully.")
                 st.rerun()
             else:
@@ -127,21 +137,25 @@ class ICloudEmailCleanerApp:
         if st.button("Clean iCloud emails"):
             # try:
             # st.write(f"Config file: {CONFIG_FILE.as_posix()}")
-            cleaner = ICloudCleaner(config_file=CONFIG_FILE.as_posix())
-            if cleaner.mode == "app":
-                cleaner.connect(
-                    st.session_state["username"],
-                    st.session_state["password"],
-                    st.session_state["imap_server"],
-                    st.session_state["imap_port"],
+            with get_session_pool().session(
+                st.session_state["username"],
+                st.session_state["password"],
+                st.session_state["imap_server"],
+                st.session_state["imap_port"],
+            ) as cleaner:
+                total_emails_deleted = cleaner.clean_mailbox(
+                    close_mail_app=True, target_emails=emails
                 )
-            else:
-                st.info("Please enter your iCloud details.")
-            total_emails_deleted = cleaner.clean_mailbox(close_mail_app=True, target_emails=emails)
             st.success(f"Total emails deleted: {total_emails_deleted}")
             # except Exception as e:
             #     st.error(f"An error occurred: {e}")
 
+    def save_emails(self, emails):
+        """Persist the list and invalidate the cached copies of it."""
+        self.email_manager.save_emails(emails)
+        load_email_list.clear()
+        email_list_frame.clear()
+
     def display_sidebar(self):
         st.sidebar.header("iCloud Account")
         st.sidebar.text_input("Username", key="username")
@@ -1,10 +1,25 @@
-from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+import asyncio
+import uuid
+
+from icloud_mail_cleaner.budget import RunBudget
+from icloud_mail_cleaner.session_pool import SessionPool
+from starlette.responses import StreamingResponse
 
 from fasthtml.common import *
 
-app, rt = fast_app(debug=True)
+SESSION_IDLE_TIMEOUT = 600  # seconds before an unused iCloud login is closed
+JOB_BUDGET_SECONDS = 300  # a web request cleans for at most this long
+FINISHED_JOB_TTL = 600  # seconds a finished job's results wait for a progress stream
+
+app, rt = fast_app(
+    debug=True,
+    hdrs=(Script(src="https://unpkg.com/htmx-ext-sse@2.2.2/sse.js"),),
+)
 
-cleaner = ICloudCleaner("config.ini", mode="app")
+pool = SessionPool("config.ini", idle_timeout=SESSION_IDLE_TIMEOUT)
+jobs = {}  # job id -> asyncio.Queue of per-sender results, None marks the end;
+# dropped when its progress stream ends, or FINISHED_JOB_TTL after the job ends
+running = set()  # keep references to background tasks until they finish
 
 
 def email_form():
@@ -13,42 +28,100 @@ def email_form():
         Input(type="password", name="password", placeholder="Password"),
         Input(type="text", name="target_emails", placeholder="Target emails (comma-separated)"),
         Button("Clean Emails", type="submit"),
-        action="/clean",
-        method="POST",
+        hx_post="/clean",
+        hx_target="#results",
     )
 
 
-def results_table(results):
-    return Table(*[Tr(Td(email), Td(str(count))) for email, count in results]) + P(
-        f"Total emails deleted: {sum(count for _, count in results)}"
+def result_row(result):
+    errors = "; ".join(result["errors"])
+    return Tr(Td(result["sender"]), Td(str(result["deleted"])), Td(errors))
+
+
+def progress_view(job_id):
+    return Div(
+        Table(Tr(Th("Sender"), Th("Deleted"), Th("Errors")), id="progress-rows"),
+        Div(id="progress-total", sse_swap="done", hx_target="this", hx_swap="innerHTML"),
+        hx_ext="sse",
+        sse_connect=f"/progress/{job_id}",
+        sse_swap="message",
+        hx_target="#progress-rows",
+        hx_swap="beforeend",
+        sse_close="done",
     )
 
 
+def sse_event(element, event="message"):
+    lines = to_xml(element).splitlines() or [""]
+    return f"event: {event}\n" + "".join(f"data: {line}\n" for line in lines) + "\n"
+
+
+async def run_clean_job(job_id, username, password, target_emails):
+    queue = jobs[job_id]
+    loop = asyncio.get_running_loop()
+
+    def publish(result):
+        loop.call_soon_threadsafe(queue.put_nowait, result)
+
+    def clean():
+        # One batched pass over all targets on this user's pooled session
+        with pool.session(username, password) as cleaner:
+            cleaner.clean_mailbox(
+                target_emails=target_emails,
+                close_mail_app=False,
+                on_result=publish,
+                budget=RunBudget(seconds=JOB_BUDGET_SECONDS),
+            )
+            if cleaner.remaining:
+                left = len(cleaner.remaining["senders"])
+                publish({"sender": "(time limit)", "deleted": 0, "errors": [f"{left} senders not checked, run again"]})
+
+    try:
+        await asyncio.to_thread(clean)
+    except Exception as e:
+        await queue.put({"sender": "(job)", "deleted": 0, "errors": [str(e)]})
+    finally:
+        await queue.put(None)
+        # Clients that never open (or drop) the stream must not leak the job
+        loop.call_later(FINISHED_JOB_TTL, jobs.pop, job_id, None)
+
+
 @rt("/")
 def get():
     return Titled("iCloud Email Cleaner", email_form(), Div(id="results"))
 
 
 @rt("/clean")
-def post(username: str, password: str, target_emails: str):
+async def post(username: str, password: str, target_emails: str):
     if not all([username, password, target_emails]):
         return P("Please fill in all fields.")
 
-    target_emails = target_emails.split(",")
-    username = username.replace("@icloud.com", "")    # Keep only the username
+    target_emails = [email.strip() for email in target_emails.split(",") if email.strip()]
+    username = username.replace("@icloud.com", "")  # Keep only the username
 
-    try:
-        cleaner.connect(
-            username, password, cleaner.config["imap_server"], int(cleaner.config["imap_port"])
-        )
-        results = []
-        for email in target_emails:
-            count = cleaner.clean_mailbox(target_emails=[email.strip()])
-            results.append((email.strip(), count))
-
-        return results_table(results)
-    except Exception as e:
-        return P(f"An error occurred: {str(e)}")
+    job_id = uuid.uuid4().hex
+    jobs[job_id] = asyncio.Queue()
+    task = asyncio.create_task(run_clean_job(job_id, username, password, target_emails))
+    running.add(task)
+    task.add_done_callback(running.discard)
+    return progress_view(job_id)
+
+
+@rt("/progress/{job_id}")
+async def get(job_id: str):
+    queue = jobs.get(job_id)
+    if queue is None:
+        return P("Unknown or finished job.")
+
+    async def stream():
+        total = 0
+        while (result := await queue.get()) is not None:
+            total += result["deleted"]
+            yield sse_event(result_row(result))
+        jobs.pop(job_id, None)
+        yield sse_event(P(f"Total emails deleted: {total}"), event="done")
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
 
 
 serve()
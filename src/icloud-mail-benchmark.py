@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+from icloud_mail_cleaner.benchmark import (
+    DEFAULT_SIZES,
+    compare,
+    load_baseline,
+    run_benchmarks,
+    save_baseline,
+    scaling_exponent,
+)
+
+BASELINE_FILE = Path.cwd() / "data" / "benchmark_baseline.json"
+
+# Optional case names to run (default: all), `--max-size=N` to skip larger inputs
+# and `--update` to store this run as the new baseline instead of checking it
+NAMES = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+MAX_SIZE = next(
+    (int(arg.split("=", 1)[1]) for arg in sys.argv[1:] if arg.startswith("--max-size=")),
+    DEFAULT_SIZES[-1],
+)
+UPDATE = "--update" in sys.argv[1:]
+
+results = run_benchmarks([n for n in DEFAULT_SIZES if n <= MAX_SIZE], NAMES)
+baseline = load_baseline(BASELINE_FILE)
+stored = (baseline or {}).get("cases", {})
+for name, timings in results.items():
+    exponent = scaling_exponent(timings)
+    print(f"\n{name}" + (f" (grows as n^{exponent:.2f})" if exponent is not None else ""))
+    for n, seconds in timings.items():
+        before = stored.get(name, {}).get(n)
+        vs = f"  {seconds / before:.2f}x baseline" if before else ""
+        print(f"  n={int(n):>9,}  {seconds * 1000:10.2f} ms{vs}")
+
+if UPDATE:
+    save_baseline(BASELINE_FILE, results)
+    print(f"\nBaseline written to {BASELINE_FILE}")
+    sys.exit(0)
+
+regressions = compare(results, baseline)
+for regression in regressions:
+    print(f"REGRESSION {regression}")
+sys.exit(1 if regressions else 0)
@@ -0,0 +1,27 @@
+import json
+import sys
+from pathlib import Path
+
+from icloud_mail_cleaner.batch import run_batch
+from loguru import logger
+
+CONFIG_FILE = Path.cwd() / "config.ini"
+assert CONFIG_FILE.exists()
+
+# Accounts manifest, see `accounts.example.ini`
+MANIFEST_FILE = Path(sys.argv[1]) if len(sys.argv) > 1 else Path.cwd() / "accounts.ini"
+REPORT_FILE = Path(sys.argv[2]) if len(sys.argv) > 2 else Path.cwd() / "batch_report.json"
+
+if __name__ == "__main__":
+    report = run_batch(MANIFEST_FILE, CONFIG_FILE)
+    REPORT_FILE.write_text(json.dumps(report, indent=2))
+    logger.info(f"Batch report written to {REPORT_FILE}")
+    print(f"Total emails deleted: {report['total_deleted']} in {report['seconds']}s")
+    for account in report["accounts"]:
+        print(f"  {account['account']}: {account['deleted']} deleted in {account['seconds']}s")
+    if report["accounts_with_errors"]:
+        print(f"Finished with sender errors: {', '.join(report['accounts_with_errors'])}")
+    # Only accounts that could not be cleaned at all fail the batch
+    if report["failed_accounts"]:
+        print(f"Failed accounts: {', '.join(report['failed_accounts'])}")
+        sys.exit(1)
@@ -0,0 +1,20 @@
+import signal
+from pathlib import Path
+
+from icloud_mail_cleaner.daemon import IdleDaemon
+from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from loguru import logger
+
+CONFIG_FILE = Path.cwd() / "config.ini"
+assert CONFIG_FILE.exists()
+
+# `target_emails_file` is defined within `config.ini`
+
+cleaner = ICloudCleaner(str(CONFIG_FILE), mode="script", log_level="INFO")
+daemon = IdleDaemon(cleaner, cleaner.load_target_emails())
+signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+signal.signal(signal.SIGINT, lambda *_: daemon.stop())
+total_deletions = daemon.run()
+cleaner.close_connection()
+logger.info(f"Daemon stopped. Total emails deleted: {total_deletions}")
+print(f"Total emails deleted: {total_deletions}")
@@ -1,4 +1,7 @@
+import json
+import os
 from pathlib import Path
+from icloud_mail_cleaner.budget import RunBudget, load_remaining, save_remaining
 from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
 from loguru import logger
 
@@ -8,7 +11,20 @@ assert CONFIG_FILE.exists()
 # `target_emails_file` is defined within `config.ini`
 
 cleaner = ICloudCleaner(str(CONFIG_FILE), mode="script", log_level="WARNING")
-deletion_results = cleaner.clean_mailbox(close_mail_app=True)
-total_deletions = sum(count for _, count in deletion_results)
+# CLEAN_BUDGET_SECONDS keeps the run inside the job's timeout; unfinished
+# senders are picked up by the next run from `remaining_file`
+budget = RunBudget.from_config(cleaner.config)
+if os.environ.get("CLEAN_BUDGET_SECONDS"):
+    budget = budget or RunBudget()
+    budget.seconds = float(os.environ["CLEAN_BUDGET_SECONDS"])
+remaining_file = cleaner.config.get("remaining_file", "data/remaining_work.json")
+resume = load_remaining(remaining_file)
+if resume:
+    logger.info(f"Resuming {len(resume['senders'])} senders left by the last run")
+deletion_results = cleaner.clean_mailbox(close_mail_app=True, budget=budget, resume=resume)
+save_remaining(remaining_file, cleaner.remaining)
+total_deletions = sum(result["deleted"] for result in deletion_results)
 logger.info(f"Total emails deleted: {total_deletions}")
 print(f"Total emails deleted: {total_deletions}")
+if cleaner.remaining:
+    print(json.dumps(cleaner.remaining))
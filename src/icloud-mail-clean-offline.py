@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+from icloud_mail_cleaner.history import RunHistory
+from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from icloud_mail_cleaner.metrics import RunMetrics
+from icloud_mail_cleaner.offline import clean_offline
+from loguru import logger
+
+CONFIG_FILE = Path.cwd() / "config.ini"
+assert CONFIG_FILE.exists()
+
+# mbox file or Maildir directory, then optional filtered output and CSV index of matches
+SOURCE = Path(sys.argv[1])
+OUTPUT = Path(sys.argv[2]) if len(sys.argv) > 2 else None
+INDEX = Path(sys.argv[3]) if len(sys.argv) > 3 else Path.cwd() / "offline_matches.csv"
+
+# "app" mode: the target list is read from `config.ini` without logging in
+cleaner = ICloudCleaner(str(CONFIG_FILE), mode="app", log_level="WARNING")
+metrics = RunMetrics()
+results = clean_offline(SOURCE, cleaner.load_target_emails(), OUTPUT, INDEX, metrics=metrics)
+if cleaner.config.get("history_db"):
+    history = RunHistory(cleaner.config["history_db"])
+    history.record_run(results, metrics, account="offline", mailbox=str(SOURCE))
+    history.close()
+total_matches = sum(result["deleted"] for result in results)
+logger.info(f"Total emails matched in {SOURCE}: {total_matches}")
+print(f"Total emails matched: {total_matches} ({metrics.bytes_reclaimed / 1024 / 1024:.1f} MB)")
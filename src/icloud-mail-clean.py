@@ -1,5 +1,9 @@
+import json
 from pathlib import Path
+from icloud_mail_cleaner.budget import RunBudget, load_remaining, save_remaining
+from icloud_mail_cleaner.history import RunHistory
 from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from icloud_mail_cleaner.rules import apply_rules, load_rules
 from loguru import logger
 
 CONFIG_FILE = Path.cwd() / "config.ini"
@@ -8,8 +12,27 @@ assert CONFIG_FILE.exists()
 # `target_emails_file` is defined within `config.ini`
 
 cleaner = ICloudCleaner(str(CONFIG_FILE), mode="script", log_level="WARNING")
-deletion_results = cleaner.clean_mailbox(close_mail_app=True)
-total_deletions = sum(count for _, count in deletion_results)
+# With `budget_*` set, a run that hits its budget leaves the rest in `remaining_file`;
+# the rules below share the same budget
+budget = RunBudget.from_config(cleaner.config)
+remaining_file = cleaner.config.get("remaining_file")
+resume = load_remaining(remaining_file) if remaining_file else None
+deletion_results = cleaner.clean_mailbox(close_mail_app=True, budget=budget, resume=resume)
+if remaining_file:
+    save_remaining(remaining_file, cleaner.remaining)
+if cleaner.remaining:
+    print(json.dumps(cleaner.remaining))
+# Age/size/subject rules from the `[Rules]` section of `config.ini`, if any
+rules = load_rules(cleaner.config)
+if rules:
+    for rule_result in apply_rules(cleaner, rules, budget=budget):
+        stopped = f" (stopped: {rule_result['stopped']} budget)" if rule_result["stopped"] else ""
+        print(f"Rule {rule_result['rule']}: {rule_result['matched']} emails deleted{stopped}")
+if cleaner.config.get("history_db"):
+    history = RunHistory(cleaner.config["history_db"])
+    history.record_run(deletion_results, cleaner.metrics, account=cleaner.username)
+    history.close()
+total_deletions = sum(result["deleted"] for result in deletion_results)
 logger.info(f"Total emails deleted: {total_deletions}")
 print(f"Total emails deleted: {total_deletions}")
 
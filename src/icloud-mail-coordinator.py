@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from icloud_mail_cleaner.workqueue import (
+    SENDERS_PER_SHARD,
+    QueueServer,
+    WorkQueue,
+    folder_uid_ranges,
+    plan_shards,
+)
+from loguru import logger
+
+CONFIG_FILE = Path.cwd() / "config.ini"
+assert CONFIG_FILE.exists()
+
+# plan JOB [FOLDER ...]  queue the target list as shards of job JOB (default folder INBOX)
+# serve                  expose the queue over HTTP for workers on other hosts
+# status JOB             shard counts and messages deleted so far
+COMMAND = sys.argv[1] if len(sys.argv) > 1 else "status"
+ARGS = sys.argv[2:]
+
+cleaner = ICloudCleaner(str(CONFIG_FILE), mode="app", log_level="WARNING")
+queue = WorkQueue(cleaner.config.get("queue_file", "data/work_queue.sqlite"))
+
+if COMMAND == "plan":
+    job, folders = ARGS[0], ARGS[1:] or ["INBOX"]
+    uid_ranges = None
+    if cleaner.config.get("queue_window_size"):
+        # UID-range shards need each folder's UIDNEXT, so log in once
+        session = ICloudCleaner(str(CONFIG_FILE), mode="script", log_level="WARNING")
+        uid_ranges = folder_uid_ranges(session, folders, int(cleaner.config["queue_window_size"]))
+        session.close_connection()
+    shards = plan_shards(
+        cleaner.load_target_emails(),
+        folders,
+        int(cleaner.config.get("senders_per_shard", SENDERS_PER_SHARD)),
+        uid_ranges,
+    )
+    print(f"Queued {queue.add_shards(job, shards)} shards for job {job}")
+elif COMMAND == "serve":
+    host = cleaner.config.get("queue_host", "127.0.0.1")
+    port = int(cleaner.config.get("queue_port", 8765))
+    server = QueueServer(queue, host, port, token=os.getenv("QUEUE_TOKEN"))
+    logger.info(f"Serving the work queue on http://{host}:{port}")
+    print(f"Serving the work queue on http://{host}:{port}")
+    server.serve_forever()
+else:
+    print(json.dumps(queue.summary(ARGS[0] if ARGS else "default"), indent=2))
@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+from icloud_mail_cleaner.dedupe import remove_duplicates
+from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from icloud_mail_cleaner.quota import MB
+from loguru import logger
+
+CONFIG_FILE = Path.cwd() / "config.ini"
+assert CONFIG_FILE.exists()
+
+# Folders to dedupe together (default INBOX), and `--dry-run` to only report duplicates;
+# the copy kept is the one in the earliest listed folder
+FOLDERS = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or ["INBOX"]
+DRY_RUN = "--dry-run" in sys.argv[1:]
+
+cleaner = ICloudCleaner(str(CONFIG_FILE), mode="script", log_level="WARNING")
+report = remove_duplicates(cleaner, FOLDERS, dry_run=DRY_RUN)
+cleaner.close_connection()
+logger.info(f"Dedupe: {report}")
+print(
+    f"{'Found' if DRY_RUN else 'Deleted'} "
+    f"{report['duplicates'] if DRY_RUN else report['deleted']} duplicates "
+    f"in {report['groups']} groups ({report['bytes'] / MB:.1f} MB) "
+    f"among {report['messages']} messages"
+)
@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+from icloud_mail_cleaner.discovery import discover_senders, summarise_senders
+from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from loguru import logger
+
+CONFIG_FILE = Path.cwd() / "config.ini"
+assert CONFIG_FILE.exists()
+
+# Optional mailbox to scan and CSV file for the full per-sender report
+MAILBOX = sys.argv[1] if len(sys.argv) > 1 else "INBOX"
+REPORT_FILE = Path(sys.argv[2]) if len(sys.argv) > 2 else Path.cwd() / "sender_report.csv"
+
+cleaner = ICloudCleaner(str(CONFIG_FILE), mode="script", log_level="WARNING")
+# Header parsing runs on every core while the next window is fetched, or on
+# each session's thread when the UID space is scanned over several sessions
+report = discover_senders(
+    cleaner,
+    MAILBOX,
+    target_emails=cleaner.load_target_emails(),
+    parse_workers=None,
+    sessions=int(cleaner.config.get("scan_sessions", 1)),
+)
+cleaner.close_connection()
+report.to_csv(REPORT_FILE, index=False)
+logger.info(f"Sender report written to {REPORT_FILE}")
+
+for title, table in summarise_senders(report).items():
+    print(f"\n{title.replace('_', ' ').capitalize()}")
+    print(table.to_string(index=False))
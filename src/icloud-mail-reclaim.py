@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from icloud_mail_cleaner.quota import MB, reclaim_quota
+from loguru import logger
+
+CONFIG_FILE = Path.cwd() / "config.ini"
+assert CONFIG_FILE.exists()
+
+# MB of storage to free, and `--dry-run` to only report what would be deleted
+TARGET_MB = float(sys.argv[1]) if len(sys.argv) > 1 else 100.0
+DRY_RUN = "--dry-run" in sys.argv[2:]
+
+cleaner = ICloudCleaner(str(CONFIG_FILE), mode="script", log_level="WARNING")
+# Optional size/age rules widen the candidates beyond the target senders
+larger_than_mb = cleaner.config.get("reclaim_larger_than_mb")
+older_than_days = cleaner.config.get("reclaim_older_than_days")
+report = reclaim_quota(
+    cleaner,
+    TARGET_MB,
+    larger_than=int(float(larger_than_mb) * MB) if larger_than_mb else None,
+    older_than_days=int(older_than_days) if older_than_days else None,
+    dry_run=DRY_RUN,
+)
+cleaner.close_connection()
+logger.info(f"Quota reclaim: {report}")
+print(
+    f"{'Would delete' if DRY_RUN else 'Deleted'} "
+    f"{report['selected'] if DRY_RUN else report['deleted']} emails, "
+    f"{report['bytes'] / MB:.1f} MB of {report['candidate_bytes'] / MB:.1f} MB in candidates"
+)
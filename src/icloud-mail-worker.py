@@ -0,0 +1,24 @@
+import os
+import sys
+from pathlib import Path
+
+from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from icloud_mail_cleaner.workqueue import LEASE_SECONDS, open_queue, run_worker
+from loguru import logger
+
+CONFIG_FILE = Path.cwd() / "config.ini"
+assert CONFIG_FILE.exists()
+
+# Job to work on, then the queue: a SQLite file (default `queue_file`) or the
+# coordinator's URL; start as many workers (processes or hosts) as the account allows
+JOB = sys.argv[1] if len(sys.argv) > 1 else "default"
+
+cleaner = ICloudCleaner(str(CONFIG_FILE), mode="script", log_level="WARNING")
+location = sys.argv[2] if len(sys.argv) > 2 else cleaner.config.get("queue_file", "data/work_queue.sqlite")
+queue = open_queue(location, token=os.getenv("QUEUE_TOKEN"))
+lease_seconds = float(cleaner.config.get("lease_seconds", LEASE_SECONDS))
+done = run_worker(queue, cleaner, JOB, lease_seconds=lease_seconds)
+cleaner.close_connection()
+queue.close()
+logger.info(f"Worker finished {done} shards of job {JOB}")
+print(f"Finished {done} shards of job {JOB}")
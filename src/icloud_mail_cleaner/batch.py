@@ -0,0 +1,143 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional, Union
+
+from configobj import ConfigObj
+from loguru import logger
+
+from .icloud_mail_cleaner import ICloudCleaner
+from .pyproject import PythonProject
+
+DEFAULT_MAX_WORKERS = 2
+
+
+def load_manifest(manifest_file: Union[str, Path]) -> List[dict]:
+    """
+    Read the accounts manifest: one section per account with `username`,
+    `password_env` (name of the environment variable holding the app password),
+    `target_emails_file` and an optional comma-separated `folders` list.
+    """
+    manifest = ConfigObj(str(manifest_file))
+    accounts = []
+    for name in manifest.sections:
+        section = manifest[name]
+        folders = section.get("folders", "INBOX")
+        if isinstance(folders, str):
+            folders = [folders]
+        accounts.append(
+            {
+                "name": name,
+                "username": section["username"],
+                "password_env": section.get("password_env", "ICLOUD_PASSWORD"),
+                "target_emails_file": section["target_emails_file"],
+                "folders": [folder.strip() for folder in folders],
+            }
+        )
+    logger.info(f"Loaded {len(accounts)} accounts from {manifest_file}")
+    return accounts
+
+
+def clean_account(account: dict, config_file: str) -> dict:
+    """
+    Clean every folder of one account on its own IMAP session.
+    Runs inside a worker process, so it only takes and returns plain data.
+    `failure` is set when the account could not be cleaned at all (setup,
+    login, connection); per-sender errors only go to `errors`.
+    """
+    start = time.perf_counter()
+    report = {
+        "account": account["name"],
+        "deleted": 0,
+        "errors": [],
+        "failure": None,
+        "folders": {},
+        "seconds": 0.0,
+    }
+    cleaner = None
+    try:
+        password = os.getenv(account["password_env"])
+        if not password:
+            raise ValueError(f"Environment variable {account['password_env']} is not set")
+        target_file = Path(account["target_emails_file"])
+        if not target_file.is_absolute():
+            target_file = PythonProject().root / target_file
+        target_emails = ICloudCleaner.import_emails_from_file(str(target_file))
+
+        cleaner = ICloudCleaner(config_file, mode="app")
+        cleaner.connect(account["username"], password, mailbox=account["folders"][0])
+        for folder in account["folders"]:
+            cleaner.select_mailbox(folder)
+            results = cleaner.clean_mailbox(target_emails, close_mail_app=False)
+            report["folders"][folder] = results
+            report["deleted"] += sum(result["deleted"] for result in results)
+            report["errors"].extend(
+                f"{folder}/{result['sender']}: {error}"
+                for result in results
+                for error in result["errors"]
+            )
+    except Exception as e:
+        logger.error(f"Account {account['name']} failed: {e}")
+        report["errors"].append(str(e))
+        report["failure"] = str(e)
+    finally:
+        if cleaner:
+            cleaner.close_connection()
+        report["seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def aggregate_reports(reports: List[dict], seconds: float) -> dict:
+    reports = sorted(reports, key=lambda report: report["account"])
+    return {
+        "accounts": reports,
+        "total_deleted": sum(report["deleted"] for report in reports),
+        "failed_accounts": [report["account"] for report in reports if report.get("failure")],
+        "accounts_with_errors": [
+            report["account"]
+            for report in reports
+            if report["errors"] and not report.get("failure")
+        ],
+        "seconds": round(seconds, 3),
+    }
+
+
+def run_batch(
+    manifest_file: Union[str, Path],
+    config_file: Union[str, Path],
+    max_workers: Optional[int] = None,
+) -> dict:
+    """
+    Clean all accounts in the manifest, each in its own worker process, with at
+    most `max_workers` (default: manifest `max_workers`, else 2) running at once.
+    """
+    start = time.perf_counter()
+    accounts = load_manifest(manifest_file)
+    if max_workers is None:
+        max_workers = int(ConfigObj(str(manifest_file)).get("max_workers", DEFAULT_MAX_WORKERS))
+    reports = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(clean_account, account, str(config_file)): account
+            for account in accounts
+        }
+        for future in as_completed(futures):
+            account = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. BrokenProcessPool)
+                report = {
+                    "account": account["name"],
+                    "deleted": 0,
+                    "errors": [str(e)],
+                    "failure": str(e),
+                    "folders": {},
+                    "seconds": 0.0,
+                }
+            logger.info(
+                f"{report['account']}: {report['deleted']} deleted in {report['seconds']}s"
+            )
+            reports.append(report)
+    return aggregate_reports(reports, time.perf_counter() - start)
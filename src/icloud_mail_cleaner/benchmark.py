@@ -0,0 +1,274 @@
+import json
+import math
+import os
+import platform
+import random
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from loguru import logger
+
+from .icloud_mail_cleaner import ICloudCleaner
+from .matcher import SenderMatcher
+from .metrics import RunMetrics
+from .pyproject import PythonProject
+from .response import RawResponses
+from .uidset import UIDSet
+
+BASELINE_VERSION = 1
+DEFAULT_SIZES = (10**3, 10**4, 10**5, 10**6)
+REPEATS = 3
+SLOWDOWN_THRESHOLD = 1.5  # slower than baseline by this factor is a regression...
+MIN_SLOWDOWN_SECONDS = 0.005  # ...unless it is within timer noise
+MAX_EXPONENT = 1.4  # every case is linear, so noise aside it grows as n^1; O(n^2) work as n^2
+
+
+@dataclass
+class Case:
+    """
+    One micro-benchmark: `setup(n, scratch)` builds a synthetic input of size n
+    (files go in the `scratch` directory) outside the timing, `run(input)` is
+    the timed part.
+    """
+
+    name: str
+    setup: Callable[[int, Path], object]
+    run: Callable[[object], object]
+    max_size: int = DEFAULT_SIZES[-1]
+
+
+def synthetic_addresses(n: int, seed: int = 0) -> List[str]:
+    """n addresses in mixed case with surrounding blanks and about 10% repeats, like a hand-kept list."""
+    rng = random.Random(seed)
+    distinct = max(1, n - n // 10)
+    addresses = [f" News{i}@Shop{i % 97}.example.com " for i in range(distinct)]
+    addresses += rng.choices(addresses, k=n - distinct)
+    rng.shuffle(addresses)
+    return addresses
+
+
+def synthetic_uids(n: int, seed: int = 0) -> List[int]:
+    """n distinct UIDs in runs of 1-50 with gaps, unsorted, like SEARCH results of a few senders."""
+    rng = random.Random(seed)
+    uids, uid = [], 1
+    while len(uids) < n:
+        run = min(rng.randint(1, 50), n - len(uids))
+        uids.extend(range(uid, uid + run))
+        uid += run + rng.randint(1, 200)
+    rng.shuffle(uids)
+    return uids
+
+
+class _CannedFetch:
+    """
+    Answers `FETCH id (UID)` without a server, both as imaplib's `fetch()`
+    and on the wire for RawResponses (`send`/`readline`).
+    """
+
+    def __init__(self):
+        self.tagnum = 0
+        self.tagged_commands = {}
+        self._lines = deque()
+
+    def fetch(self, email_id: bytes, items: str):
+        return "OK", [email_id + b" (UID " + email_id + b")"]
+
+    def _new_tag(self) -> bytes:
+        self.tagnum += 1
+        return b"B%d" % self.tagnum
+
+    def send(self, data: bytes) -> None:
+        tag, _, command = data.partition(b" ")
+        email_id = command.split()[1]
+        self._lines.append(b"* " + email_id + b" FETCH (UID " + email_id + b")\r\n")
+        self._lines.append(tag + b" OK FETCH completed\r\n")
+
+    def readline(self) -> bytes:
+        return self._lines.popleft() if self._lines else b""
+
+
+def _offline_cleaner(target_emails_file: Optional[str] = None, raw: bool = False) -> ICloudCleaner:
+    # Skips __init__: no password prompt, connection or log sinks
+    cleaner = ICloudCleaner.__new__(ICloudCleaner)
+    cleaner.config = {"target_emails_file": target_emails_file}
+    cleaner.email_connection = _CannedFetch()
+    # Connected cleaners read replies through RawResponses; imaplib is the fallback
+    cleaner.responses = RawResponses(cleaner.email_connection) if raw else None
+    cleaner.is_connected = True
+    cleaner.metrics = RunMetrics()
+    return cleaner
+
+
+def _setup_fetch_uid(n: int, scratch: Path, raw: bool = True):
+    return _offline_cleaner(raw=raw), [str(i).encode() for i in range(1, n + 1)]
+
+
+def _run_fetch_uid(prepared) -> int:
+    cleaner, email_ids = prepared
+    return sum(1 for email_id in email_ids if cleaner.fetch_uid(email_id))
+
+
+def _run_uidset(uids: List[int]) -> str:
+    return str(UIDSet(uids))
+
+
+def _write_list(n: int, scratch: Path) -> Path:
+    path = scratch / "targets.txt"
+    path.write_text("\n".join(synthetic_addresses(n)) + "\n")
+    return path
+
+
+def _setup_load_target_emails(n: int, scratch: Path):
+    path = _write_list(n, scratch)
+    # load_target_emails resolves the configured file against the project root
+    return _offline_cleaner(os.path.relpath(path, PythonProject().root))
+
+
+def _run_load_target_emails(cleaner: ICloudCleaner) -> int:
+    return len(SenderMatcher(cleaner.load_target_emails()))
+
+
+def _run_import_emails(path: Path) -> int:
+    return len(SenderMatcher(ICloudCleaner.import_emails_from_file(str(path))))
+
+
+def _setup_validate(n: int, scratch: Path) -> List[str]:
+    addresses = [address.strip() for address in synthetic_addresses(n)]
+    for i in range(0, n, 20):
+        addresses[i] = addresses[i].replace("@", "-at-")  # 5% invalid
+    return addresses
+
+
+def _run_validate(addresses: List[str]) -> int:
+    return sum(ICloudCleaner.validate_input_email(address) for address in addresses)
+
+
+def _setup_get_root(n: int, scratch: Path):
+    (scratch / "pyproject.toml").touch()
+    nested = scratch.joinpath(*"abcdefgh")  # the root is 8 levels up
+    nested.mkdir(parents=True)
+    project = PythonProject.__new__(PythonProject)
+    project.markers = ["pyproject.toml", "requirements.txt", ".git"]
+    return project, [nested / f"module{i}.py" for i in range(n)]
+
+
+def _run_get_root(prepared) -> int:
+    project, paths = prepared
+    return len({project.get_root(path) for path in paths})
+
+
+CASES = [
+    Case("fetch_uid", _setup_fetch_uid, _run_fetch_uid, max_size=10**5),  # one call per message
+    Case(
+        "fetch_uid_imaplib",
+        lambda n, scratch: _setup_fetch_uid(n, scratch, raw=False),
+        _run_fetch_uid,
+        max_size=10**5,
+    ),
+    Case("uidset", lambda n, scratch: synthetic_uids(n), _run_uidset),
+    Case("load_target_emails", _setup_load_target_emails, _run_load_target_emails),
+    Case("import_emails_from_file", _write_list, _run_import_emails),
+    Case("validate_input_email", _setup_validate, _run_validate),
+    Case("get_root", _setup_get_root, _run_get_root, max_size=10**4),  # stat calls dominate
+]
+
+
+def time_case(case: Case, n: int, repeats: int = REPEATS) -> float:
+    """Best wall time of `repeats` runs of `case` on a fresh input of size n."""
+    with tempfile.TemporaryDirectory(prefix="icloud-bench-") as scratch:
+        prepared = case.setup(n, Path(scratch))
+        best = math.inf
+        for _ in range(repeats):
+            start = time.perf_counter()
+            case.run(prepared)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    names: Optional[Sequence[str]] = None,
+    repeats: int = REPEATS,
+    cases: Sequence[Case] = CASES,
+) -> Dict[str, Dict[str, float]]:
+    """Seconds per case and size: {"uidset": {"1000": 0.0004, ...}, ...}."""
+    results: Dict[str, Dict[str, float]] = {}
+    # Keep warnings about the synthetic invalid addresses out of the timings
+    logger.disable(__package__)
+    try:
+        for case in cases:
+            if names and case.name not in names:
+                continue
+            for n in sizes:
+                if n <= case.max_size:
+                    results.setdefault(case.name, {})[str(n)] = time_case(case, n, repeats)
+    finally:
+        logger.enable(__package__)
+    return results
+
+
+def scaling_exponent(timings: Dict[str, float]) -> Optional[float]:
+    """
+    Growth of the time with the input size between the two largest sizes: 1
+    for linear work, 2 for quadratic. None with fewer than two sizes.
+    """
+    points = sorted((int(n), seconds) for n, seconds in timings.items())
+    if len(points) < 2:
+        return None
+    (n1, t1), (n2, t2) = points[-2:]
+    return math.log(max(t2, 1e-9) / max(t1, 1e-9)) / math.log(n2 / n1)
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Optional[dict] = None,
+    threshold: float = SLOWDOWN_THRESHOLD,
+    max_exponent: float = MAX_EXPONENT,
+) -> List[str]:
+    """
+    Regressions in `results`: a case slower than its baseline by more than
+    `threshold` (stored timings are machine specific), or one whose time grows
+    faster than n^max_exponent (machine independent, catches O(n^2) work).
+    """
+    regressions = []
+    stored = (baseline or {}).get("cases", {})
+    for name, timings in results.items():
+        exponent = scaling_exponent(timings)
+        if exponent is not None and exponent > max_exponent:
+            regressions.append(f"{name}: time grows as n^{exponent:.2f}")
+        for n, seconds in timings.items():
+            before = stored.get(name, {}).get(n)
+            if before and seconds > before * threshold and seconds - before > MIN_SLOWDOWN_SECONDS:
+                regressions.append(
+                    f"{name} n={n}: {seconds * 1000:.1f} ms, baseline {before * 1000:.1f} ms "
+                    f"({seconds / before:.2f}x)"
+                )
+    return regressions
+
+
+def load_baseline(path: Union[str, Path]) -> Optional[dict]:
+    path = Path(path)
+    if not path.is_file():
+        return None
+    baseline = json.loads(path.read_text())
+    if baseline.get("version") != BASELINE_VERSION:
+        logger.warning(f"Ignoring baseline {path} with version {baseline.get('version')}")
+        return None
+    return baseline
+
+
+def save_baseline(path: Union[str, Path], results: Dict[str, Dict[str, float]]) -> None:
+    """Store `results` as the new baseline, keeping cases and sizes that were not re-run."""
+    path = Path(path)
+    baseline = load_baseline(path) or {"version": BASELINE_VERSION, "cases": {}}
+    for name, timings in results.items():
+        baseline["cases"].setdefault(name, {}).update(
+            {n: round(seconds, 6) for n, seconds in timings.items()}
+        )
+    baseline["machine"] = f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
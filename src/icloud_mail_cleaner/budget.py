@@ -0,0 +1,105 @@
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Union
+
+from .metrics import RunMetrics
+
+DEADLINE_RESERVE = 0.1  # share of the deadline kept back for the final flush and expunge
+MAX_RESERVE_SECONDS = 30.0
+
+
+@dataclass
+class RunBudget:
+    """
+    Hard limits for one clean_mailbox run: wall-clock `seconds`, IMAP
+    `commands` issued and `messages` flagged. The run stops at the next sender
+    (or UID window) boundary once any limit is reached, still flushing its
+    STOREs and expunging.
+    """
+
+    seconds: Optional[float] = None
+    commands: Optional[int] = None
+    messages: Optional[int] = None
+    started: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def from_config(cls, config) -> Optional["RunBudget"]:
+        """Budget from the `budget_*` config keys, or None if none is set."""
+        seconds = config.get("budget_seconds")
+        commands = config.get("budget_commands")
+        messages = config.get("budget_messages")
+        if not (seconds or commands or messages):
+            return None
+        return cls(
+            float(seconds) if seconds else None,
+            int(commands) if commands else None,
+            int(messages) if messages else None,
+        )
+
+    @property
+    def limited(self) -> bool:
+        """Whether any limit is set; an empty budget never stops a run."""
+        return any(limit is not None for limit in (self.seconds, self.commands, self.messages))
+
+    def start(self) -> None:
+        self.started = time.monotonic()
+
+    @property
+    def deadline_left(self) -> Optional[float]:
+        """Seconds left before the cut-off, which leaves room for the final expunge."""
+        if self.seconds is None:
+            return None
+        reserve = min(MAX_RESERVE_SECONDS, self.seconds * DEADLINE_RESERVE)
+        return self.seconds - reserve - (time.monotonic() - self.started)
+
+    def messages_left(self, flagged: int) -> Optional[int]:
+        return None if self.messages is None else max(0, self.messages - flagged)
+
+    def exhausted(self, metrics: RunMetrics, flagged: int) -> Optional[str]:
+        """The limit that has been reached ("seconds", "commands", "messages"), or None."""
+        if self.seconds is not None and self.deadline_left <= 0:
+            return "seconds"
+        if self.commands is not None:
+            issued = sum(calls for calls, _ in metrics.commands.values())
+            if issued >= self.commands:
+                return "commands"
+        if self.messages is not None and flagged >= self.messages:
+            return "messages"
+        return None
+
+
+def remaining_work(reason: str, mailbox: str, senders: List[str], flagged: int) -> dict:
+    """
+    Machine-readable description of the work a budgeted run left undone; pass
+    it as `resume` to the next clean_mailbox call.
+    """
+    return {
+        "reason": reason,
+        "mailbox": mailbox,
+        "senders": senders,
+        "flagged": flagged,
+        "stopped_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def load_remaining(path: Union[str, Path]) -> Optional[dict]:
+    """The descriptor left by the last run; None if there is none or that run finished."""
+    path = Path(path)
+    remaining = json.loads(path.read_text()) if path.is_file() else None
+    return None if not remaining or remaining.get("complete") else remaining
+
+
+def save_remaining(path: Union[str, Path], remaining: Optional[dict]) -> None:
+    """
+    Write the descriptor, or a "complete" marker once a run has finished
+    everything. The marker (rather than no file) lets caches that keep the
+    latest saved state, such as the GitHub workflow's, drop a stale descriptor.
+    """
+    path = Path(path)
+    if remaining is None:
+        remaining = {"complete": True, "stopped_at": datetime.now().isoformat(timespec="seconds")}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(remaining, indent=2))
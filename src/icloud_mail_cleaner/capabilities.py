@@ -0,0 +1,130 @@
+import imaplib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Tuple
+
+from loguru import logger
+
+from .uidset import UIDSet
+
+CAPABILITY_TTL = 3600  # seconds a probed capability list is trusted per host
+
+# imaplib only sends commands it knows about (RFC 6851)
+imaplib.Commands.setdefault("MOVE", ("SELECTED",))
+
+_cache: Dict[str, Tuple[float, FrozenSet[str]]] = {}
+_cache_lock = threading.Lock()
+
+
+def probe_capabilities(
+    conn: imaplib.IMAP4, host: str, ttl: float = CAPABILITY_TTL
+) -> FrozenSet[str]:
+    """
+    Post-login CAPABILITY list for `host`, issued at most once per `ttl` seconds
+    per process. The result is also stored on `conn.capabilities` for imaplib.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(host)
+    if cached and now - cached[0] < ttl:
+        capabilities = cached[1]
+    else:
+        status, data = conn.capability()
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"CAPABILITY failed: {data}")
+        capabilities = frozenset(data[-1].decode("ascii").upper().split())
+        with _cache_lock:
+            _cache[host] = (now, capabilities)
+        logger.info(f"Probed capabilities of {host}: {' '.join(sorted(capabilities))}")
+    conn.capabilities = tuple(sorted(capabilities))
+    return capabilities
+
+
+def clear_capability_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+@dataclass(frozen=True)
+class ServerStrategy:
+    """
+    The fastest search/flag/move/expunge implementation a server supports.
+    """
+
+    capabilities: FrozenSet[str]
+
+    @property
+    def esearch(self) -> bool:
+        return "ESEARCH" in self.capabilities
+
+    @property
+    def uidplus(self) -> bool:
+        return "UIDPLUS" in self.capabilities
+
+    @property
+    def move(self) -> bool:
+        return "MOVE" in self.capabilities
+
+    @property
+    def condstore(self) -> bool:
+        return "CONDSTORE" in self.capabilities
+
+    @property
+    def idle(self) -> bool:
+        return "IDLE" in self.capabilities
+
+    @property
+    def compress(self) -> bool:
+        return "COMPRESS=DEFLATE" in self.capabilities
+
+    def describe(self) -> str:
+        search = "UID SEARCH RETURN (ALL)" if self.esearch else "UID SEARCH"
+        flag = "UID STORE +FLAGS.SILENT"
+        move = "UID MOVE" if self.move else "UID COPY + STORE + expunge"
+        expunge = "UID EXPUNGE" if self.uidplus else "EXPUNGE"
+        return (
+            f"search={search}, flag={flag}, move={move}, expunge={expunge}, "
+            f"condstore={self.condstore}, idle={self.idle}, compress={self.compress}"
+        )
+
+    def search(self, conn: imaplib.IMAP4, query: str) -> UIDSet:
+        """
+        UID SEARCH; with ESEARCH the server answers with a compact sequence set
+        (`UID ALL 1:500,731`) instead of one number per message.
+        """
+        if not self.esearch:
+            status, data = conn.uid("SEARCH", query)
+            if status != "OK":
+                raise imaplib.IMAP4.error(f"UID SEARCH failed: {data}")
+            return UIDSet.from_search(data[0])
+        status, data = conn.uid("SEARCH", f"RETURN (ALL) {query}")
+        if status != "OK":
+            raise imaplib.IMAP4.error(f"UID SEARCH failed: {data}")
+        _, esearch = conn.response("ESEARCH")
+        for line in esearch or []:
+            tokens = (line or b"").split()
+            if b"ALL" in tokens:
+                return UIDSet.parse(tokens[tokens.index(b"ALL") + 1].decode("ascii"))
+        return UIDSet()
+
+    def expunge(self, conn: imaplib.IMAP4, uids: UIDSet = None) -> None:
+        """
+        With UIDPLUS only our own UIDs are expunged, leaving other clients'
+        \\Deleted messages alone and keeping the EXPUNGE reply small. An empty
+        `uids` means nothing of ours was flagged, so nothing is expunged.
+        """
+        if uids is not None and not uids:
+            return
+        if self.uidplus:
+            conn.uid("EXPUNGE", uids.to_imap())
+        else:
+            conn.expunge()
+
+    def move_to(self, conn: imaplib.IMAP4, uids: UIDSet, mailbox: str) -> None:
+        if self.move:
+            conn.uid("MOVE", uids.to_imap(), mailbox)
+            return
+        conn.uid("COPY", uids.to_imap(), mailbox)
+        conn.uid("STORE", uids.to_imap(), "+FLAGS.SILENT", "(\\Deleted)")
+        self.expunge(conn, uids)
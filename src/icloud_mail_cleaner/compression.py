@@ -0,0 +1,107 @@
+import imaplib
+import zlib
+from typing import Iterable, Optional, Tuple
+
+from loguru import logger
+
+# imaplib only sends commands it knows about (RFC 4978)
+imaplib.Commands.setdefault("COMPRESS", ("AUTH", "SELECTED"))
+
+RECV_SIZE = 65536
+
+
+class DeflateTransport:
+    """
+    Sits between imaplib and the socket of an open connection, counting payload
+    and on-the-wire bytes in both directions. Once `enable()` has negotiated
+    COMPRESS=DEFLATE, traffic is (de)compressed with streaming raw zlib.
+    """
+
+    def __init__(self, conn: imaplib.IMAP4):
+        self.conn = conn
+        self.compressing = False
+        self.payload_in = self.payload_out = 0
+        self.wire_in = self.wire_out = 0
+        self._buffer = bytearray()
+        self._compressor = None
+        self._decompressor = None
+        self._read, self._readline, self._send = conn.read, conn.readline, conn.send
+        conn.read, conn.readline, conn.send = self.read, self.readline, self.send
+
+    def enable(self, capabilities: Optional[Iterable[str]] = None) -> bool:
+        """
+        Negotiate COMPRESS DEFLATE if the server advertises it. Without an
+        already-probed `capabilities` list, CAPABILITY is re-issued after login.
+        """
+        refresh = capabilities is None
+        if refresh:
+            capabilities = self.conn.capabilities
+        if refresh and "COMPRESS=DEFLATE" not in capabilities:
+            _, data = self.conn.capability()
+            capabilities = tuple(data[-1].decode("ascii").upper().split())
+            self.conn.capabilities = capabilities
+        if "COMPRESS=DEFLATE" not in capabilities:
+            logger.info("Server does not offer COMPRESS=DEFLATE")
+            return False
+        status, data = self.conn._simple_command("COMPRESS", "DEFLATE")
+        if status != "OK":
+            logger.warning(f"COMPRESS DEFLATE refused: {data}")
+            return False
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self._decompressor = zlib.decompressobj(-15)
+        self.compressing = True
+        logger.info("IMAP COMPRESS=DEFLATE enabled")
+        return True
+
+    @property
+    def buffered(self) -> int:
+        """Decompressed bytes not yet consumed (invisible to select() on the socket)."""
+        return len(self._buffer)
+
+    def counters(self) -> Tuple[int, int]:
+        """(payload bytes, wire bytes) transferred so far in both directions."""
+        return self.payload_in + self.payload_out, self.wire_in + self.wire_out
+
+    def send(self, data: bytes) -> None:
+        self.payload_out += len(data)
+        if not self.compressing:
+            self.wire_out += len(data)
+            return self._send(data)
+        wire = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.wire_out += len(wire)
+        self.conn.sock.sendall(wire)
+
+    def _fill(self) -> None:
+        chunk = self.conn.sock.recv(RECV_SIZE)
+        if not chunk:
+            raise imaplib.IMAP4.abort("socket error: EOF")
+        self.wire_in += len(chunk)
+        self._buffer += self._decompressor.decompress(chunk)
+
+    def read(self, size: int) -> bytes:
+        if not self.compressing:
+            data = self._read(size)
+            self.payload_in += len(data)
+            self.wire_in += len(data)
+            return data
+        while len(self._buffer) < size:
+            self._fill()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.payload_in += size
+        return data
+
+    def readline(self) -> bytes:
+        if not self.compressing:
+            line = self._readline()
+            self.payload_in += len(line)
+            self.wire_in += len(line)
+            return line
+        while (end := self._buffer.find(b"\n")) < 0:
+            if len(self._buffer) > imaplib._MAXLINE:
+                raise imaplib.IMAP4.error(f"got more than {imaplib._MAXLINE} bytes")
+            self._fill()
+        line = bytes(self._buffer[: end + 1])
+        del self._buffer[: end + 1]
+        self.payload_in += len(line)
+        return line
@@ -0,0 +1,193 @@
+import imaplib
+import re
+import select
+import ssl
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from loguru import logger
+from tenacity import RetryError
+
+from .icloud_mail_cleaner import EmailDeletionError, ICloudCleaner, ICloudConnectionError
+from .matcher import SenderMatcher
+from .parsing import parse_header_fetch
+from .uidset import UIDSet
+
+KEEPALIVE_INTERVAL = 600  # seconds; servers drop IDLE after ~30 minutes
+MAX_RECONNECT_DELAY = 300  # seconds
+
+_STATUS_RE = re.compile(rb"(UIDNEXT|UIDVALIDITY) (\d+)")
+
+
+def _file_buffered(conn: imaplib.IMAP4) -> bool:
+    """
+    True if imaplib's buffered reader already holds unread data (e.g. an EXISTS
+    that arrived with the IDLE continuation), which select() on the socket
+    cannot see. Peeks without blocking.
+    """
+    peek = getattr(getattr(conn, "file", None), "peek", None)
+    if peek is None:
+        return False
+    timeout = conn.sock.gettimeout()
+    conn.sock.settimeout(0)
+    try:
+        return bool(peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        conn.sock.settimeout(timeout)
+
+
+class IdleDaemon:
+    """
+    Keep an IDLE session on a mailbox and delete mail from target senders as it
+    arrives. Only UIDs above the last one seen are fetched, so each wake-up costs
+    O(new mail); the process sleeps in `select()` while the mailbox is quiet.
+    """
+
+    def __init__(
+        self,
+        cleaner: ICloudCleaner,
+        target_emails: List[str],
+        mailbox: str = "INBOX",
+        batch_size: int = 50,
+        expunge: bool = True,
+        keepalive_interval: float = KEEPALIVE_INTERVAL,
+    ):
+        self.cleaner = cleaner
+        self.matcher = SenderMatcher(target_emails)
+        self.mailbox = mailbox
+        self.batch_size = batch_size
+        self.expunge = expunge
+        self.keepalive_interval = keepalive_interval
+        self.last_uid = 0
+        self.uid_validity: Optional[int] = None
+        self.deleted = 0
+        self._pending = UIDSet()
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _mailbox_status(self) -> Tuple[int, int]:
+        _, data = self.cleaner.email_connection.status(self.mailbox, "(UIDVALIDITY UIDNEXT)")
+        values = {key: int(value) for key, value in _STATUS_RE.findall(data[0] or b"")}
+        return values[b"UIDVALIDITY"], values[b"UIDNEXT"]
+
+    def _open(self) -> None:
+        """(Re)connect, select the mailbox and work out where to resume from."""
+        self.cleaner.ensure_connection()
+        self.cleaner.select_mailbox(self.mailbox)
+        uid_validity, uid_next = self._mailbox_status()
+        if self.uid_validity != uid_validity:
+            if self.uid_validity is not None:
+                logger.warning(f"UIDVALIDITY of {self.mailbox} changed; resuming from UIDNEXT")
+            self.uid_validity = uid_validity
+            self.last_uid = uid_next - 1
+            self._pending = UIDSet()
+        logger.info(f"Watching {self.mailbox} from UID {self.last_uid}")
+
+    def matches(self, header_block: bytes) -> bool:
+        return self.matcher.match(header_block) is not None
+
+    def catch_up(self) -> int:
+        """
+        Fetch From headers for UIDs above `last_uid` and queue matching ones.
+        """
+        with self.cleaner.metrics.timed("FETCH"):
+            _, data = self.cleaner.email_connection.uid(
+                "FETCH", f"{self.last_uid + 1}:*", "(UID BODY.PEEK[HEADER.FIELDS (FROM)])"
+            )
+        queued = 0
+        # `n:*` returns the newest message even when nothing is newer than n
+        for uid, _, header_block in parse_header_fetch(data or []):
+            if uid <= self.last_uid:
+                continue
+            self.last_uid = uid
+            if self.matches(header_block):
+                self._pending.add(uid)
+                queued += 1
+                if len(self._pending) >= self.batch_size:
+                    self.flush()
+        self.flush()
+        return queued
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        self.cleaner.set_deleted(self._pending.to_imap(), silent=True)
+        if self.expunge:
+            self.cleaner.safe_expunge(self._pending)
+        self.deleted += len(self._pending)
+        logger.info(f"Deleted {len(self._pending)} new emails ({self.deleted} so far)")
+        self._pending = UIDSet()
+
+    def idle(self, timeout: float) -> bool:
+        """
+        Issue IDLE and block until the server reports EXISTS or `timeout` passes.
+        Returns True if new mail arrived.
+        """
+        conn = self.cleaner.email_connection
+        tag = conn._new_tag()
+        conn.send(tag + b" IDLE\r\n")
+        response = conn.readline()
+        if not response.startswith(b"+"):
+            raise imaplib.IMAP4.abort(f"IDLE refused: {response!r}")
+
+        new_mail = False
+        deadline = time.monotonic() + timeout
+        while not new_mail and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            pending = getattr(conn.sock, "pending", lambda: 0)()
+            if self.cleaner.transport:
+                pending = pending or self.cleaner.transport.buffered
+            pending = pending or _file_buffered(conn)
+            if not pending:
+                # Wake at least every second so stop() is honoured promptly
+                readable, _, _ = select.select([conn.sock], [], [], min(remaining, 1.0))
+                if not readable:
+                    continue
+            line = conn.readline()
+            if not line or line.startswith(b"* BYE"):
+                raise imaplib.IMAP4.abort(f"Connection closed during IDLE: {line!r}")
+            new_mail = line.rstrip().endswith(b"EXISTS")
+
+        conn.send(b"DONE\r\n")
+        while not (line := conn.readline()).startswith(tag):
+            if not line:
+                raise imaplib.IMAP4.abort("Connection closed while ending IDLE")
+            new_mail = new_mail or line.rstrip().endswith(b"EXISTS")
+        return new_mail
+
+    def run(self) -> int:
+        """
+        Watch the mailbox until `stop()` is called. Returns the number deleted.
+        """
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                self._open()
+                self.catch_up()
+                delay = 1.0
+                while not self._stop.is_set():
+                    if self.idle(self.keepalive_interval):
+                        self.catch_up()
+                    else:
+                        with self.cleaner.metrics.timed("NOOP"):
+                            self.cleaner.email_connection.noop()
+            except (
+                imaplib.IMAP4.abort,
+                ICloudConnectionError,
+                EmailDeletionError,
+                OSError,
+                RetryError,  # reconnect attempts exhausted: keep trying with backoff
+            ) as e:
+                logger.warning(f"IDLE session lost ({e}); reconnecting in {delay:.0f}s")
+                self.cleaner.is_connected = False
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+        self.flush()
+        return self.deleted
@@ -0,0 +1,167 @@
+import hashlib
+import re
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from tqdm.autonotebook import tqdm
+
+from .icloud_mail_cleaner import ICloudCleaner
+from .parsing import item_day, item_size, item_uid, split_fetch
+from .quota import MB, day_ordinal, in_uidset
+from .uidset import UIDSet, uid_windows
+
+DEFAULT_CHUNK_SIZE = 5000
+FETCH_ITEMS = "(UID RFC822.SIZE INTERNALDATE BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])"
+
+_MESSAGE_ID_RE = re.compile(rb"^Message-ID:\s*(\S+)", re.IGNORECASE | re.MULTILINE)
+
+
+def message_digest(message_id: bytes, size: int) -> int:
+    """64-bit key of a (Message-ID, RFC822.SIZE) pair: 8 bytes per message instead of the string."""
+    digest = hashlib.blake2b(message_id, digest_size=8, person=b"dedupe")
+    digest.update(size.to_bytes(8, "little"))
+    return int.from_bytes(digest.digest(), "little")
+
+
+class MessageIndex:
+    """
+    Compact columns (digest, folder, UID, size, received day; 26 bytes per
+    message) for every message with a Message-ID, across one or more folders.
+    """
+
+    def __init__(self):
+        self.folders: List[str] = []
+        self.digests = array("Q")
+        self.folder_ids = array("H")
+        self.uids = array("I")
+        self.sizes = array("Q")
+        self.days = array("I")
+        self.without_id = 0
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    def _add(self, folder_id: int, meta: bytes, header: bytes) -> None:
+        uid = item_uid(meta)
+        if not uid:
+            return
+        message_id = _MESSAGE_ID_RE.search(header)
+        if not message_id:
+            self.without_id += 1  # never a duplicate: nothing to compare safely
+            return
+        size = item_size(meta)
+        day = item_day(meta)
+        self.digests.append(message_digest(message_id[1], size))
+        self.folder_ids.append(folder_id)
+        self.uids.append(uid)
+        self.sizes.append(size)
+        self.days.append(day_ordinal(day) if day else 0)
+
+    def add_fetch(self, folder: str, data: Iterable) -> None:
+        """
+        Add the messages of one imaplib UID FETCH reply. Messages without a
+        Message-ID header are only counted.
+        """
+        if folder not in self.folders:
+            self.folders.append(folder)
+        folder_id = self.folders.index(folder)
+        for items, header in split_fetch(data):
+            self._add(folder_id, items, header)
+
+    def duplicates(self) -> Tuple[np.ndarray, int]:
+        """
+        Mask of the rows to delete and the number of duplicate groups. Rows are
+        grouped by digest with one sort; the copy kept is in the earliest listed
+        folder, then the oldest, then the lowest UID.
+        """
+        if not len(self):
+            return np.zeros(0, dtype=bool), 0
+        digests = np.frombuffer(self.digests, dtype=np.uint64)
+        order = np.lexsort(
+            (
+                np.frombuffer(self.uids, dtype=np.uint32),
+                np.frombuffer(self.days, dtype=np.uint32),
+                np.frombuffer(self.folder_ids, dtype=np.uint16),
+                digests,
+            )
+        )
+        ordered = digests[order]
+        repeat = np.zeros(len(ordered), dtype=bool)
+        repeat[1:] = ordered[1:] == ordered[:-1]
+        mask = np.zeros(len(ordered), dtype=bool)
+        mask[order[repeat]] = True
+        groups = int(np.count_nonzero(repeat[1:] & ~repeat[:-1])) + int(repeat[0])
+        return mask, groups
+
+
+def scan_message_ids(
+    cleaner: ICloudCleaner,
+    folders: List[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    index: Optional[MessageIndex] = None,
+) -> MessageIndex:
+    """Stream Message-ID, size and received day of every message in `folders` in UID windows."""
+    index = index or MessageIndex()
+    for folder in folders:
+        cleaner.select_mailbox(folder)
+        windows = list(uid_windows(cleaner.uid_next(), chunk_size))
+        for window in tqdm(windows, desc=f"Indexing {folder}"):
+            with cleaner.metrics.timed("FETCH MESSAGE-ID"):
+                status, data = cleaner.email_connection.uid("FETCH", window, FETCH_ITEMS)
+            if status != "OK":
+                logger.error(f"FETCH {window} in {folder} failed: {data}")
+                continue
+            index.add_fetch(folder, data)
+    return index
+
+
+def remove_duplicates(
+    cleaner: ICloudCleaner,
+    folders: Optional[List[str]] = None,
+    dry_run: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict:
+    """
+    Delete all but one copy of every message whose Message-ID and size occur
+    more than once in `folders` (default: the selected one). Deletion reuses
+    the cleaner's batched UID STORE and expunge, one folder at a time.
+    """
+    cleaner.ensure_connection()
+    folders = folders or [cleaner.mailbox]
+    index = scan_message_ids(cleaner, folders, chunk_size)
+    mask, groups = index.duplicates()
+    folder_ids = np.frombuffer(index.folder_ids, dtype=np.uint16)
+    uids = np.frombuffer(index.uids, dtype=np.uint32)
+    sizes = np.frombuffer(index.sizes, dtype=np.uint64)
+    report = {
+        "messages": len(index) + index.without_id,
+        "without_message_id": index.without_id,
+        "groups": groups,
+        "duplicates": int(mask.sum()),
+        "bytes": int(sizes[mask].sum()),
+        "deleted": 0,
+        "errors": [],
+    }
+    logger.info(
+        f"{report['duplicates']} duplicates in {groups} groups "
+        f"({report['bytes'] / MB:.1f} MB) across {', '.join(folders)}"
+    )
+    if dry_run:
+        return report
+
+    for folder_id, folder in enumerate(index.folders):
+        selected = mask & (folder_ids == folder_id)
+        if not selected.any():
+            continue
+        cleaner.select_mailbox(folder)
+        flagged, errors = cleaner.flag_deleted(UIDSet(uids[selected].tolist()))
+        report["errors"].extend(f"{folder}: {error}" for error in errors)
+        if not flagged:
+            continue  # nothing of ours to expunge
+        cleaner.safe_expunge(flagged)
+        report["deleted"] += len(flagged)
+        deleted = in_uidset(uids[selected], flagged)
+        cleaner.metrics.bytes_reclaimed += int(sizes[selected][deleted].sum())
+    return report
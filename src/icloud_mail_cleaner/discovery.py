@@ -0,0 +1,120 @@
+from typing import List, Optional
+
+import pandas as pd
+from loguru import logger
+from tqdm.autonotebook import tqdm
+
+from .icloud_mail_cleaner import ICloudCleaner
+from .parallel_scan import ParallelScanner, fetch_range
+from .parsing import ParallelHeaderParser, parse_header_chunk
+from .uidset import uid_windows
+
+DEFAULT_CHUNK_SIZE = 5000
+HEADER_FIELDS = "FROM LIST-ID LIST-UNSUBSCRIBE"
+FETCH_ITEMS = f"(RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])"
+
+
+def _aggregate(columns: dict) -> pd.DataFrame:
+    chunk = pd.DataFrame(
+        {key: columns[key] for key in ("sender", "bytes", "newsletter")}
+    )
+    chunk["messages"] = 1
+    return chunk.groupby("sender", sort=False).agg(
+        messages=("messages", "sum"),
+        bytes=("bytes", "sum"),
+        newsletter=("newsletter", "sum"),
+    )
+
+
+def _add_chunk(totals: Optional[pd.DataFrame], columns: dict) -> Optional[pd.DataFrame]:
+    if not columns["sender"]:
+        return totals
+    chunk = _aggregate(columns)
+    return chunk if totals is None else totals.add(chunk, fill_value=0)
+
+
+def discover_senders(
+    cleaner: ICloudCleaner,
+    mailbox: str = "INBOX",
+    target_emails: Optional[List[str]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    parse_workers: Optional[int] = 0,
+    sessions: int = 1,
+) -> pd.DataFrame:
+    """
+    Stream From/List-Id/List-Unsubscribe and RFC822.SIZE for the whole mailbox in
+    UID windows and aggregate per sender. Only the per-sender totals are kept
+    between windows, so memory is bounded by the number of distinct senders.
+    With `parse_workers` (None for one per core) header parsing runs in worker
+    processes, overlapping with the next window's FETCH. With `sessions` > 1
+    the UID space is instead split into ranges scanned on that many IMAP
+    sessions in parallel (see ParallelScanner).
+    """
+    if sessions > 1:
+        totals = _scan_parallel(cleaner, mailbox, chunk_size, sessions)
+    else:
+        totals = _scan_serial(cleaner, mailbox, chunk_size, parse_workers)
+
+    if totals is None:
+        totals = pd.DataFrame(columns=["messages", "bytes", "newsletter"])
+    report = totals.astype("int64").reset_index(names="sender")
+    report["domain"] = report["sender"].str.partition("@")[2]
+    targets = {email.strip().lower() for email in target_emails or []}
+    report["on_target_list"] = report["sender"].isin(targets)
+    logger.info(f"Discovered {len(report)} senders in {mailbox}")
+    return report.sort_values("messages", ascending=False, ignore_index=True)
+
+
+def _scan_serial(
+    cleaner: ICloudCleaner, mailbox: str, chunk_size: int, parse_workers: Optional[int]
+) -> Optional[pd.DataFrame]:
+    cleaner.select_mailbox(mailbox)
+    upper = cleaner.uid_next(mailbox)
+    totals: Optional[pd.DataFrame] = None
+    windows = list(uid_windows(upper, chunk_size))
+    with ParallelHeaderParser(parse_workers) as parser:
+        for window in tqdm(windows, desc=f"Scanning {mailbox}"):
+            status, data = cleaner.email_connection.uid("FETCH", window, FETCH_ITEMS)
+            if status != "OK":
+                logger.error(f"FETCH {window} failed: {data}")
+                continue
+            for columns in parser.submit(data):
+                totals = _add_chunk(totals, columns)
+        for columns in parser.drain():
+            totals = _add_chunk(totals, columns)
+    return totals
+
+
+def _scan_parallel(
+    cleaner: ICloudCleaner, mailbox: str, chunk_size: int, sessions: int
+) -> Optional[pd.DataFrame]:
+    def scan_range(session: ICloudCleaner, first: int, last: int) -> Optional[pd.DataFrame]:
+        range_totals = None
+        for data in fetch_range(session, first, last, FETCH_ITEMS, chunk_size):
+            range_totals = _add_chunk(range_totals, parse_header_chunk(data))
+        return range_totals
+
+    totals = None
+    with ParallelScanner(cleaner, sessions) as scanner:
+        for result in tqdm(scanner.scan(mailbox, scan_range), desc=f"Scanning {mailbox}"):
+            if result.value is not None:
+                totals = result.value if totals is None else totals.add(result.value, fill_value=0)
+    return totals
+
+
+def summarise_senders(report: pd.DataFrame, top: int = 20) -> dict:
+    """
+    Top senders and domains by count and bytes, plus newsletter-like senders
+    (any message with List-Id/List-Unsubscribe) not yet on the target list.
+    """
+    domains = (
+        report.groupby("domain")[["messages", "bytes"]].sum().reset_index()
+    )
+    candidates = report[(report["newsletter"] > 0) & ~report["on_target_list"]]
+    return {
+        "top_senders_by_count": report.nlargest(top, "messages"),
+        "top_senders_by_bytes": report.nlargest(top, "bytes"),
+        "top_domains_by_count": domains.nlargest(top, "messages"),
+        "top_domains_by_bytes": domains.nlargest(top, "bytes"),
+        "newsletter_candidates": candidates.nlargest(top, "messages"),
+    }
@@ -0,0 +1,302 @@
+import gzip
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Optional
+
+from loguru import logger
+
+from .uidset import UIDSet
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for .zst archives
+    zstandard = None
+
+EXPORT_CHUNK_SIZE = 1 << 20  # bytes per BODY.PEEK[]<offset.size> fetch
+QUEUE_DEPTH = 8  # chunks buffered between the IMAP reader and the disk writer
+COMMIT_EVERY = 100  # messages per fsync
+COMPRESSIONS = ("zstd", "gzip", "none")
+SUFFIXES = {"zstd": ".zst", "gzip": ".gz", "none": ""}
+
+_FROM_LINE = re.compile(rb"(?m)^(>*From )")
+
+
+def _open_frame(raw: BinaryIO, compression: str) -> BinaryIO:
+    """
+    Start a compressed frame (zstd frame / gzip member) on `raw`. Closing the
+    frame leaves `raw` open, and concatenated frames decompress as one stream.
+    """
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd export needs the 'zstandard' package")
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="wb")
+    return _Uncompressed(raw)
+
+
+class _FrameSink:
+    """Where a frame writes: the archive file until detached, then nowhere."""
+
+    def __init__(self, raw: BinaryIO):
+        self.raw: Optional[BinaryIO] = raw
+
+    def write(self, data: bytes) -> int:
+        return self.raw.write(data) if self.raw else len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+class _Uncompressed:
+    def __init__(self, raw: BinaryIO):
+        self.write = raw.write
+
+    def close(self) -> None:
+        pass
+
+
+def _fsync_dir(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class MboxWriter:
+    """
+    Appends messages to one compressed mboxrd file, one frame per message.
+    Each commit fsyncs, so every committed message is readable after a crash;
+    an abort truncates back to the start of the partial message only, so
+    finished messages stay pending like in MaildirWriter.
+    """
+
+    def __init__(self, path: Path, compression: str = "zstd"):
+        self.path = Path(f"{path}{SUFFIXES[compression]}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self._raw = open(self.path, "ab")
+        self._message_at = self._raw.tell()
+        self._frame = None
+        self._tail = b""
+        self._pending: List[int] = []
+
+    def begin(self, uid: int) -> None:
+        # Each message is its own frame, so an abort can cut exactly where it began
+        self._message_at = self._raw.tell()
+        self._sink = _FrameSink(self._raw)
+        self._frame = _open_frame(self._sink, self.compression)
+        self._uid = uid
+        self._tail = b""
+        self._frame.write(b"From MAILER-DAEMON " + time.asctime(time.gmtime()).encode() + b"\n")
+
+    def write(self, chunk: bytes) -> None:
+        # Only complete lines are escaped; a partial last line waits for the next chunk
+        data = self._tail + chunk
+        end = data.rfind(b"\n") + 1
+        self._tail = data[end:]
+        if end:
+            self._frame.write(_FROM_LINE.sub(rb">\1", data[:end].replace(b"\r\n", b"\n")))
+
+    def end(self) -> None:
+        tail = _FROM_LINE.sub(rb">\1", self._tail.rstrip(b"\r"))
+        self._frame.write(tail + b"\n\n" if tail else b"\n")
+        self._frame.close()
+        self._frame = None
+        self._pending.append(self._uid)
+
+    def abort(self) -> None:
+        """Drop the partial message; finished messages stay pending."""
+        if self._frame is None:
+            return
+        self._sink.raw = None  # closing the frame must not write its trailer here
+        self._frame.close()
+        self._frame = None
+        self._raw.seek(self._message_at)
+        self._raw.truncate()
+
+    def commit(self) -> List[int]:
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        committed, self._pending = self._pending, []
+        return committed
+
+    def close(self) -> None:
+        self.commit()
+        self._raw.close()
+
+
+class MaildirWriter:
+    """
+    Writes each message to `tmp/` and renames it into `new/` once complete
+    (the Maildir delivery protocol); a commit fsyncs the `new/` directory.
+    """
+
+    def __init__(self, path: Path, compression: str = "zstd"):
+        self.path = Path(path)
+        for sub in ("tmp", "new", "cur"):
+            (self.path / sub).mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+        self._count = 0
+        self._pending: List[int] = []
+        self._file = None
+
+    def begin(self, uid: int) -> None:
+        self._count += 1
+        self._uid = uid
+        self._name = (
+            f"{int(time.time())}.P{os.getpid()}Q{self._count}U{uid}."
+            f"{socket.gethostname()}{SUFFIXES[self.compression]}"
+        )
+        self._file = open(self.path / "tmp" / self._name, "wb")
+        self._frame = _open_frame(self._file, self.compression)
+
+    def write(self, chunk: bytes) -> None:
+        self._frame.write(chunk)
+
+    def end(self) -> None:
+        self._frame.close()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.rename(self.path / "tmp" / self._name, self.path / "new" / self._name)
+        self._pending.append(self._uid)
+
+    def abort(self) -> None:
+        """Drop the partial message; finished messages stay pending."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            (self.path / "tmp" / self._name).unlink(missing_ok=True)
+
+    def commit(self) -> List[int]:
+        if self._pending:
+            _fsync_dir(self.path / "new")
+        committed, self._pending = self._pending, []
+        return committed
+
+    def close(self) -> None:
+        self.abort()
+        self.commit()
+
+
+def open_writer(path: str, fmt: str = "mbox", compression: str = "zstd"):
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown export compression '{compression}'")
+    if fmt == "mbox":
+        return MboxWriter(Path(path), compression)
+    if fmt == "maildir":
+        return MaildirWriter(Path(path), compression)
+    raise ValueError(f"Unknown export format '{fmt}'")
+
+
+class MessageExporter:
+    """
+    Streams messages from IMAP into an archive writer before they are deleted.
+    The calling thread fetches `BODY.PEEK[]<offset.size>` chunks while a writer
+    thread compresses them to disk, so no message is ever held whole in memory.
+    `export()` returns only the UIDs whose messages were durably committed.
+    """
+
+    def __init__(
+        self,
+        writer,
+        senders: Optional[Iterable[str]] = None,
+        chunk_size: int = EXPORT_CHUNK_SIZE,
+        queue_depth: int = QUEUE_DEPTH,
+        commit_every: int = COMMIT_EVERY,
+    ):
+        self.writer = writer
+        self.senders = {s.strip().lower() for s in senders} if senders else None
+        self.chunk_size = chunk_size
+        self.queue_depth = queue_depth
+        self.commit_every = commit_every
+
+    @classmethod
+    def from_config(cls, config) -> Optional["MessageExporter"]:
+        """Exporter for the `export_*` config keys, or None if `export_path` is unset."""
+        if not config.get("export_path"):
+            return None
+        writer = open_writer(
+            config["export_path"],
+            config.get("export_format", "mbox"),
+            config.get("export_compression", "zstd"),
+        )
+        senders = config.get("export_senders") or None
+        if isinstance(senders, str):
+            senders = [senders]
+        return cls(writer, senders)
+
+    def wants(self, sender: str) -> bool:
+        return self.senders is None or sender.strip().lower() in self.senders
+
+    def export(self, cleaner, uids: UIDSet) -> UIDSet:
+        chunks: queue.Queue = queue.Queue(self.queue_depth)
+        exported = UIDSet()
+        failure: List[Exception] = []
+
+        def consume() -> None:
+            done = 0
+            while (item := chunks.get()) is not None:
+                if failure:
+                    continue  # drain so the producer never blocks
+                kind, uid, data = item
+                try:
+                    if kind == "begin":
+                        self.writer.begin(uid)
+                    elif kind == "data":
+                        self.writer.write(data)
+                    elif kind == "abort":
+                        self.writer.abort()
+                    else:
+                        self.writer.end()
+                        done += 1
+                        if done % self.commit_every == 0:
+                            for committed in self.writer.commit():
+                                exported.add(committed)
+                except Exception as e:
+                    logger.error(f"Export write failed at UID {uid}: {e}")
+                    failure.append(e)
+                    self.writer.abort()
+            try:
+                for committed in self.writer.commit():
+                    exported.add(committed)
+            except Exception as e:
+                logger.error(f"Export commit failed: {e}")
+
+        consumer = threading.Thread(target=consume, name="export-writer", daemon=True)
+        consumer.start()
+        try:
+            for uid in uids:
+                if failure:
+                    break
+                chunks.put(("begin", uid, None))
+                offset = 0
+                try:
+                    while True:
+                        data = cleaner.fetch_body_chunk(uid, offset, self.chunk_size)
+                        if data:
+                            chunks.put(("data", uid, data))
+                        offset += len(data)
+                        if len(data) < self.chunk_size:
+                            break
+                except Exception as e:
+                    logger.error(f"Export fetch failed for UID {uid}: {e}")
+                    chunks.put(("abort", uid, None))
+                    continue
+                chunks.put(("end", uid, None))
+        finally:
+            chunks.put(None)
+            consumer.join()
+        logger.info(f"Exported {len(exported)} of {len(uids)} messages")
+        return exported
+
+    def close(self) -> None:
+        self.writer.close()
@@ -0,0 +1,207 @@
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Union
+
+import duckdb
+import pandas as pd
+from loguru import logger
+
+from .metrics import RunMetrics
+
+TABLES = ("target_lists", "runs", "sender_results", "command_timings")
+
+
+class RunHistory:
+    """
+    DuckDB store for target lists and the outcome of every cleaning run.
+    All writes go through DataFrames so a whole run (or list) is one bulk insert.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = ":memory:"):
+        self.db_path = str(db_path)
+        self.conn = duckdb.connect(self.db_path)
+        self.initialise_database()
+
+    def initialise_database(self) -> None:
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS target_lists (
+                list_name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                added TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (list_name, email)
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                account TEXT,
+                mailbox TEXT,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                senders INTEGER,
+                deleted INTEGER,
+                bytes_reclaimed BIGINT,
+                errors INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS sender_results (
+                run_id TEXT,
+                sender TEXT,
+                deleted INTEGER,
+                bytes BIGINT,
+                errors TEXT
+            );
+            CREATE TABLE IF NOT EXISTS command_timings (
+                run_id TEXT,
+                command TEXT,
+                calls INTEGER,
+                seconds DOUBLE
+            );
+            """
+        )
+
+    def import_target_list(self, emails: List[str], list_name: str = "default") -> int:
+        """
+        Bulk-add addresses to a target list, skipping ones already present.
+        Returns the number of new addresses.
+        """
+        new_emails = pd.DataFrame({"email": [email.strip() for email in emails]})
+        new_emails = new_emails[new_emails["email"] != ""].drop_duplicates()
+        before = self._count_list(list_name)
+        self.conn.register("new_emails", new_emails)
+        try:
+            self.conn.execute(
+                """
+                INSERT INTO target_lists (list_name, email)
+                SELECT ?, email FROM new_emails
+                WHERE email NOT IN (SELECT email FROM target_lists WHERE list_name = ?)
+                """,
+                [list_name, list_name],
+            )
+        finally:
+            self.conn.unregister("new_emails")
+        added = self._count_list(list_name) - before
+        logger.info(f"Added {added} emails to target list {list_name}")
+        return added
+
+    def migrate_legacy_emails(self, list_name: str = "default") -> int:
+        """
+        Move the addresses of the `emails` table kept by older versions of the
+        Streamlit app into a target list (keeping when they were added), then
+        drop that table so the migration runs once. Returns the number moved.
+        """
+        legacy = self.conn.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = 'emails'"
+        ).fetchone()[0]
+        if not legacy:
+            return 0
+        before = self._count_list(list_name)
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            self.conn.execute(
+                """
+                INSERT INTO target_lists (list_name, email, added)
+                SELECT ?, trim(email), min(coalesce(added, current_timestamp)) FROM emails
+                WHERE trim(email) <> ''
+                AND trim(email) NOT IN (SELECT email FROM target_lists WHERE list_name = ?)
+                GROUP BY trim(email)
+                """,
+                [list_name, list_name],
+            )
+            self.conn.execute("DROP TABLE emails")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        moved = self._count_list(list_name) - before
+        logger.info(f"Migrated {moved} emails from the legacy emails table to list {list_name}")
+        return moved
+
+    def _count_list(self, list_name: str) -> int:
+        return self.conn.execute(
+            "SELECT count(*) FROM target_lists WHERE list_name = ?", [list_name]
+        ).fetchone()[0]
+
+    def load_target_list(self, list_name: str = "default") -> List[str]:
+        result = self.conn.execute(
+            "SELECT email FROM target_lists WHERE list_name = ? ORDER BY added, email",
+            [list_name],
+        ).fetchall()
+        return [email for (email,) in result]
+
+    def record_run(
+        self,
+        results: List[dict],
+        metrics: Optional[RunMetrics] = None,
+        account: str = "",
+        mailbox: str = "INBOX",
+    ) -> str:
+        """
+        Store one clean_mailbox run: a run row plus bulk inserts of per-sender
+        results and per-command timings. Returns the new run id.
+        """
+        metrics = metrics or RunMetrics()
+        run_id = uuid.uuid4().hex
+        senders = pd.DataFrame(
+            {
+                "run_id": run_id,
+                "sender": [result["sender"] for result in results],
+                "deleted": [result["deleted"] for result in results],
+                "bytes": [result.get("bytes", 0) for result in results],
+                "errors": ["; ".join(result["errors"]) for result in results],
+            }
+        )
+        timings = pd.DataFrame(
+            metrics.command_rows(), columns=["command", "calls", "seconds"]
+        )
+        timings.insert(0, "run_id", run_id)
+        run = pd.DataFrame(
+            [
+                {
+                    "run_id": run_id,
+                    "account": account,
+                    "mailbox": mailbox,
+                    "started_at": metrics.started_at,
+                    "finished_at": datetime.now(),
+                    "senders": len(results),
+                    "deleted": int(senders["deleted"].sum()),
+                    "bytes_reclaimed": metrics.bytes_reclaimed,
+                    "errors": int((senders["errors"] != "").sum()),
+                }
+            ]
+        )
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            for table, frame in (
+                ("runs", run),
+                ("sender_results", senders),
+                ("command_timings", timings),
+            ):
+                self.conn.register("frame", frame)
+                self.conn.execute(f"INSERT INTO {table} BY NAME SELECT * FROM frame")
+                self.conn.unregister("frame")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Recorded run {run_id}: {run['deleted'][0]} deleted")
+        return run_id
+
+    def runs(self) -> pd.DataFrame:
+        return self.conn.execute("SELECT * FROM runs ORDER BY started_at").df()
+
+    def export_parquet(self, directory: Union[str, Path]) -> List[Path]:
+        """
+        Write every history table to `<directory>/<table>.parquet`.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for table in TABLES:
+            path = directory / f"{table}.parquet"
+            self.conn.execute(f"COPY {table} TO '{path.as_posix()}' (FORMAT PARQUET)")
+            paths.append(path)
+        logger.info(f"Exported run history to {directory}")
+        return paths
+
+    def close(self) -> None:
+        self.conn.close()
@@ -4,21 +4,36 @@ import platform
 import re
 import subprocess
 import sys
+import time
 from getpass import getpass
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Callable, Iterator, List, Optional, Tuple, Union
 
 from configobj import ConfigObj
 from dotenv import load_dotenv
 from loguru import logger
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 from tqdm.autonotebook import tqdm
 
+from .budget import RunBudget, remaining_work
+from .capabilities import ServerStrategy, probe_capabilities
+from .compression import DeflateTransport
+from .export import MessageExporter
+from .metrics import RunMetrics
 from .pyproject import PythonProject
+from .replay import ReplayConnection, SessionRecorder
+from .response import RawResponses
+from .schedule import DEFAULT_SCHEDULE_FILE, FULL_SWEEP_DAYS, SenderSchedule
+from .throttle import AdaptiveLimits, is_throttle
+from .tls import handshake_seconds, session_reused, shared_ssl_context
+from .uidset import UIDSet, uid_windows
 
 # Load secrets environment variables from .env file
 load_dotenv()
 
+STORE_CHUNK_SIZE = 1000  # UIDs per batched UID STORE (rules); adaptive in clean_mailbox
+MAX_THROTTLE_RETRIES = 5  # consecutive throttled STOREs before a chunk is given up
+
 
 class ICloudConnectionError(Exception):
     """Custom exception for iCloud connection errors."""
@@ -51,10 +66,18 @@ class ICloudCleaner:
     ):
         self.config = ConfigObj(str(config_file))
         self.email_connection: Optional[imaplib.IMAP4_SSL] = None
+        self.transport: Optional[DeflateTransport] = None
+        self.strategy: Optional[ServerStrategy] = None
+        self.responses: Optional[RawResponses] = None
+        self.recorder: Optional[SessionRecorder] = None
         self.mode = mode
         self.is_connected = False
         self.username: Optional[str] = None
         self.password: Optional[str] = None
+        self.metrics = RunMetrics()
+        self.limits = AdaptiveLimits()
+        self.remaining: Optional[dict] = None
+        self.mailbox = "INBOX"
         self._setup_logging(log_level)
         if mode != "app":
             self._ensure_password()
@@ -68,6 +91,36 @@ class ICloudCleaner:
         logger.add(log_file, level="DEBUG", rotation="10 MB", compression="zip")
         logger.add(sys.stderr, level=log_level)
 
+    def connect(
+        self,
+        username: str,
+        password: str,
+        imap_server: Optional[str] = None,
+        imap_port: Optional[Union[str, int]] = None,
+        mailbox: str = "INBOX",
+    ) -> None:
+        """
+        Log in with explicit credentials (used by the web apps in "app" mode).
+        """
+        self.username = username
+        self.password = password
+        if imap_server:
+            self.config["imap_server"] = imap_server
+        if imap_port:
+            self.config["imap_port"] = str(imap_port)
+        self._connect(mailbox)
+
+    def select_mailbox(self, mailbox: str) -> None:
+        """
+        Switch the open connection to another folder.
+        """
+        self.ensure_connection()
+        status, data = self.email_connection.select(mailbox)
+        if status != "OK":
+            raise ICloudConnectionError(f"Failed to select {mailbox}: {data}")
+        self.mailbox = mailbox
+        logger.info(f"Selected mailbox {mailbox}")
+
     def ensure_connection(self):
         if not self.is_connected:
             if not self.username or not self.password:
@@ -91,25 +144,96 @@ class ICloudCleaner:
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
     )
     def _connect(self, mailbox: str = "INBOX") -> None:
+        """
+        Open the IMAP session on the shared SSL context (TLS sessions are resumed
+        across reconnects) and record TCP, TLS and LOGIN latency separately.
+        With `replay_file` the session is served from a recording instead;
+        with `record_file` it is recorded.
+        """
         try:
-            self.email_connection = imaplib.IMAP4_SSL(
-                self.config["imap_server"], int(self.config["imap_port"])
-            )
-            self.email_connection.login(self.username, self.password)
-            self.email_connection.select(mailbox)
+            host = self.config["imap_server"]
+            context = shared_ssl_context()
+            with self.metrics.timed("CONNECT"):
+                start = time.perf_counter()
+                if self.config.get("replay_file"):
+                    speed = float(self.config.get("replay_speed", 1.0))
+                    self.email_connection = ReplayConnection(
+                        self.config["replay_file"], speed=speed or None
+                    )
+                else:
+                    self.email_connection = imaplib.IMAP4_SSL(
+                        host, int(self.config["imap_port"]), ssl_context=context
+                    )
+                if self.config.get("record_file"):
+                    if self.recorder is None:
+                        self.recorder = SessionRecorder(
+                            self.config["record_file"], secrets=(self.username, self.password)
+                        )
+                    self.recorder.attach(self.email_connection)
+                opened = time.perf_counter() - start
+                sock = self.email_connection.sock
+                tls_seconds = handshake_seconds(sock)
+                # TCP includes reading the server greeting
+                self.metrics.record("TCP", opened - tls_seconds)
+                self.metrics.record(
+                    "TLS (resumed)" if session_reused(sock) else "TLS (full)", tls_seconds
+                )
+                with self.metrics.timed("LOGIN"):
+                    self.email_connection.login(self.username, self.password)
+                context.remember_session(host, sock)
+                self._probe_strategy()
+                self._setup_transport()
+                self.responses = RawResponses(self.email_connection)
+                self.email_connection.select(mailbox)
+            self.mailbox = mailbox
             self.is_connected = True
             logger.info(f"Successfully connected to iCloud - {mailbox}")
         except Exception as e:
             logger.error(f"Failed to connect: {e}")
             raise ICloudConnectionError(f"Failed to connect to iCloud: {e}")
 
+    def _probe_strategy(self) -> None:
+        """
+        Pick search/flag/move/expunge implementations from the server's
+        capabilities (probed once per host and cached with a TTL).
+        """
+        try:
+            capabilities = probe_capabilities(
+                self.email_connection, self.config["imap_server"]
+            )
+            self.strategy = ServerStrategy(capabilities)
+        except Exception as e:
+            logger.warning(f"Capability probe failed, using basic IMAP commands: {e}")
+            self.strategy = None
+
+    def _setup_transport(self) -> None:
+        """
+        Count IMAP traffic and negotiate COMPRESS=DEFLATE unless `compress = false`
+        (or the session is recorded or replayed, which happens above compression).
+        """
+        self.transport = DeflateTransport(self.email_connection)
+        enabled = self.config.as_bool("compress") if "compress" in self.config else True
+        enabled = enabled and not (self.recorder or self.config.get("replay_file"))
+        if enabled:
+            try:
+                self.transport.enable(self.strategy.capabilities if self.strategy else None)
+            except Exception as e:
+                logger.warning(f"Could not enable compression: {e}")
+
     @retry(
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
     )
-    def search_emails(self, sender: str) -> Optional[List[bytes]]:
+    def search_emails(
+        self, sender: Optional[str] = None, criteria: Optional[str] = None
+    ) -> Optional[List[bytes]]:
+        """
+        Search by sender, or by raw IMAP search `criteria` (e.g. from the rule planner).
+        """
         self.ensure_connection()
+        query = criteria or f'(FROM "{sender}")'
         try:
-            _, data = self.email_connection.search(None, f'(FROM "{sender}")')
+            with self.metrics.timed("SEARCH"):
+                _, data = self.email_connection.search(None, query)
             mail_ids = data[0]
             return mail_ids.split() if mail_ids else None
         except imaplib.IMAP4.error as e:
@@ -117,22 +241,147 @@ class ICloudCleaner:
                 logger.warning("Connection lost. Attempting to reconnect.")
                 self.is_connected = False
                 self.ensure_connection()
-                return self.search_emails(sender)
-            logger.error(f"Error searching emails from {sender}: {e}")
+                return self.search_emails(sender, criteria)
+            logger.error(f"Error searching emails with {query}: {e}")
             return None
 
     @retry(
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
     )
-    def set_deleted(self, email_uid: Union[str, bytes]) -> None:
+    def search_uids(self, criteria: str, uid_range: Optional[str] = None) -> UIDSet:
         """
-        Mark an email for deletion.
+        UID SEARCH, optionally limited to a UID window such as `1:50000`.
+        Returns the UIDs directly as a compact UIDSet (no per-message UID fetch).
         """
         self.ensure_connection()
+        query = f"UID {uid_range} {criteria}" if uid_range else criteria
         try:
-            self.email_connection.uid(
-                "STORE", bytes(str(email_uid).strip(), "ascii"), "+FLAGS", "(\\Deleted)"
+            with self.metrics.timed("UID SEARCH"):
+                if self.responses:
+                    esearch = bool(self.strategy and self.strategy.esearch)
+                    return self.responses.uid_search(query, esearch)
+                if self.strategy:
+                    return self.strategy.search(self.email_connection, query)
+                status, data = self.email_connection.uid("SEARCH", query)
+        except imaplib.IMAP4.error as e:
+            raise EmailSearchError(f"Error searching emails with {query}: {e}")
+        if status != "OK":
+            raise EmailSearchError(f"Error searching emails with {query}: {data}")
+        return UIDSet.from_search(data[0])
+
+    def search_many(self, criteria: List[str]) -> List[Union[UIDSet, EmailSearchError]]:
+        """
+        UID SEARCH for each of `criteria`, pipelined (all sent before the replies
+        are read) when the connection has raw responses. Failed searches come
+        back as EmailSearchError entries instead of raising; if the batch as a
+        whole fails, EmailSearchError is raised and the connection is dropped
+        so the next batch starts on a fresh one.
+        """
+        if not self.responses:
+            found = []
+            for query in criteria:
+                try:
+                    found.append(self.search_uids(query))
+                except Exception as e:
+                    found.append(EmailSearchError(str(e)))
+            return found
+        self.ensure_connection()
+        command = ("UID", "SEARCH")
+        if self.strategy and self.strategy.esearch:
+            command += ("RETURN (ALL)",)
+        found = []
+        start = time.perf_counter()
+        try:
+            replies = self.responses.pipeline(
+                [command + (query,) for query in criteria], len(criteria)
             )
+            for query, response in zip(criteria, replies):
+                if response.status == "OK":
+                    found.append(response.search)
+                else:
+                    found.append(
+                        EmailSearchError(f"Error searching emails with {query}: {response.text}")
+                    )
+        except Exception as e:
+            # Replies may still be in flight: start again on a fresh connection
+            self.is_connected = False
+            if is_throttle(e):
+                self.limits.pipeline.throttled()
+            raise EmailSearchError(f"Pipelined search failed: {e}")
+        elapsed = time.perf_counter() - start
+        for _ in criteria:
+            self.metrics.record("UID SEARCH", elapsed / len(criteria))
+        if any(isinstance(result, EmailSearchError) and is_throttle(result) for result in found):
+            self.limits.pipeline.throttled()
+        else:
+            self.limits.pipeline.success(elapsed)
+        return found
+
+    def _sender_searches(self, senders: List[str]) -> Iterator[Union[UIDSet, EmailSearchError]]:
+        """
+        Per-sender results of `search_many`, in batches as deep as the adaptive
+        pipeline limit. A batch is only sent once the previous one is used up,
+        so no reply is pending while the caller issues STOREs. A failed batch
+        is reported for its own senders only; later batches still run.
+        """
+        position = 0
+        while position < len(senders):
+            batch = senders[position : position + self.limits.pipeline.value]
+            position += len(batch)
+            try:
+                found = self.search_many([f'(FROM "{sender}")' for sender in batch])
+            except Exception as e:
+                error = e if isinstance(e, EmailSearchError) else EmailSearchError(str(e))
+                found = [error] * len(batch)
+            yield from found
+
+    def uid_next(self, mailbox: Optional[str] = None) -> int:
+        """
+        The next UID the server will assign in `mailbox` (default: the selected one),
+        i.e. the upper bound for UID windows.
+        """
+        self.ensure_connection()
+        mailbox = mailbox or self.mailbox
+        status, data = self.email_connection.status(mailbox, "(UIDNEXT)")
+        match = re.search(rb"UIDNEXT (\d+)", data[0] or b"") if status == "OK" else None
+        if not match:
+            raise EmailSearchError(f"Could not read UIDNEXT for {mailbox}: {data}")
+        return int(match[1])
+
+    def scan_windows(
+        self, criteria: str, window_size: int, upper: Optional[int] = None, lower: int = 1
+    ) -> Iterator[UIDSet]:
+        """
+        Yield the UIDs matching `criteria` one UID window at a time, so neither
+        the server reply nor the result held in memory grows with mailbox size.
+        """
+        for window in uid_windows(upper or self.uid_next(), window_size, lower):
+            uids = self.search_uids(criteria, window)
+            if uids:
+                yield uids
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception(lambda e: not is_throttle(e)),
+        reraise=True,
+    )
+    def set_deleted(self, email_uid: Union[str, bytes], silent: bool = False) -> None:
+        """
+        Mark an email (or a UID set such as `1:50,60`) for deletion.
+        `silent` uses +FLAGS.SILENT so the server does not echo every flag change.
+        A NO/BAD reply raises EmailDeletionError; throttling replies are raised
+        at once, without retries, so callers can back off (see flag_deleted).
+        """
+        self.ensure_connection()
+        item = "+FLAGS.SILENT" if silent else "+FLAGS"
+        try:
+            with self.metrics.timed("STORE"):
+                status, data = self.email_connection.uid(
+                    "STORE", bytes(str(email_uid).strip(), "ascii"), item, "(\\Deleted)"
+                )
+            if status != "OK":
+                raise imaplib.IMAP4.error(f"STORE {status} {data}")
             logger.info(f"Email UID {email_uid} marked for deletion.")
         except Exception as e:
             logger.error(f"Error setting email UID {email_uid} as deleted: {e}")
@@ -149,10 +398,13 @@ class ICloudCleaner:
         """
         self.ensure_connection()
         try:
-            _, uid_string = self.email_connection.fetch(email_id, "UID")
-            uid_str = [str(x, encoding="utf-8") for x in uid_string]
-            uid_res = re.search(r"\(UID (\d+)\)", uid_str[0])
-            return uid_res[1] if uid_res else None
+            with self.metrics.timed("FETCH"):
+                if self.responses:
+                    uids = self.responses.fetch(email_id.decode("ascii"), "(UID)").uids
+                    return str(uids[0]) if uids and uids[0] else None
+                _, uid_string = self.email_connection.fetch(email_id, "UID")
+            uid_res = re.search(rb"\(UID (\d+)\)", uid_string[0])
+            return uid_res[1].decode("ascii") if uid_res else None
         except Exception as e:
             logger.error(f"Error fetching UID for email ID {email_id}: {e}")
             return None
@@ -160,14 +412,87 @@ class ICloudCleaner:
     @retry(
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
     )
-    def safe_expunge(self):
-        """Expunge emails marked for deletion with retries."""
+    def fetch_size(self, email_ids: Union[List[bytes], UIDSet]) -> int:
+        """
+        Total RFC822.SIZE of the given messages (sequence numbers, or UIDs when
+        given a UIDSet), fetched in a single command.
+        """
+        self.ensure_connection()
+        try:
+            with self.metrics.timed("FETCH SIZE"):
+                if self.responses and isinstance(email_ids, UIDSet):
+                    return sum(
+                        self.responses.uid_fetch(email_ids.to_imap(), "(RFC822.SIZE)").sizes
+                    )
+                if isinstance(email_ids, UIDSet):
+                    _, data = self.email_connection.uid(
+                        "FETCH", email_ids.to_imap(), "(RFC822.SIZE)"
+                    )
+                else:
+                    _, data = self.email_connection.fetch(
+                        b",".join(email_ids), "(RFC822.SIZE)"
+                    )
+            return sum(
+                int(size)
+                for item in data
+                if isinstance(item, bytes)
+                for size in re.findall(rb"RFC822\.SIZE (\d+)", item)
+            )
+        except Exception as e:
+            logger.error(f"Error fetching sizes for {len(email_ids)} emails: {e}")
+            return 0
+
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
+    )
+    def fetch_body_chunk(self, uid: int, offset: int, size: int) -> bytes:
+        """
+        `size` bytes of a message starting at `offset` (BODY.PEEK[]<offset.size>),
+        without setting \\Seen. Shorter (or empty) once the end is reached.
+        """
+        self.ensure_connection()
+        with self.metrics.timed("FETCH BODY"):
+            status, data = self.email_connection.uid(
+                "FETCH", str(uid), f"(BODY.PEEK[]<{offset}.{size}>)"
+            )
+        if status != "OK":
+            raise EmailSearchError(f"Error fetching body of UID {uid}: {data}")
+        for item in data:
+            if isinstance(item, tuple):
+                return item[1]
+        return b""
+
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
+    )
+    def safe_expunge(self, uids: Optional[UIDSet] = None):
+        """
+        Expunge emails marked for deletion with retries. Given `uids` on a
+        UIDPLUS server, only those are expunged (UID EXPUNGE).
+        """
         self.ensure_connection()
         try:
-            self.email_connection.expunge()
+            with self.metrics.timed("EXPUNGE"):
+                if self.strategy:
+                    self.strategy.expunge(self.email_connection, uids)
+                else:
+                    self.email_connection.expunge()
         except Exception as e:
             logger.error(f"Error expunging mailbox: {e}")
 
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
+    )
+    def move_uids(self, uids: UIDSet, mailbox: str) -> None:
+        """
+        Move messages to another folder (UID MOVE, or COPY + delete without MOVE).
+        """
+        self.ensure_connection()
+        strategy = self.strategy or ServerStrategy(frozenset())
+        with self.metrics.timed("MOVE"):
+            strategy.move_to(self.email_connection, uids, mailbox)
+        logger.info(f"Moved {len(uids)} emails to {mailbox}")
+
     @retry(
         stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10)
     )
@@ -184,54 +509,283 @@ class ICloudCleaner:
                 self.email_connection = None
                 self.username = None
                 self.password = None
+                if self.recorder:
+                    self.recorder.close()
+                    self.recorder = None
 
     def clean_mailbox(
-        self, target_emails: List[str] = None, close_mail_app: bool = True
+        self,
+        target_emails: List[str] = None,
+        close_mail_app: bool = True,
+        on_result: Optional[Callable[[dict], None]] = None,
+        window_size: Optional[int] = None,
+        exporter: Optional[MessageExporter] = None,
+        budget: Optional[RunBudget] = None,
+        resume: Optional[dict] = None,
+        uid_range: Optional[Tuple[int, int]] = None,
     ) -> List[dict]:
         """
         Clean the mailbox by deleting emails from specified senders.
-        Returns a list of dicts with status for each sender.
+        All senders are flagged in one pass followed by a single expunge.
+        Returns a list of dicts with status for each sender; `on_result` is
+        called with each sender's dict as soon as it is done. Command timings
+        and bytes reclaimed for the run are kept in `self.metrics`.
+        When the server's capabilities are known, each sender costs one UID
+        SEARCH (ESEARCH if offered) and ranged silent UID STOREs, with a UIDPLUS
+        expunge of just those UIDs. With `window_size` (or `scan_window_size` in
+        the config), searches are also split by UID window (UID 1:N ...), bounding
+        memory and reply sizes on very large mailboxes.
+        With an `exporter` (or `export_path` in the config), matched messages are
+        archived first and only those durably exported are deleted.
+        With `schedule_file` in the config, senders are checked highest-yield
+        first and dormant ones only when their probing interval is up; a run
+        with a budget always does so (DEFAULT_SCHEDULE_FILE if none is set), so
+        the senders it gets to are the most productive ones.
+        With a `budget` (or `budget_*` in the config) the run stops at the next
+        sender or window boundary once a limit is hit, flushes and expunges, and
+        leaves a descriptor of the unfinished senders in `self.remaining`; pass
+        it back as `resume` to carry on.
+        With `uid_range` (first, last) only messages with UIDs in that range are
+        touched, so several workers can share one folder.
         """
+        if budget is None:
+            budget = RunBudget.from_config(self.config)
+        if budget:
+            budget.start()
+        self.remaining = None
+
         if close_mail_app and self.is_mail_app_running():
             logger.info("Mail app is being closed...")
             self.close_mail_app()
 
         if target_emails is None:
-            target_emails = self.load_target_emails()
+            target_emails = resume["senders"] if resume else self.load_target_emails()
+
+        schedule = None
+        full_sweep = False
+        schedule_file = self.config.get("schedule_file")
+        if budget and budget.limited and not schedule_file:
+            schedule_file = DEFAULT_SCHEDULE_FILE
+        if schedule_file:
+            schedule = SenderSchedule.load(
+                schedule_file,
+                int(self.config.get("full_sweep_days", FULL_SWEEP_DAYS)),
+            )
+            if not resume:
+                # Highest yield per search first, which also suits a budget
+                target_emails, full_sweep = schedule.plan(target_emails)
+
+        if window_size is None and self.config.get("scan_window_size"):
+            window_size = int(self.config["scan_window_size"])
+
+        own_exporter = exporter is None
+        if own_exporter:
+            exporter = MessageExporter.from_config(self.config)
 
         self.ensure_connection()
+        if resume and resume.get("mailbox", self.mailbox) != self.mailbox:
+            self.select_mailbox(resume["mailbox"])
+        self.metrics = self.metrics.next_run()
+        counters_start = self.transport.counters() if self.transport else (0, 0)
+        lower = 1
+        if uid_range:
+            lower, last = uid_range
+            window_size = window_size or last - lower + 1
+            upper = last + 1
+        else:
+            upper = self.uid_next() if window_size else None
+        use_uids = bool(window_size or self.strategy or exporter)
+        if self.strategy:
+            logger.info(f"Cleaning plan: {self.strategy.describe()}")
+        else:
+            logger.info("Cleaning plan: SEARCH + per-message UID FETCH/STORE, EXPUNGE")
+        if self.config.get("limits_file"):
+            self.limits = AdaptiveLimits.load(self.config["limits_file"], self.username)
+        searches = None
+        if use_uids and not window_size:
+            searches = self._sender_searches([email.strip() for email in target_emails])
+        flagged = UIDSet()
         results = []
         with tqdm(total=len(target_emails), desc="Overall progress") as pbar:
-            for target_email in target_emails:
+            for position, target_email in enumerate(target_emails):
+                done = len(flagged) if use_uids else sum(r["deleted"] for r in results)
+                reason = budget.exhausted(self.metrics, done) if budget else None
+                if reason:
+                    self._stop_early(reason, target_emails[position:], done)
+                    break
                 sender_result = {
                     "sender": target_email.strip(),
                     "deleted": 0,
+                    "bytes": 0,
                     "errors": [],
                 }
                 try:
-                    emails = self.search_emails(target_email)
-                    if emails:
-                        with tqdm(
-                            total=len(emails),
-                            desc=f"Processing {target_email}",
-                            leave=False,
-                        ) as email_pbar:
-                            for email in emails:
-                                uid = self.fetch_uid(email)
-                                if uid:
-                                    try:
-                                        self.set_deleted(uid)
-                                        sender_result["deleted"] += 1
-                                    except Exception as del_e:
-                                        sender_result["errors"].append(str(del_e))
-                                email_pbar.update(1)
-                    self.safe_expunge()
+                    if use_uids:
+                        found = next(searches) if searches else None
+                        if isinstance(found, Exception):
+                            raise found
+                        reason = self._clean_sender_uids(
+                            sender_result,
+                            flagged,
+                            window_size,
+                            upper,
+                            exporter,
+                            found,
+                            budget,
+                            lower,
+                        )
+                    else:
+                        self._clean_sender(sender_result)
                 except Exception as e:
                     sender_result["errors"].append(str(e))
                 results.append(sender_result)
+                if on_result:
+                    on_result(sender_result)
                 pbar.update(1)
+                if reason:
+                    # This sender was cut short, so it is the first to resume
+                    self._stop_early(reason, target_emails[position:], len(flagged))
+                    break
+        if exporter and own_exporter:
+            exporter.close()
+        if not use_uids:
+            self.safe_expunge()
+        elif flagged:
+            self.safe_expunge(flagged)
+        logger.info(f"Adaptive limits after run: {self.limits.describe()}")
+        if self.config.get("limits_file"):
+            self.limits.save(self.config["limits_file"], self.username)
+        if schedule:
+            schedule.record(results, full_sweep and self.remaining is None)
+            schedule.save(schedule_file)
+        self.metrics.bytes_reclaimed = sum(
+            result["bytes"] for result in results if result["deleted"]
+        )
+        if self.transport:
+            payload, wire = self.transport.counters()
+            self.metrics.payload_bytes = payload - counters_start[0]
+            self.metrics.wire_bytes = wire - counters_start[1]
+            logger.info(
+                f"IMAP traffic: {self.metrics.payload_bytes} bytes payload, "
+                f"{self.metrics.wire_bytes} bytes on the wire"
+            )
         return results
 
+    def _stop_early(self, reason: str, senders: List[str], flagged: int) -> None:
+        self.remaining = remaining_work(reason, self.mailbox, [s.strip() for s in senders], flagged)
+        logger.warning(
+            f"Run budget ({reason}) reached after {flagged} messages; "
+            f"{len(senders)} senders left for the next run"
+        )
+
+    def _clean_sender(self, sender_result: dict) -> None:
+        target_email = sender_result["sender"]
+        emails = self.search_emails(target_email)
+        if not emails:
+            return
+        sender_result["bytes"] = self.fetch_size(emails)
+        with tqdm(
+            total=len(emails),
+            desc=f"Processing {target_email}",
+            leave=False,
+        ) as email_pbar:
+            for email in emails:
+                uid = self.fetch_uid(email)
+                if uid:
+                    try:
+                        self.set_deleted(uid)
+                        sender_result["deleted"] += 1
+                    except Exception as del_e:
+                        sender_result["errors"].append(str(del_e))
+                email_pbar.update(1)
+
+    def _clean_sender_uids(
+        self,
+        sender_result: dict,
+        flagged: UIDSet,
+        window_size: Optional[int] = None,
+        upper: Optional[int] = None,
+        exporter: Optional[MessageExporter] = None,
+        found: Optional[UIDSet] = None,
+        budget: Optional[RunBudget] = None,
+        lower: int = 1,
+    ) -> Optional[str]:
+        """
+        Flag one sender's mail; `found` is its already (pipelined) searched UIDs.
+        Returns the budget limit that cut it short, if any.
+        """
+        criteria = f'(FROM "{sender_result["sender"]}")'
+        if found is not None:
+            windows = [found]
+        elif window_size:
+            windows = self.scan_windows(criteria, window_size, upper, lower)
+        else:
+            windows = [self.search_uids(criteria)]
+        cut = None
+        for uids in windows:
+            if not uids:
+                continue
+            if budget:
+                cut = budget.exhausted(self.metrics, len(flagged))
+                if cut:
+                    return cut
+                left = budget.messages_left(len(flagged))
+                if left is not None and len(uids) > left:
+                    uids, cut = next(uids.chunks(left)), "messages"
+            if exporter and exporter.wants(sender_result["sender"]):
+                exported = exporter.export(self, uids)
+                if len(exported) < len(uids):
+                    sender_result["errors"].append(
+                        f"{len(uids) - len(exported)} messages not exported, left in mailbox"
+                    )
+                uids = exported
+                if not uids:
+                    continue
+            sender_result["bytes"] += self.fetch_size(uids)
+            done, errors = self.flag_deleted(uids)
+            flagged.update(done)
+            sender_result["deleted"] += len(done)
+            sender_result["errors"].extend(errors)
+            if cut:
+                return cut
+        return None
+
+    def flag_deleted(self, uids: UIDSet) -> Tuple[UIDSet, List[str]]:
+        """
+        Flag `uids` \\Deleted with silent ranged UID STOREs. The chunk size
+        follows the adaptive `store_chunk` limit: it grows while STOREs are fast
+        and is halved (after a pause) when the server throttles, before the
+        chunk is retried. Returns the UIDs flagged and any errors; the caller
+        expunges.
+        """
+        flagged = UIDSet()
+        errors = []
+        remaining = uids
+        throttles = 0
+        while remaining:
+            chunk = next(remaining.chunks(self.limits.store_chunk.value))
+            start = time.perf_counter()
+            try:
+                self.set_deleted(chunk.to_imap(), silent=True)
+            except Exception as del_e:
+                if is_throttle(del_e) and throttles < MAX_THROTTLE_RETRIES:
+                    throttles += 1
+                    self.limits.store_chunk.throttled()
+                    logger.warning(
+                        f"Server throttling, STORE chunk now {self.limits.store_chunk.value}: {del_e}"
+                    )
+                    if getattr(self.email_connection, "state", None) == "LOGOUT":
+                        self.is_connected = False
+                    time.sleep(self.limits.store_chunk.backoff)
+                    continue
+                errors.append(str(del_e))
+            else:
+                flagged.update(chunk)
+                self.limits.store_chunk.success(time.perf_counter() - start)
+                throttles = 0
+            remaining = remaining - chunk
+        return flagged, errors
+
     def load_target_emails(self) -> List[str]:
         """
         Load target email addresses from a file specified in the configuration.
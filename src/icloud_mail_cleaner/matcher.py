@@ -0,0 +1,33 @@
+from email.parser import BytesHeaderParser
+from email.utils import parseaddr
+from typing import Dict, Iterable, Optional
+
+_header_parser = BytesHeaderParser()
+
+
+class SenderMatcher:
+    """
+    Case-insensitive exact match of a message's From address against the target
+    list. Used wherever headers are checked locally (IDLE daemon, offline files).
+    """
+
+    def __init__(self, target_emails: Iterable[str]):
+        # dict keeps the target list order for reporting
+        self.targets: Dict[str, None] = dict.fromkeys(
+            email.strip().lower() for email in target_emails if email.strip()
+        )
+
+    def __contains__(self, sender: str) -> bool:
+        return sender.lower() in self.targets
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    @staticmethod
+    def sender_of(header_block: bytes) -> str:
+        return parseaddr(str(_header_parser.parsebytes(header_block).get("From", "")))[1].lower()
+
+    def match(self, header_block: bytes) -> Optional[str]:
+        """The target address `header_block` is from, or None."""
+        sender = self.sender_of(header_block)
+        return sender if sender in self.targets else None
@@ -0,0 +1,55 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+# Recorded while opening the session, which may happen before the run starts
+CONNECT_COMMANDS = ("CONNECT", "TCP", "TLS (full)", "TLS (resumed)", "LOGIN")
+
+
+@dataclass
+class RunMetrics:
+    """
+    Per-run counters: IMAP command calls and time spent in each, bytes reclaimed,
+    and IMAP payload vs on-the-wire bytes (they differ when COMPRESS is active).
+    """
+
+    started_at: datetime = field(default_factory=datetime.now)
+    commands: Dict[str, List[float]] = field(default_factory=dict)  # name -> [calls, seconds]
+    bytes_reclaimed: int = 0
+    payload_bytes: int = 0
+    wire_bytes: int = 0
+
+    @property
+    def compression_savings(self) -> int:
+        return self.payload_bytes - self.wire_bytes
+
+    def record(self, command: str, seconds: float) -> None:
+        stats = self.commands.setdefault(command, [0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+
+    @contextmanager
+    def timed(self, command: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(command, time.perf_counter() - start)
+
+    def next_run(self) -> "RunMetrics":
+        """Fresh counters for a new run, keeping the timings of the connection it uses."""
+        return RunMetrics(
+            commands={
+                command: list(stats)
+                for command, stats in self.commands.items()
+                if command in CONNECT_COMMANDS
+            }
+        )
+
+    def command_rows(self) -> List[dict]:
+        return [
+            {"command": command, "calls": int(calls), "seconds": seconds}
+            for command, (calls, seconds) in self.commands.items()
+        ]
@@ -0,0 +1,201 @@
+import csv
+import mmap
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from loguru import logger
+
+from .matcher import SenderMatcher
+from .metrics import RunMetrics
+
+HEADER_LIMIT = 65536  # bytes searched for the end of a message's header block
+MAILDIR_CHUNK_SIZE = 500  # files per worker task
+
+_BLANK_LINE_RE = re.compile(rb"\r?\n\r?\n")
+
+
+def _header_block(data: bytes) -> bytes:
+    blank = _BLANK_LINE_RE.search(data)
+    return data[: blank.start()] if blank else data
+
+
+def mbox_messages(mm: mmap.mmap) -> Iterator[Tuple[int, int]]:
+    """
+    (start, end) offsets of each message in an mbox, `From ` line included.
+    Only the separators are searched for; message bodies are never read.
+    """
+    size = len(mm)
+    if mm[:5] == b"From ":
+        start = 0
+    else:
+        separator = mm.find(b"\nFrom ")
+        if separator < 0:
+            return
+        start = separator + 1
+    while start < size:
+        separator = mm.find(b"\nFrom ", start)
+        end = separator + 1 if separator >= 0 else size
+        yield start, end
+        start = end
+
+
+def _new_results(matcher: SenderMatcher) -> Dict[str, dict]:
+    return {
+        sender: {"sender": sender, "deleted": 0, "bytes": 0, "errors": []}
+        for sender in matcher.targets
+    }
+
+
+def clean_mbox(
+    path: Union[str, Path],
+    matcher: SenderMatcher,
+    output: Optional[Union[str, Path]] = None,
+    index: Optional[Union[str, Path]] = None,
+) -> List[dict]:
+    """
+    Memory-map an mbox and match each message's From header. Messages that do
+    not match are copied to `output` (a filtered mbox); matching ones are listed
+    in `index` as offset,length,sender rows. Returns per-sender results in the
+    same shape as `ICloudCleaner.clean_mailbox`.
+    """
+    results = _new_results(matcher)
+    out = open(output, "wb") if output else None
+    index_file = open(index, "w", newline="") if index else None
+    rows = csv.writer(index_file) if index_file else None
+    if rows:
+        rows.writerow(["offset", "length", "sender"])
+    try:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return list(results.values())
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(mm) as view:
+                    for start, end in mbox_messages(mm):
+                        headers_at = mm.find(b"\n", start, end) + 1 or end
+                        header_block = _header_block(
+                            mm[headers_at : min(end, headers_at + HEADER_LIMIT)]
+                        )
+                        sender = matcher.match(header_block)
+                        if sender is None:
+                            if out:
+                                out.write(view[start:end])
+                            continue
+                        results[sender]["deleted"] += 1
+                        results[sender]["bytes"] += end - start
+                        if rows:
+                            rows.writerow([start, end - start, sender])
+    finally:
+        if out:
+            out.close()
+        if index_file:
+            index_file.close()
+    return list(results.values())
+
+
+def maildir_files(path: Union[str, Path]) -> List[Path]:
+    path = Path(path)
+    return sorted(
+        entry for sub in ("cur", "new") if (path / sub).is_dir() for entry in (path / sub).iterdir()
+    )
+
+
+def scan_maildir_files(
+    paths: List[Path], target_emails: List[str]
+) -> List[Tuple[Path, int, Optional[str]]]:
+    """
+    (path, size, matched target or None) for each message file. Runs in a
+    worker process, reading only the first HEADER_LIMIT bytes of each file.
+    """
+    matcher = SenderMatcher(target_emails)
+    scanned = []
+    for message_path in paths:
+        with open(message_path, "rb") as file:
+            header_block = _header_block(file.read(HEADER_LIMIT))
+            size = os.fstat(file.fileno()).st_size
+        scanned.append((message_path, size, matcher.match(header_block)))
+    return scanned
+
+
+def _keep(message_path: Path, source: Path, output: Path) -> None:
+    """Hard-link (or copy, across filesystems) a kept message into `output`."""
+    target = output / message_path.relative_to(source)
+    try:
+        os.link(message_path, target)
+    except OSError:
+        shutil.copy2(message_path, target)
+
+
+def clean_maildir(
+    path: Union[str, Path],
+    matcher: SenderMatcher,
+    output: Optional[Union[str, Path]] = None,
+    index: Optional[Union[str, Path]] = None,
+    max_workers: Optional[int] = None,
+) -> List[dict]:
+    """
+    Match every message of a Maildir in a process pool. Messages that do not
+    match are linked into the `output` Maildir; matching ones are listed in
+    `index` as path,length,sender rows.
+    """
+    path = Path(path)
+    results = _new_results(matcher)
+    files = maildir_files(path)
+    chunks = [files[i : i + MAILDIR_CHUNK_SIZE] for i in range(0, len(files), MAILDIR_CHUNK_SIZE)]
+    if output:
+        output = Path(output)
+        for sub in ("tmp", "new", "cur"):
+            (output / sub).mkdir(parents=True, exist_ok=True)
+    index_file = open(index, "w", newline="") if index else None
+    rows = csv.writer(index_file) if index_file else None
+    if rows:
+        rows.writerow(["path", "length", "sender"])
+    targets = list(matcher.targets)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for scanned in executor.map(scan_maildir_files, chunks, [targets] * len(chunks)):
+                for message_path, size, sender in scanned:
+                    if sender is None:
+                        if output:
+                            _keep(message_path, path, output)
+                        continue
+                    results[sender]["deleted"] += 1
+                    results[sender]["bytes"] += size
+                    if rows:
+                        rows.writerow([message_path, size, sender])
+    finally:
+        if index_file:
+            index_file.close()
+    return list(results.values())
+
+
+def clean_offline(
+    path: Union[str, Path],
+    target_emails: List[str],
+    output: Optional[Union[str, Path]] = None,
+    index: Optional[Union[str, Path]] = None,
+    max_workers: Optional[int] = None,
+    metrics: Optional[RunMetrics] = None,
+) -> List[dict]:
+    """
+    Apply the target list to a local mbox file or Maildir directory instead of
+    a live server. The source is never modified.
+    """
+    matcher = SenderMatcher(target_emails)
+    metrics = metrics if metrics is not None else RunMetrics()
+    with metrics.timed("SCAN"):
+        if Path(path).is_dir():
+            results = clean_maildir(path, matcher, output, index, max_workers)
+        else:
+            results = clean_mbox(path, matcher, output, index)
+    metrics.bytes_reclaimed = sum(result["bytes"] for result in results)
+    logger.info(
+        f"Matched {sum(r['deleted'] for r in results)} messages "
+        f"({metrics.bytes_reclaimed} bytes) in {path}"
+    )
+    return results
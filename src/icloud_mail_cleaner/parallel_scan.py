@@ -0,0 +1,163 @@
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from .icloud_mail_cleaner import ICloudCleaner
+from .uidset import uid_windows
+
+RANGE_RETRIES = 2  # extra attempts per UID range, each on a fresh session
+RANGES_PER_SESSION = 4  # more ranges than sessions, so uneven ranges still balance
+
+
+def split_uid_space(upper: int, parts: int, lower: int = 1) -> List[Tuple[int, int]]:
+    """`parts` contiguous, near-equal (first, last) UID ranges covering lower..upper-1."""
+    total = max(0, upper - lower)
+    parts = max(1, min(parts, total))
+    ranges, first = [], lower
+    for part in range(parts):
+        last = first + total // parts + (part < total % parts) - 1
+        if last >= first:
+            ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+
+def fetch_range(
+    session: ICloudCleaner, first: int, last: int, items: str, chunk_size: int
+) -> Iterator[list]:
+    """imaplib UID FETCH replies for first..last in windows of `chunk_size` UIDs."""
+    for window in uid_windows(last + 1, chunk_size, first):
+        status, data = session.email_connection.uid("FETCH", window, items)
+        if status != "OK":
+            raise session.email_connection.error(f"FETCH {window} failed: {data}")
+        yield data
+
+
+@dataclass
+class RangeResult:
+    first: int
+    last: int
+    value: Any = None
+    error: Optional[str] = None
+    attempts: int = 0
+    seconds: float = 0.0
+
+
+class ParallelScanner:
+    """
+    Scans one folder's UID space on several IMAP sessions at once: the space
+    up to UIDNEXT is cut into contiguous ranges, each range runs on whichever
+    session is free, and results come back in UID order. A range that fails is
+    retried on a reconnected session. The session count defaults to the
+    account's learned connection limit and stops growing at the first refused
+    login (the server's session limit).
+    """
+
+    def __init__(
+        self,
+        cleaner: ICloudCleaner,
+        sessions: Optional[int] = None,
+        retries: int = RANGE_RETRIES,
+        ranges_per_session: int = RANGES_PER_SESSION,
+    ):
+        self.cleaner = cleaner
+        self.sessions = sessions or cleaner.limits.connections.value
+        self.retries = retries
+        self.ranges_per_session = ranges_per_session
+        self._extra: List[ICloudCleaner] = []
+
+    def _open_sessions(self, mailbox: str) -> List[ICloudCleaner]:
+        self.cleaner.select_mailbox(mailbox)
+        sessions = [self.cleaner]
+        while len(sessions) < self.sessions:
+            session = ICloudCleaner(self.cleaner.config.filename, mode="app")
+            try:
+                session.connect(self.cleaner.username, self.cleaner.password, mailbox=mailbox)
+            except Exception as e:
+                # A refused extra login is the server's session limit speaking
+                self.cleaner.limits.connections.throttled()
+                logger.warning(f"Scanning with {len(sessions)} sessions, another was refused: {e}")
+                break
+            self._extra.append(session)
+            sessions.append(session)
+        else:
+            self.cleaner.limits.connections.success()
+        return sessions
+
+    def _reconnect(self, session: ICloudCleaner, mailbox: str) -> None:
+        try:
+            session.email_connection.logout()
+        except Exception:
+            pass
+        session.is_connected = False
+        session.connect(self.cleaner.username, self.cleaner.password, mailbox=mailbox)
+
+    def scan(
+        self,
+        mailbox: str,
+        scan_range: Callable[[ICloudCleaner, int, int], Any],
+        upper: Optional[int] = None,
+    ) -> Iterator[RangeResult]:
+        """
+        Run `scan_range(session, first, last)` over the folder's UID space and
+        yield one RangeResult per range, in UID order, as soon as it and all
+        ranges before it are done.
+        """
+        upper = upper or self.cleaner.uid_next(mailbox)
+        sessions = self._open_sessions(mailbox)
+        ranges = split_uid_space(upper, len(sessions) * self.ranges_per_session)
+        idle: "queue.Queue[ICloudCleaner]" = queue.Queue()
+        for session in sessions:
+            idle.put(session)
+        logger.info(
+            f"Scanning {mailbox} (UIDs below {upper}) in {len(ranges)} ranges "
+            f"on {len(sessions)} sessions"
+        )
+
+        def run(first: int, last: int) -> RangeResult:
+            session = idle.get()
+            result = RangeResult(first, last)
+            start = time.perf_counter()
+            try:
+                while True:
+                    result.attempts += 1
+                    try:
+                        result.value = scan_range(session, first, last)
+                        return result
+                    except Exception as e:
+                        if result.attempts > self.retries:
+                            result.error = str(e)
+                            return result
+                        logger.warning(f"Range {first}:{last} failed ({e}), retrying")
+                        try:
+                            self._reconnect(session, mailbox)
+                        except Exception as reconnect_error:
+                            result.error = f"reconnect failed: {reconnect_error}"
+                            return result
+            finally:
+                result.seconds = time.perf_counter() - start
+                idle.put(session)
+
+        with ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+            futures = [executor.submit(run, first, last) for first, last in ranges]
+            for future in futures:
+                result = future.result()
+                self.cleaner.metrics.record("SCAN RANGE", result.seconds)
+                if result.error:
+                    logger.error(f"Range {result.first}:{result.last} gave up: {result.error}")
+                yield result
+
+    def close(self) -> None:
+        for session in self._extra:
+            session.close_connection()
+        self._extra = []
+
+    def __enter__(self) -> "ParallelScanner":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
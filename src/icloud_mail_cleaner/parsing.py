@@ -0,0 +1,162 @@
+import math
+import os
+import re
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from email.header import decode_header, make_header
+from email.parser import BytesHeaderParser
+from email.utils import parseaddr, parsedate_to_datetime
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+_MESSAGE_RE = re.compile(rb"\d+ \(")
+_UID_RE = re.compile(rb"UID (\d+)")
+_SIZE_RE = re.compile(rb"RFC822\.SIZE (\d+)")
+_DAY_RE = re.compile(rb'INTERNALDATE "\s?(\d{1,2}-\w{3}-\d{4})')
+
+_header_parser = BytesHeaderParser()
+
+
+def split_fetch(data: Iterable) -> Iterator[Tuple[bytes, bytes]]:
+    """
+    Split an imaplib FETCH reply into one (items, literal) pair per message.
+    `items` is everything outside the literal, including what the server sent
+    after it (item order differs between servers); `literal` is b"" when the
+    message came as a plain line.
+    """
+    items, literal = None, b""
+    for element in data:
+        if isinstance(element, tuple):
+            if items is not None:
+                yield items, literal
+            items, literal = element[0], element[1] or b""
+        elif isinstance(element, bytes):
+            if _MESSAGE_RE.match(element):
+                if items is not None:
+                    yield items, literal
+                items, literal = element, b""
+            elif items is not None:
+                items += element
+    if items is not None:
+        yield items, literal
+
+
+def item_uid(items: bytes) -> int:
+    """The UID in a message's FETCH items, 0 if there is none."""
+    uid = _UID_RE.search(items)
+    return int(uid[1]) if uid else 0
+
+
+def item_size(items: bytes) -> int:
+    """The RFC822.SIZE in a message's FETCH items, 0 if there is none."""
+    size = _SIZE_RE.search(items)
+    return int(size[1]) if size else 0
+
+
+def item_day(items: bytes) -> Optional[bytes]:
+    """The day of the INTERNALDATE in a message's FETCH items, e.g. `b"1-Jan-2026"`."""
+    day = _DAY_RE.search(items)
+    return day[1] if day else None
+
+
+def parse_header_fetch(data: Iterable) -> Iterator[Tuple[int, int, bytes]]:
+    """Turn an imaplib FETCH reply into (uid, size, header block) triples."""
+    for items, header_block in split_fetch(data):
+        if header_block:
+            yield item_uid(items), item_size(items), header_block
+
+
+def decode_words(value: str) -> str:
+    """Decode RFC 2047 encoded-words (`=?utf-8?q?...?=`), leaving bad input as is."""
+    if "=?" not in value:
+        return value
+    try:
+        return str(make_header(decode_header(value)))
+    except (ValueError, LookupError):
+        return value
+
+
+def _timestamp(value: Optional[str]) -> float:
+    if not value:
+        return math.nan
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return math.nan
+
+
+def parse_header_chunk(data: Iterable) -> dict:
+    """
+    Parse one FETCH reply into columns: uid, bytes, sender (normalised address),
+    name and subject (RFC 2047 decoded), date (epoch seconds, NaN if missing)
+    and newsletter (List-Id or List-Unsubscribe present). Numeric columns are
+    arrays. Pure CPU work with picklable input and output, so it can run in a
+    worker process.
+    """
+    columns = {
+        "uid": array("I"),
+        "bytes": array("Q"),
+        "sender": [],
+        "name": [],
+        "subject": [],
+        "date": array("d"),
+        "newsletter": [],
+    }
+    for uid, size, header_block in parse_header_fetch(data):
+        headers = _header_parser.parsebytes(header_block)
+        name, address = parseaddr(str(headers.get("From", "")))
+        columns["uid"].append(uid)
+        columns["bytes"].append(size)
+        columns["sender"].append(address.strip().lower())
+        columns["name"].append(decode_words(name))
+        columns["subject"].append(decode_words(str(headers.get("Subject", ""))))
+        columns["date"].append(_timestamp(headers.get("Date")))
+        columns["newsletter"].append(
+            headers.get("List-Id") is not None or headers.get("List-Unsubscribe") is not None
+        )
+    return columns
+
+
+class ParallelHeaderParser:
+    """
+    Runs `parse_header_chunk` on raw FETCH replies in a process pool while the
+    caller keeps reading from the network. `submit()` returns the chunks already
+    parsed (in submission order) and blocks only when `max_pending` chunks are
+    in flight. With `max_workers=0` chunks are parsed inline.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.max_pending = max_pending or 2 * max(max_workers, 1)
+        self._executor = ProcessPoolExecutor(max_workers) if max_workers else None
+        self._pending: Deque[Future] = deque()
+
+    def __enter__(self) -> "ParallelHeaderParser":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, data: list) -> List[dict]:
+        if self._executor is None:
+            return [parse_header_chunk(data)]
+        self._pending.append(self._executor.submit(parse_header_chunk, data))
+        parsed = []
+        while self._pending and (
+            self._pending[0].done() or len(self._pending) > self.max_pending
+        ):
+            parsed.append(self._pending.popleft().result())
+        return parsed
+
+    def drain(self) -> Iterator[dict]:
+        while self._pending:
+            yield self._pending.popleft().result()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown()
+            self._executor = None
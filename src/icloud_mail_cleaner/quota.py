@@ -0,0 +1,156 @@
+from array import array
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from tqdm.autonotebook import tqdm
+
+from .icloud_mail_cleaner import ICloudCleaner
+from .parsing import item_day, item_size, item_uid, split_fetch
+from .uidset import UIDSet, uid_windows
+
+DEFAULT_CHUNK_SIZE = 5000
+FETCH_ITEMS = "(UID RFC822.SIZE INTERNALDATE)"
+MB = 1024 * 1024
+
+_day_ordinals: Dict[bytes, int] = {}
+
+
+def day_ordinal(day: bytes) -> int:
+    """`b"1-Jan-2026"` -> proleptic ordinal; memoised, a mailbox spans few distinct days."""
+    ordinal = _day_ordinals.get(day)
+    if ordinal is None:
+        ordinal = datetime.strptime(day.decode("ascii"), "%d-%b-%Y").toordinal()
+        _day_ordinals[day] = ordinal
+    return ordinal
+
+
+def parse_size_fetch(data: Iterable, uids: array, sizes: array, days: array) -> None:
+    """
+    Append UID, RFC822.SIZE and INTERNALDATE (as a day ordinal) of each FETCH
+    reply message to the given arrays.
+    """
+    for items, _ in split_fetch(data):
+        uid = item_uid(items)
+        if not uid:
+            continue
+        day = item_day(items)
+        uids.append(uid)
+        sizes.append(item_size(items))
+        days.append(day_ordinal(day) if day else 0)
+
+
+def scan_sizes(
+    cleaner: ICloudCleaner, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    UIDs, sizes and received days of every message in the selected mailbox,
+    fetched in UID windows into compact arrays (16 bytes per message).
+    """
+    uids, sizes, days = array("I"), array("Q"), array("I")
+    windows = list(uid_windows(cleaner.uid_next(), chunk_size))
+    for window in tqdm(windows, desc=f"Sizing {cleaner.mailbox}"):
+        with cleaner.metrics.timed("FETCH SIZE"):
+            status, data = cleaner.email_connection.uid("FETCH", window, FETCH_ITEMS)
+        if status != "OK":
+            logger.error(f"FETCH {window} failed: {data}")
+            continue
+        parse_size_fetch(data, uids, sizes, days)
+    order = np.argsort(np.frombuffer(uids, dtype=np.uint32), kind="stable")
+    return (
+        np.frombuffer(uids, dtype=np.uint32)[order],
+        np.frombuffer(sizes, dtype=np.uint64)[order],
+        np.frombuffer(days, dtype=np.uint32)[order],
+    )
+
+
+def in_uidset(uids: np.ndarray, uid_set: UIDSet) -> np.ndarray:
+    """Vectorised membership of `uids` in `uid_set` (one binary search per UID)."""
+    if not uid_set:
+        return np.zeros(len(uids), dtype=bool)
+    starts, ends = (np.array(column, dtype=np.uint32) for column in zip(*uid_set.ranges()))
+    index = np.searchsorted(starts, uids, side="right") - 1
+    return (index >= 0) & (uids <= ends[np.maximum(index, 0)])
+
+
+def select_for_quota(
+    sizes: np.ndarray, days: np.ndarray, candidates: np.ndarray, target_bytes: int
+) -> np.ndarray:
+    """
+    Indices of the fewest candidate messages whose sizes add up to at least
+    `target_bytes`: largest first, older first among equal sizes. All
+    candidates are returned if even they fall short; none when there is
+    nothing to reclaim.
+    """
+    if target_bytes <= 0:
+        return np.zeros(0, dtype=np.intp)
+    index = np.flatnonzero(candidates)
+    order = index[np.lexsort((days[index], -sizes[index].astype(np.int64)))]
+    reclaimed = np.cumsum(sizes[order])
+    count = int(np.searchsorted(reclaimed, target_bytes, side="left")) + 1
+    return order[: min(count, len(order))]
+
+
+def reclaim_quota(
+    cleaner: ICloudCleaner,
+    target_mb: float,
+    target_emails: Optional[List[str]] = None,
+    larger_than: Optional[int] = None,
+    older_than_days: Optional[int] = None,
+    dry_run: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    today: Optional[date] = None,
+) -> dict:
+    """
+    Free at least `target_mb` MB with as few deletions as possible. Candidates are
+    messages from the target senders, plus any message at least `larger_than`
+    bytes or `older_than_days` old. Deletion reuses the cleaner's batched UID
+    STORE and expunge; with `dry_run` only the selection is reported.
+    """
+    if target_emails is None:
+        target_emails = cleaner.load_target_emails()
+    today = today or date.today()
+    target_bytes = int(target_mb * MB)
+
+    cleaner.ensure_connection()
+    targets = UIDSet()
+    for sender in target_emails:
+        targets.update(cleaner.search_uids(f'(FROM "{sender.strip()}")'))
+    uids, sizes, days = scan_sizes(cleaner, chunk_size)
+
+    candidates = in_uidset(uids, targets)
+    if larger_than is not None:
+        candidates |= sizes >= larger_than
+    if older_than_days is not None:
+        candidates |= (days > 0) & (days <= today.toordinal() - older_than_days)
+    chosen = select_for_quota(sizes, days, candidates, target_bytes)
+
+    selected = UIDSet(uids[chosen].tolist())
+    report = {
+        "target_bytes": target_bytes,
+        "candidates": int(candidates.sum()),
+        "candidate_bytes": int(sizes[candidates].sum()),
+        "selected": len(selected),
+        "bytes": int(sizes[chosen].sum()),
+        "deleted": 0,
+        "errors": [],
+    }
+    if report["bytes"] < target_bytes:
+        logger.warning(
+            f"Candidates only hold {report['bytes'] / MB:.1f} MB of the {target_mb} MB requested"
+        )
+    logger.info(
+        f"Selected {report['selected']} of {report['candidates']} candidates "
+        f"({report['bytes'] / MB:.1f} MB)"
+    )
+    if dry_run or not selected:
+        return report
+
+    flagged, report["errors"] = cleaner.flag_deleted(selected)
+    if not flagged:
+        return report
+    cleaner.safe_expunge(flagged)
+    report["deleted"] = len(flagged)
+    cleaner.metrics.bytes_reclaimed += int(sizes[chosen][in_uidset(uids[chosen], flagged)].sum())
+    return report
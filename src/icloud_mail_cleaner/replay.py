@@ -0,0 +1,256 @@
+import atexit
+import gzip
+import hashlib
+import imaplib
+import json
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+from loguru import logger
+
+RECORDING_VERSION = 1
+
+_COMMAND_RE = re.compile(rb"([A-Za-z]*\d+) (.*?)\r?\n?$", re.DOTALL)
+_CREDENTIALS_RE = re.compile(rb"^(LOGIN|AUTHENTICATE) .*$", re.IGNORECASE | re.DOTALL)
+_ADDRESS_RE = re.compile(rb"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+_ALPHABET = b"abcdefghijklmnopqrstuvwxyz"
+
+
+def redact_address(address: Union[str, bytes]) -> str:
+    """
+    Stable same-length pseudonym of an e-mail address ("@" and "." stay in
+    place), so literal sizes in a recording stay valid and the same sender is
+    the same pseudonym everywhere. Use it to turn a target list into the one
+    matching a recording.
+    """
+    raw = address.encode() if isinstance(address, str) else address
+    digest = hashlib.blake2b(raw.lower(), digest_size=32).digest()
+    out = bytearray()
+    for position, char in enumerate(raw):
+        keep = char in b"@."
+        out.append(char if keep else _ALPHABET[digest[position % 32] % 26])
+    return out.decode("ascii")
+
+
+def command_key(command: bytes) -> bytes:
+    """A command without its tag and credentials: how recorded exchanges are looked up."""
+    return _CREDENTIALS_RE.sub(lambda m: m.group(1).upper() + b" <redacted>", command.strip())
+
+
+class SessionRecorder:
+    """
+    Records an IMAP session (each command, the server's reply and when every
+    piece of it arrived relative to the command) into a gzipped JSON-lines file
+    for ReplayConnection. Sits on `conn.send`/`readline`/`read` like
+    DeflateTransport, so attach it before compression is negotiated. Addresses
+    are replaced by same-length pseudonyms, LOGIN arguments are dropped and
+    `secrets` are masked; unsolicited data outside any command is not kept.
+    """
+
+    def __init__(self, path: Union[str, Path], secrets: Iterable[Optional[str]] = ()):
+        self.path = Path(path)
+        self.secrets = [s.encode() for s in secrets if s]
+        self._file = None
+        self._lock = threading.Lock()
+        self._pending: Dict[bytes, dict] = {}  # tag -> exchange awaiting its completion
+        self._current: Optional[dict] = None  # exchange the last line went to
+        self.exchanges = 0
+
+    def attach(self, conn: imaplib.IMAP4) -> None:
+        """Record `conn` from now on; one recorder may follow several reconnects."""
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = gzip.open(self.path, "wt", encoding="latin-1")
+                header = {
+                    "version": RECORDING_VERSION,
+                    "welcome": self.redact(getattr(conn, "welcome", b"* OK")).decode("latin-1"),
+                    "capabilities": list(getattr(conn, "capabilities", ())),
+                }
+                self._file.write(json.dumps(header) + "\n")
+                atexit.register(self.close)
+                logger.info(f"Recording IMAP session to {self.path}")
+            self._pending.clear()
+            self._current = None
+        self._read, self._readline, self._send = conn.read, conn.readline, conn.send
+        conn.read, conn.readline, conn.send = self.read, self.readline, self.send
+
+    def redact(self, data: bytes) -> bytes:
+        data = _ADDRESS_RE.sub(lambda m: redact_address(m.group()).encode("ascii"), data)
+        for secret in self.secrets:
+            data = data.replace(secret, b"x" * len(secret))
+        return data
+
+    def send(self, data: bytes) -> None:
+        now = time.perf_counter()
+        self._send(data)
+        with self._lock:
+            for line in data.splitlines(keepends=True):
+                match = _COMMAND_RE.fullmatch(line)
+                if not match:
+                    continue  # literal data or a continuation such as DONE
+                tag, command = match.groups()
+                self._pending[tag] = {
+                    "tag": tag.decode("ascii"),
+                    "command": self.redact(command_key(command)).decode("latin-1"),
+                    "sent": now,
+                    "offsets": [],
+                    "data": [],
+                }
+
+    def _received(self, data: bytes, exchange: Optional[dict]) -> None:
+        if exchange is None:
+            return
+        offset = round((time.perf_counter() - exchange["sent"]) * 1000, 1)
+        data = self.redact(data).decode("latin-1")
+        if exchange["offsets"] and exchange["offsets"][-1] == offset:
+            exchange["data"][-1] += data  # same arrival, keeps the file compact
+        else:
+            exchange["offsets"].append(offset)
+            exchange["data"].append(data)
+
+    def readline(self) -> bytes:
+        line = self._readline()
+        with self._lock:
+            tag = line.split(b" ", 1)[0]
+            exchange = self._pending.pop(tag, None)
+            if exchange is not None:
+                self._received(line, exchange)
+                self._write(exchange)
+                self._current = None
+            else:
+                # Untagged data and continuations answer the oldest open command
+                self._current = next(iter(self._pending.values()), None)
+                self._received(line, self._current)
+        return line
+
+    def read(self, size: int) -> bytes:
+        data = self._read(size)
+        with self._lock:
+            self._received(data, self._current)
+        return data
+
+    def _write(self, exchange: dict) -> None:
+        if self._file is None:
+            return
+        record = {key: exchange[key] for key in ("tag", "command", "offsets", "data")}
+        self._file.write(json.dumps(record) + "\n")
+        self.exchanges += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            for exchange in self._pending.values():
+                self._write(exchange)
+            self._pending.clear()
+            self._file.close()
+            self._file = None
+        logger.info(f"Recorded {self.exchanges} IMAP exchanges to {self.path}")
+
+
+def load_recording(path: Union[str, Path]) -> Tuple[dict, List[dict]]:
+    """The header and the exchanges of a SessionRecorder file."""
+    with gzip.open(path, "rt", encoding="latin-1") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording version {header.get('version')}")
+        return header, [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayConnection(imaplib.IMAP4):
+    """
+    An imaplib connection served from a SessionRecorder file instead of a
+    server. Each command gets the reply recorded for the same command text
+    (tag and credentials aside), in recording order, delivered with the
+    recorded timing divided by `speed` (None: as fast as possible). Commands
+    that were never recorded fail with NO [REPLAY]; NOOP and LOGOUT always
+    succeed.
+    """
+
+    def __init__(self, path: Union[str, Path], speed: Optional[float] = 1.0):
+        self.recording = Path(path)
+        self.speed = speed
+        header, exchanges = load_recording(path)
+        self._welcome = header["welcome"].encode("latin-1")
+        self._recorded_capabilities = tuple(header["capabilities"])
+        self._exchanges: Dict[bytes, Deque[dict]] = {}
+        for exchange in exchanges:
+            key = exchange["command"].encode("latin-1")
+            self._exchanges.setdefault(key, deque()).append(exchange)
+        self._segments: Deque[Tuple[float, bytes]] = deque()
+        self._last_due = 0.0
+        self._buffer = bytearray()
+        super().__init__(str(path))
+
+    def open(self, host: str = "", port: int = imaplib.IMAP4_PORT, timeout=None) -> None:
+        self.host, self.port = host, port
+        self.sock = self.file = None
+        self._queue(time.perf_counter(), [(0.0, self._welcome + b"\r\n")])
+
+    def _get_capabilities(self) -> None:
+        # The pre-login CAPABILITY round trip happened before recording began
+        self.capabilities = self._recorded_capabilities
+
+    def shutdown(self) -> None:
+        self._segments.clear()
+        self._buffer.clear()
+
+    def send(self, data: bytes) -> None:
+        now = time.perf_counter()
+        for line in data.splitlines(keepends=True):
+            match = _COMMAND_RE.fullmatch(line)
+            if match:
+                self._answer(now, *match.groups())
+
+    def _answer(self, now: float, tag: bytes, command: bytes) -> None:
+        key = command_key(command)
+        recorded = self._exchanges.get(key)
+        if recorded:
+            exchange = recorded.popleft()
+            old = exchange["tag"].encode("ascii")
+            pieces = []
+            for offset, text in zip(exchange["offsets"], exchange["data"]):
+                data = text.encode("latin-1").replace(b'TAG "%s"' % old, b'TAG "%s"' % tag)
+                data = re.sub(rb"(^|\n)" + re.escape(old) + rb" ", rb"\g<1>" + tag + b" ", data)
+                pieces.append((offset / 1000, data))
+            self._queue(now, pieces)
+        elif key.upper() in (b"NOOP", b"LOGOUT"):
+            bye = b"* BYE replay finished\r\n" if key.upper() == b"LOGOUT" else b""
+            self._queue(now, [(0.0, bye + tag + b" OK completed\r\n")])
+        else:
+            logger.warning(f"Replay has no recorded reply for {key!r}")
+            self._queue(now, [(0.0, tag + b" NO [REPLAY] command not in recording\r\n")])
+
+    def _queue(self, now: float, pieces: List[Tuple[float, bytes]]) -> None:
+        for offset, data in pieces:
+            due = now + offset / self.speed if self.speed else now
+            self._last_due = max(self._last_due, due)  # the server answers in order
+            self._segments.append((self._last_due, data))
+
+    def _fill(self) -> None:
+        if not self._segments:
+            raise imaplib.IMAP4.abort("replay: no more recorded data")
+        due, data = self._segments.popleft()
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self._buffer += data
+
+    def readline(self) -> bytes:
+        while (end := self._buffer.find(b"\n")) < 0:
+            self._fill()
+        line = bytes(self._buffer[: end + 1])
+        del self._buffer[: end + 1]
+        return line
+
+    def read(self, size: int) -> bytes:
+        while len(self._buffer) < size:
+            self._fill()
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
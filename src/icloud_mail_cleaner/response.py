@@ -0,0 +1,145 @@
+import imaplib
+import re
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Iterable, Iterator, Tuple
+
+from .uidset import UIDSet
+
+_LITERAL_RE = re.compile(rb"\{(\d+)\}\r\n$")
+_FETCH_RE = re.compile(rb"\* \d+ FETCH \(")
+_ITEM_RE = re.compile(rb"(UID|RFC822\.SIZE) (\d+)")
+_NUMBER_RE = re.compile(rb"\d+")
+
+
+@dataclass
+class Response:
+    """
+    Untagged FETCH/SEARCH/ESEARCH data of one command, in columns: one entry
+    per FETCH in `uids`/`sizes` (0 when not requested), literal bytes packed
+    into `buffer` with per-message offsets, and SEARCH results as a UIDSet.
+    """
+
+    uids: array = field(default_factory=lambda: array("I"))
+    sizes: array = field(default_factory=lambda: array("Q"))
+    starts: array = field(default_factory=lambda: array("Q"))
+    ends: array = field(default_factory=lambda: array("Q"))
+    buffer: bytearray = field(default_factory=bytearray)
+    search: UIDSet = field(default_factory=UIDSet)
+    status: str = "OK"
+    text: str = ""
+
+    def literals(self) -> Iterator[memoryview]:
+        """Each message's (last) literal as a zero-copy view into `buffer`."""
+        view = memoryview(self.buffer)
+        for start, end in zip(self.starts, self.ends):
+            yield view[start:end]
+
+
+class RawResponses:
+    """
+    Issues commands on an imaplib connection and parses the reply line by line
+    as it is read, instead of letting imaplib build lists of tuples and copying
+    literals into them. Item values go straight into arrays and literals are
+    appended once to a single buffer. Reads go through `conn.readline`/`conn.read`,
+    so a DeflateTransport on the connection keeps working. Untagged data other
+    than FETCH/SEARCH/ESEARCH (EXISTS, EXPUNGE, ...) is skipped.
+    """
+
+    def __init__(self, conn: imaplib.IMAP4):
+        self.conn = conn
+
+    def command(self, *args: str) -> Response:
+        response = self.read(self.send(*args))
+        if response.status != "OK":
+            raise imaplib.IMAP4.error(f"{response.status} {response.text}")
+        return response
+
+    def send(self, *args: str) -> bytes:
+        """Send a command without waiting for its reply; returns its tag."""
+        tag = self.conn._new_tag()
+        self.conn.tagged_commands.pop(tag, None)
+        self.conn.send(tag + b" " + " ".join(args).encode("ascii") + b"\r\n")
+        return tag
+
+    def pipeline(self, commands: Iterable[Tuple[str, ...]], depth: int) -> Iterator[Response]:
+        """
+        Run `commands` with up to `depth` in flight, hiding one round trip per
+        command. The server answers in order, so replies are read in order too.
+        Failed commands come back with their `status`; the generator must be
+        consumed fully before the connection is used for anything else.
+        """
+        in_flight: Deque[bytes] = deque()
+        for args in commands:
+            in_flight.append(self.send(*args))
+            if len(in_flight) >= depth:
+                yield self.read(in_flight.popleft())
+        while in_flight:
+            yield self.read(in_flight.popleft())
+
+    def read(self, tag: bytes) -> Response:
+        """
+        Read and parse the reply to `tag`, up to and including its tagged status
+        (kept in `status`/`text`, not raised, so pipelined replies stay in step).
+        """
+        response = Response()
+        tagged = tag + b" "
+        while True:
+            line = self.conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("socket error: EOF")
+            if line.startswith(tagged):
+                status, _, text = line[len(tagged) :].decode("ascii", "replace").partition(" ")
+                response.status, response.text = status.strip(), text.strip()
+                return response
+            self._parse_line(line, response)
+            literal = _LITERAL_RE.search(line)
+            if literal:
+                data = self.conn.read(int(literal[1]))
+                if response.uids:
+                    response.starts[-1] = len(response.buffer)
+                    response.buffer += data
+                    response.ends[-1] = len(response.buffer)
+
+    @staticmethod
+    def _parse_line(line: bytes, response: Response) -> None:
+        """
+        Parse one line (or the part of a FETCH after a literal). A new FETCH
+        opens a row; UID/RFC822.SIZE items fill the current row.
+        """
+        if line.startswith(b"* "):
+            if _FETCH_RE.match(line):
+                for column in (response.uids, response.sizes, response.starts, response.ends):
+                    column.append(0)
+            elif line.startswith(b"* SEARCH"):
+                for number in _NUMBER_RE.finditer(line, 8):
+                    response.search.add(int(number[0]))
+                return
+            elif line.startswith(b"* ESEARCH"):
+                tokens = line.split()
+                if b"ALL" in tokens:
+                    all_uids = tokens[tokens.index(b"ALL") + 1].decode("ascii")
+                    response.search.update(UIDSet.parse(all_uids))
+                return
+            else:
+                return
+        if not response.uids:
+            return
+        for item, value in _ITEM_RE.findall(line):
+            if item == b"UID":
+                response.uids[-1] = int(value)
+            else:
+                response.sizes[-1] = int(value)
+
+    def uid_search(self, criteria: str, esearch: bool = False) -> UIDSet:
+        """UID SEARCH; with `esearch` the reply is a compact ESEARCH sequence set."""
+        if esearch:
+            return self.command("UID", "SEARCH", "RETURN (ALL)", criteria).search
+        return self.command("UID", "SEARCH", criteria).search
+
+    def uid_fetch(self, uids: str, items: str) -> Response:
+        return self.command("UID", "FETCH", uids, items)
+
+    def fetch(self, message_set: str, items: str) -> Response:
+        return self.command("FETCH", message_set, items)
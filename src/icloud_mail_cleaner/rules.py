@@ -0,0 +1,311 @@
+import imaplib
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from email.parser import BytesHeaderParser
+from typing import Dict, List, Optional, Tuple, Union
+
+from configobj import ConfigObj, Section
+from loguru import logger
+
+from .budget import RunBudget
+from .icloud_mail_cleaner import STORE_CHUNK_SIZE, EmailSearchError, ICloudCleaner
+from .parsing import item_size, item_uid, split_fetch
+from .uidset import DEFAULT_WINDOW_SIZE, UIDSet, uid_windows
+
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+FETCH_CHUNK_SIZE = 500
+
+# Rough share of a mailbox each predicate matches; used to pick the anchor
+# predicate that is sent to the server when several rules are merged.
+SELECTIVITY = {
+    "from": 0.01,
+    "subject": 0.02,
+    "larger_than": 0.02,
+    "from_domain": 0.05,
+    "newer_than_days": 0.1,
+    "smaller_than": 0.5,
+    "older_than_days": 0.5,
+}
+
+# Which fetched field each predicate needs when evaluated locally
+LOCAL_FIELDS = {
+    "from": "FROM",
+    "from_domain": "FROM",
+    "subject": "SUBJECT",
+    "subject_regex": "SUBJECT",
+    "larger_than": "RFC822.SIZE",
+    "smaller_than": "RFC822.SIZE",
+    "older_than_days": "INTERNALDATE",
+    "newer_than_days": "INTERNALDATE",
+}
+
+_header_parser = BytesHeaderParser()
+
+
+def imap_date(day: date) -> str:
+    return f"{day.day}-{MONTHS[day.month - 1]}-{day.year}"
+
+
+@dataclass(frozen=True)
+class Predicate:
+    """
+    One condition of a rule, e.g. ("older_than_days", 30) or ("subject", "Daily digest").
+    """
+
+    field: str
+    value: Union[str, int]
+
+    @property
+    def pushable(self) -> bool:
+        return self.field in SELECTIVITY
+
+    @property
+    def selectivity(self) -> float:
+        return SELECTIVITY.get(self.field, 1.0)
+
+    def search_key(self, today: date) -> str:
+        """IMAP SEARCH key for this predicate (only for pushable predicates)."""
+        if self.field == "from":
+            return f'FROM "{self.value}"'
+        if self.field == "from_domain":
+            return f'FROM "@{self.value}"'
+        if self.field == "subject":
+            return f'SUBJECT "{self.value}"'
+        if self.field == "larger_than":
+            return f"LARGER {self.value}"
+        if self.field == "smaller_than":
+            return f"SMALLER {self.value}"
+        if self.field == "older_than_days":
+            return f"BEFORE {imap_date(today - timedelta(days=int(self.value)))}"
+        if self.field == "newer_than_days":
+            return f"SINCE {imap_date(today - timedelta(days=int(self.value)))}"
+        raise ValueError(f"Predicate {self.field} cannot be evaluated by the server")
+
+    def matches(self, message: dict, today: date) -> bool:
+        """Local evaluation with the same semantics as the server-side SEARCH key."""
+        if self.field == "from":
+            return str(self.value).lower() in message["from"].lower()
+        if self.field == "from_domain":
+            return f"@{self.value}".lower() in message["from"].lower()
+        if self.field == "subject":
+            return str(self.value).lower() in message["subject"].lower()
+        if self.field == "subject_regex":
+            return re.search(str(self.value), message["subject"], re.IGNORECASE) is not None
+        if self.field == "larger_than":
+            return message["size"] > int(self.value)
+        if self.field == "smaller_than":
+            return message["size"] < int(self.value)
+        if self.field == "older_than_days":
+            return message["date"] < today - timedelta(days=int(self.value))
+        if self.field == "newer_than_days":
+            return message["date"] >= today - timedelta(days=int(self.value))
+        raise ValueError(f"Unknown predicate {self.field}")
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    predicates: Tuple[Predicate, ...]
+
+
+@dataclass
+class SearchPlan:
+    """
+    One server SEARCH shared by `rules`, with per-rule predicates left to check locally.
+    """
+
+    server: List[Predicate]
+    rules: List[Rule]
+    local: Dict[str, List[Predicate]] = field(default_factory=dict)
+
+    def criteria(self, today: date) -> str:
+        if not self.server:
+            return "ALL"
+        return "(" + " ".join(p.search_key(today) for p in self.server) + ")"
+
+    def fetch_fields(self) -> List[str]:
+        return sorted(
+            {LOCAL_FIELDS[p.field] for predicates in self.local.values() for p in predicates}
+        )
+
+    def describe(self, today: date) -> str:
+        local = {name: [p.field for p in preds] for name, preds in self.local.items() if preds}
+        names = ", ".join(rule.name for rule in self.rules)
+        return f"SEARCH {self.criteria(today)} for [{names}]; local checks {local or 'none'}"
+
+
+def parse_rule(name: str, section: Union[Section, dict]) -> Rule:
+    """
+    Build a rule from a config section, e.g. `from = x@y.com`, `older_than_days = 30`,
+    `larger_than_mb = 5`, `subject = Daily digest` or `subject_regex = ^Digest`.
+    """
+    predicates = []
+    for key, value in section.items():
+        if key == "larger_than_mb":
+            key, value = "larger_than", int(float(value) * 1024 * 1024)
+        elif key == "smaller_than_mb":
+            key, value = "smaller_than", int(float(value) * 1024 * 1024)
+        elif key not in LOCAL_FIELDS:
+            raise ValueError(f"Unknown predicate {key} in rule {name}")
+        elif key in ("larger_than", "smaller_than", "older_than_days", "newer_than_days"):
+            value = int(value)
+        predicates.append(Predicate(key, value))
+    if not predicates:
+        raise ValueError(f"Rule {name} has no predicates")
+    return Rule(name, tuple(sorted(predicates, key=lambda p: (p.field, str(p.value)))))
+
+
+def load_rules(config: ConfigObj) -> List[Rule]:
+    """
+    Read rules from the `[Rules]` section of config.ini, one subsection per rule.
+    """
+    rules_section = config.get("Rules", {})
+    return [parse_rule(name, rules_section[name]) for name in rules_section.sections]
+
+
+def plan_rules(rules: List[Rule]) -> List[SearchPlan]:
+    """
+    Group rules on their most selective server-side predicate. A lone rule pushes
+    all its pushable predicates into one SEARCH; rules sharing an anchor share one
+    SEARCH of their common predicates and check the rest on fetched fields.
+    """
+    groups: Dict[Optional[Predicate], List[Rule]] = {}
+    for rule in dict.fromkeys(rules):  # drops exact duplicates, keeps order
+        pushable = [p for p in rule.predicates if p.pushable]
+        anchor = min(pushable, key=lambda p: p.selectivity) if pushable else None
+        groups.setdefault(anchor, []).append(rule)
+
+    plans = []
+    for anchor, members in groups.items():
+        common = set.intersection(*({p for p in r.predicates if p.pushable} for r in members))
+        server = sorted(common, key=lambda p: p.selectivity)
+        local = {r.name: [p for p in r.predicates if p not in common] for r in members}
+        plans.append(SearchPlan(server, members, local))
+    return plans
+
+
+def _fetch_items(fields: List[str]) -> str:
+    items = ["UID"] + [f for f in fields if f in ("RFC822.SIZE", "INTERNALDATE")]
+    headers = [f for f in fields if f in ("FROM", "SUBJECT")]
+    if headers:
+        items.append(f"BODY.PEEK[HEADER.FIELDS ({' '.join(headers)})]")
+    return "(" + " ".join(items) + ")"
+
+
+def _message(items: bytes, header_block: bytes = b"") -> dict:
+    uid = item_uid(items)
+    headers = _header_parser.parsebytes(header_block)
+    received = None
+    internaldate = imaplib.Internaldate2tuple(items)
+    if internaldate:
+        received = datetime.fromtimestamp(time.mktime(internaldate)).date()
+    return {
+        "uid": str(uid) if uid else None,
+        "size": item_size(items),
+        "date": received,
+        "from": str(headers.get("From", "")),
+        "subject": str(headers.get("Subject", "")),
+    }
+
+
+def fetch_messages(cleaner: ICloudCleaner, uids: UIDSet, fields: List[str]) -> List[dict]:
+    """
+    Fetch UID plus the fields needed for local checks, in chunked UID FETCH
+    commands. Items the server sends after the header literal (often
+    RFC822.SIZE and INTERNALDATE) are added to that message.
+    """
+    items = _fetch_items(fields)
+    messages = []
+    for chunk in uids.chunks(FETCH_CHUNK_SIZE):
+        with cleaner.metrics.timed("FETCH"):
+            status, data = cleaner.email_connection.uid("FETCH", chunk.to_imap(), items)
+        if status != "OK":
+            raise EmailSearchError(f"UID FETCH {chunk.to_imap()} failed: {data}")
+        messages.extend(_message(meta, header) for meta, header in split_fetch(data))
+    return [message for message in messages if message["uid"]]
+
+
+def apply_rules(
+    cleaner: ICloudCleaner,
+    rules: List[Rule],
+    dry_run: bool = False,
+    today: Optional[date] = None,
+    window_size: Optional[int] = None,
+    budget: Optional[RunBudget] = None,
+) -> List[dict]:
+    """
+    Run the planned searches one UID window at a time (`window_size`, or
+    `scan_window_size` in the config), so neither the replies nor the messages
+    held for local checks grow with the mailbox. Every matching UID is flagged
+    in batched STOREs through `set_deleted` and expunged once. Returns one
+    result dict per rule; a failed window or STORE chunk is recorded in the
+    errors of the rules involved. With a `budget` the scan stops at the next
+    window boundary once a limit is hit, still deleting what it matched, and
+    the rules it did not finish get the limit in `stopped`.
+    """
+    today = today or date.today()
+    if window_size is None:
+        window_size = int(cleaner.config.get("scan_window_size") or DEFAULT_WINDOW_SIZE)
+    cleaner.ensure_connection()
+    results = {
+        rule.name: {"rule": rule.name, "matched": 0, "errors": [], "stopped": None}
+        for rule in rules
+    }
+    to_delete = UIDSet()
+    rule_uids: Dict[str, UIDSet] = {rule.name: UIDSet() for rule in rules}
+    upper = cleaner.uid_next()
+    finished = set()
+    reason = None
+    for plan in plan_rules(rules):
+        logger.info(plan.describe(today))
+        criteria = plan.criteria(today)
+        fields = plan.fetch_fields()
+        for window in uid_windows(upper, window_size):
+            reason = budget.exhausted(cleaner.metrics, len(to_delete)) if budget else None
+            if reason:
+                break
+            try:
+                found = cleaner.search_uids(criteria, window)
+                # Without local checks the SEARCH result is the match
+                messages = fetch_messages(cleaner, found, fields) if found and fields else None
+            except Exception as e:
+                for rule in plan.rules:
+                    results[rule.name]["errors"].append(str(e))
+                continue
+            for rule in plan.rules:
+                checks = plan.local[rule.name]
+                if messages is None:
+                    uids = found
+                else:
+                    uids = UIDSet(
+                        [int(m["uid"]) for m in messages if all(p.matches(m, today) for p in checks)]
+                    )
+                results[rule.name]["matched"] += len(uids)
+                rule_uids[rule.name].update(uids)
+                to_delete.update(uids)
+        if reason:
+            break
+        finished.update(rule.name for rule in plan.rules)
+    if reason:
+        logger.warning(f"Run budget ({reason}) reached while applying rules")
+        for name, result in results.items():
+            if name not in finished:
+                result["stopped"] = reason
+
+    if to_delete and not dry_run:
+        flagged = UIDSet()
+        for chunk in to_delete.chunks(STORE_CHUNK_SIZE):
+            try:
+                cleaner.set_deleted(chunk.to_imap(), silent=True)
+            except Exception as e:
+                for name, uids in rule_uids.items():
+                    if len(uids - chunk) < len(uids):
+                        results[name]["errors"].append(str(e))
+                continue
+            flagged.update(chunk)
+        if flagged:
+            cleaner.safe_expunge(flagged)
+    logger.info(f"Rules matched {len(to_delete)} messages{' (dry run)' if dry_run else ''}")
+    return list(results.values())
@@ -0,0 +1,121 @@
+import json
+from dataclasses import asdict, dataclass
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from loguru import logger
+
+DORMANT_AFTER = 3  # empty checks in a row before a sender is probed less often
+MAX_PROBE_DAYS = 64
+FULL_SWEEP_DAYS = 28
+DEFAULT_SCHEDULE_FILE = "data/sender_schedule.json"  # used by budgeted runs without schedule_file
+
+
+@dataclass
+class SenderStats:
+    checks: int = 0
+    hits: int = 0
+    deleted: int = 0
+    misses: int = 0  # empty checks since the last hit
+    last_checked: Optional[str] = None  # ISO dates, so the state file stays plain JSON
+    last_hit: Optional[str] = None
+
+    @property
+    def yield_rate(self) -> float:
+        """Messages deleted per check; senders never checked rank first."""
+        return self.deleted / self.checks if self.checks else float("inf")
+
+    @property
+    def probe_days(self) -> int:
+        """Days between checks: 0 while active, then 1, 2, 4, ... up to MAX_PROBE_DAYS."""
+        if self.misses < DORMANT_AFTER:
+            return 0
+        return min(MAX_PROBE_DAYS, 2 ** (self.misses - DORMANT_AFTER))
+
+    def due(self, today: date) -> bool:
+        if self.last_checked is None:
+            return True
+        return (today - date.fromisoformat(self.last_checked)).days >= self.probe_days
+
+
+class SenderSchedule:
+    """
+    Per-sender hit history used to order and thin out the target list: senders
+    that yield the most mail per check go first, dormant senders are probed at
+    exponentially growing intervals, and every `full_sweep_days` all senders
+    are checked regardless.
+    """
+
+    def __init__(
+        self,
+        stats: Optional[Dict[str, SenderStats]] = None,
+        last_full_sweep: Optional[str] = None,
+        full_sweep_days: int = FULL_SWEEP_DAYS,
+    ):
+        self.stats = stats or {}
+        self.last_full_sweep = last_full_sweep
+        self.full_sweep_days = full_sweep_days
+
+    @classmethod
+    def load(cls, state_file: Union[str, Path], full_sweep_days: int = FULL_SWEEP_DAYS):
+        path = Path(state_file)
+        if not path.is_file():
+            return cls(full_sweep_days=full_sweep_days)
+        state = json.loads(path.read_text())
+        stats = {sender: SenderStats(**values) for sender, values in state["senders"].items()}
+        return cls(stats, state.get("last_full_sweep"), full_sweep_days)
+
+    def save(self, state_file: Union[str, Path]) -> None:
+        path = Path(state_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "last_full_sweep": self.last_full_sweep,
+            "senders": {sender: asdict(stats) for sender, stats in self.stats.items()},
+        }
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, indent=1, sort_keys=True))
+        tmp.replace(path)
+
+    def full_sweep_due(self, today: date) -> bool:
+        if self.last_full_sweep is None:
+            return True
+        return (today - date.fromisoformat(self.last_full_sweep)).days >= self.full_sweep_days
+
+    def plan(self, senders: List[str], today: Optional[date] = None) -> Tuple[List[str], bool]:
+        """
+        The senders to check this run, highest yield first, and whether this
+        is a full sweep.
+        """
+        today = today or date.today()
+        full_sweep = self.full_sweep_due(today)
+        senders = list(dict.fromkeys(s.strip() for s in senders if s.strip()))
+        stats = {s: self.stats.get(s.lower(), SenderStats()) for s in senders}
+        due = [s for s in senders if full_sweep or stats[s].due(today)]
+        due.sort(key=lambda s: stats[s].yield_rate, reverse=True)
+        logger.info(
+            f"Sender schedule: checking {len(due)} of {len(senders)} senders"
+            f"{' (full sweep)' if full_sweep else ''}"
+        )
+        return due, full_sweep
+
+    def record(
+        self, results: List[dict], full_sweep: bool = False, today: Optional[date] = None
+    ) -> None:
+        """Update the history from clean_mailbox results (failed checks are ignored)."""
+        today_iso = (today or date.today()).isoformat()
+        for result in results:
+            if result["errors"] and not result["deleted"]:
+                continue
+            stats = self.stats.setdefault(result["sender"].lower(), SenderStats())
+            stats.checks += 1
+            stats.last_checked = today_iso
+            if result["deleted"]:
+                stats.hits += 1
+                stats.deleted += result["deleted"]
+                stats.misses = 0
+                stats.last_hit = today_iso
+            else:
+                stats.misses += 1
+        if full_sweep:
+            self.last_full_sweep = today_iso
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+from loguru import logger
+
+from .icloud_mail_cleaner import ICloudCleaner
+
+DEFAULT_IDLE_TIMEOUT = 600  # seconds
+
+
+@dataclass
+class _PooledSession:
+    cleaner: ICloudCleaner
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+    users: int = 0  # callers holding or waiting for the lock; guarded by the pool's lock
+
+
+class SessionPool:
+    """
+    Keep logged-in ICloudCleaner sessions per user and close them once idle.
+
+    A session is lent to one caller at a time via `session()`, so the web apps
+    can share the pool between reruns/requests without interleaving IMAP
+    commands on the same connection. Idle sessions are also closed by a
+    background timer every `evict_every` seconds (default: half the idle
+    timeout; 0 turns it off), so an idle server does not keep logins open.
+    """
+
+    def __init__(
+        self,
+        config_file: Union[str, Path],
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        evict_every: Optional[float] = None,
+    ):
+        self.config_file = str(config_file)
+        self.idle_timeout = idle_timeout
+        self.evict_every = idle_timeout / 2 if evict_every is None else evict_every
+        self._sessions: Dict[Tuple[str, str, str, str], _PooledSession] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._evictor: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _key(
+        username: str,
+        password: str,
+        imap_server: Optional[str],
+        imap_port: Optional[Union[str, int]] = None,
+    ) -> Tuple[str, str, str, str]:
+        # Never keep the plain password as part of the key
+        digest = hashlib.sha256(password.encode("utf-8")).hexdigest()
+        return username, digest, imap_server or "", str(imap_port or "")
+
+    def _start_evictor(self) -> None:
+        with self._lock:
+            if self._evictor is not None or not self.evict_every:
+                return
+            self._stopped.clear()
+            self._evictor = threading.Thread(
+                target=self._evict_loop, name="session-evictor", daemon=True
+            )
+            self._evictor.start()
+
+    def _evict_loop(self) -> None:
+        while not self._stopped.wait(self.evict_every):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.warning(f"Evicting idle IMAP sessions failed: {e}")
+
+    def _new_cleaner(self) -> ICloudCleaner:
+        return ICloudCleaner(self.config_file, mode="app")
+
+    @contextmanager
+    def session(
+        self,
+        username: str,
+        password: str,
+        imap_server: Optional[str] = None,
+        imap_port: Optional[Union[str, int]] = None,
+    ) -> Iterator[ICloudCleaner]:
+        """
+        Borrow a connected ICloudCleaner for `username`, logging in if needed.
+        """
+        self._start_evictor()
+        self.evict_idle()
+        key = self._key(username, password, imap_server, imap_port)
+        with self._lock:
+            pooled = self._sessions.get(key)
+            if pooled is None:
+                pooled = _PooledSession(self._new_cleaner())
+                self._sessions[key] = pooled
+            # Claimed before the pool lock is released, so eviction cannot
+            # close it while we wait for the session lock
+            pooled.users += 1
+        try:
+            with pooled.lock:
+                cleaner = pooled.cleaner
+                if not cleaner.is_connected:
+                    cleaner.connect(username, password, imap_server, imap_port)
+                    logger.info(f"Opened pooled IMAP session for {username}")
+                try:
+                    yield cleaner
+                finally:
+                    pooled.last_used = time.monotonic()
+        finally:
+            with self._lock:
+                pooled.users -= 1
+
+    def evict_idle(self) -> int:
+        """
+        Close sessions that have not been used for `idle_timeout` seconds and
+        that no caller holds or is waiting for.
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                key
+                for key, pooled in self._sessions.items()
+                if now - pooled.last_used > self.idle_timeout and not pooled.users
+            ]
+            evicted = [self._sessions.pop(key) for key in idle]
+        for pooled in evicted:
+            pooled.cleaner.close_connection()
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} idle IMAP session(s)")
+        return len(evicted)
+
+    def close_all(self) -> None:
+        self._stopped.set()
+        if self._evictor is not None:
+            self._evictor.join()
+            self._evictor = None
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for pooled in sessions:
+            pooled.cleaner.close_connection()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
@@ -0,0 +1,260 @@
+import json
+import threading
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from loguru import logger
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+from .metrics import RunMetrics
+
+BATCH_ROWS = 500  # queued rows that trigger an early flush
+FLUSH_SECONDS = 5.0
+
+# Conflict target of each table, so a retried or spooled batch never duplicates rows
+TABLE_KEYS = {
+    "activity_logs": "run_id",
+    "sender_results": "run_id,sender",
+    "command_timings": "run_id,command",
+    "profile_emails": "user_id,email",
+    "profiles": "id",
+}
+
+# Run once in the Supabase SQL editor
+SUPABASE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activity_logs (
+    run_id UUID PRIMARY KEY,
+    user_id UUID,
+    emails_deleted INTEGER,
+    bytes_reclaimed BIGINT,
+    senders INTEGER,
+    errors INTEGER,
+    timestamp TIMESTAMPTZ
+);
+CREATE TABLE IF NOT EXISTS sender_results (
+    run_id UUID, sender TEXT, deleted INTEGER, bytes BIGINT, errors TEXT,
+    PRIMARY KEY (run_id, sender)
+);
+CREATE TABLE IF NOT EXISTS command_timings (
+    run_id UUID, command TEXT, calls INTEGER, seconds DOUBLE PRECISION,
+    PRIMARY KEY (run_id, command)
+);
+CREATE TABLE IF NOT EXISTS profile_emails (
+    user_id UUID, email TEXT, PRIMARY KEY (user_id, email)
+);
+"""
+
+
+class PostgrestSink:
+    """
+    Just enough of the PostgREST API behind Supabase (`/rest/v1`): bulk
+    upserts and filtered deletes, each one HTTP request.
+    """
+
+    def __init__(self, url: str, key: str, timeout: float = 10.0):
+        self.base = url.rstrip("/") + "/rest/v1"
+        self.headers = {
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json",
+        }
+        self.timeout = timeout
+
+    def _request(self, method: str, table: str, query: Dict[str, str], body=None, prefer=None):
+        url = f"{self.base}/{table}?{urllib.parse.urlencode(query)}"
+        headers = dict(self.headers, Prefer=prefer) if prefer else self.headers
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(url, data=data, headers=headers, method=method)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+    def upsert(self, table: str, rows: List[dict], on_conflict: str) -> None:
+        self._request(
+            "POST",
+            table,
+            {"on_conflict": on_conflict},
+            rows,
+            prefer="resolution=merge-duplicates,return=minimal",
+        )
+
+    def delete(self, table: str, filters: Dict[str, str]) -> None:
+        """Delete rows matching PostgREST `filters`, e.g. {"user_id": "eq.1"}."""
+        self._request("DELETE", table, filters, prefer="return=minimal")
+
+
+def _in_filter(values: Iterable[str]) -> str:
+    quoted = ",".join('"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values)
+    return f"in.({quoted})"
+
+
+class TelemetryWriter:
+    """
+    Buffers activity telemetry (run totals, per-sender results, command
+    timings) and email-list edits, and writes them from a background thread
+    as bulk upserts and deletes. Operations that still fail after retries go
+    to a JSON-lines `spool_file` and are sent first on the next flush.
+    """
+
+    def __init__(
+        self,
+        sink: PostgrestSink,
+        spool_file: Optional[Union[str, Path]] = None,
+        batch_rows: int = BATCH_ROWS,
+        flush_seconds: float = FLUSH_SECONDS,
+    ):
+        self.sink = sink
+        self.spool_file = Path(spool_file) if spool_file else None
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self._ops: List[dict] = []  # in order: {"op": "upsert"/"delete", "table", ...}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "TelemetryWriter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def _queue(self, op: dict) -> None:
+        with self._lock:
+            last = self._ops[-1] if self._ops else None
+            if last and op["op"] == last["op"] == "upsert" and op["table"] == last["table"]:
+                last["rows"].extend(op["rows"])  # adjacent upserts become one request
+            else:
+                self._ops.append(op)
+            queued = sum(len(o.get("rows", ())) for o in self._ops)
+        if queued >= self.batch_rows:
+            self._wake.set()
+
+    def upsert(self, table: str, rows: List[dict]) -> None:
+        if rows:
+            self._queue({"op": "upsert", "table": table, "rows": list(rows)})
+
+    def record_run(
+        self, user_id: str, results: List[dict], metrics: Optional[RunMetrics] = None
+    ) -> str:
+        """Queue one clean_mailbox run; returns its run id."""
+        run_id = str(uuid.uuid4())
+        self.upsert(
+            "activity_logs",
+            [
+                {
+                    "run_id": run_id,
+                    "user_id": user_id,
+                    "emails_deleted": sum(r["deleted"] for r in results),
+                    "bytes_reclaimed": metrics.bytes_reclaimed if metrics else None,
+                    "senders": len(results),
+                    "errors": sum(len(r["errors"]) for r in results),
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                }
+            ],
+        )
+        self.upsert(
+            "sender_results",
+            [
+                {
+                    "run_id": run_id,
+                    "sender": r["sender"],
+                    "deleted": r["deleted"],
+                    "bytes": r.get("bytes", 0),
+                    "errors": "; ".join(r["errors"]),
+                }
+                for r in results
+            ],
+        )
+        if metrics:
+            self.upsert(
+                "command_timings",
+                [
+                    {"run_id": run_id, "command": command, "calls": calls, "seconds": seconds}
+                    for command, (calls, seconds) in metrics.commands.items()
+                ],
+            )
+        return run_id
+
+    def sync_email_list(self, user_id: str, saved: List[str], current: List[str]) -> Tuple[int, int]:
+        """
+        Queue the difference between the last `saved` list and the `current`
+        one as row upserts/deletes; returns (added, removed).
+        """
+        saved_set, current_set = set(saved), set(current)
+        added = [e for e in dict.fromkeys(current) if e not in saved_set]
+        removed = [e for e in dict.fromkeys(saved) if e not in current_set]
+        if removed:
+            self._queue(
+                {
+                    "op": "delete",
+                    "table": "profile_emails",
+                    "filters": {"user_id": f"eq.{user_id}", "email": _in_filter(removed)},
+                }
+            )
+        self.upsert("profile_emails", [{"user_id": user_id, "email": e} for e in added])
+        return len(added), len(removed)
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=0.5, min=0.5, max=4))
+    def _send(self, op: dict) -> None:
+        if op["op"] == "upsert":
+            self.sink.upsert(op["table"], op["rows"], TABLE_KEYS.get(op["table"], "id"))
+        else:
+            self.sink.delete(op["table"], op["filters"])
+
+    def _read_spool(self) -> List[dict]:
+        if not self.spool_file or not self.spool_file.is_file():
+            return []
+        with open(self.spool_file) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _write_spool(self, ops: List[dict]) -> None:
+        if not self.spool_file:
+            if ops:
+                logger.error(f"Dropping {len(ops)} telemetry operations (no spool file)")
+            return
+        if not ops:
+            self.spool_file.unlink(missing_ok=True)
+            return
+        self.spool_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.spool_file.with_suffix(".tmp")
+        tmp.write_text("".join(json.dumps(op) + "\n" for op in ops))
+        tmp.replace(self.spool_file)
+
+    def flush(self) -> int:
+        """Send spooled, then queued operations in order; returns how many were sent."""
+        with self._flush_lock:
+            with self._lock:
+                queued, self._ops = self._ops, []
+            spooled = self._read_spool()
+            ops = spooled + queued
+            sent = 0
+            for op in ops:
+                try:
+                    self._send(op)
+                except Exception as e:
+                    # Keep order: this and everything after it waits for the next flush
+                    logger.warning(f"Telemetry flush failed, spooling {len(ops) - sent} operations: {e}")
+                    break
+                sent += 1
+            if spooled or sent < len(ops):
+                self._write_spool(ops[sent:])
+            return sent
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
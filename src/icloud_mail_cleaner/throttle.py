@@ -0,0 +1,104 @@
+import imaplib
+import json
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from loguru import logger
+from tenacity import RetryError
+
+# Response text iCloud (and other servers) use when shedding load. A dropped
+# connection (an untagged BYE included) arrives as IMAP4.abort instead.
+THROTTLE_MARKERS = ("[LIMIT]", "[UNAVAILABLE]", "[INUSE]", "THROTTL", "TOO MANY")
+SLOW_REPLY_SECONDS = 5.0
+
+
+def is_throttle(error: BaseException) -> bool:
+    """True for errors that mean "slow down" rather than "this request is wrong"."""
+    if isinstance(error, RetryError) and error.last_attempt.failed:
+        error = error.last_attempt.exception()
+    if isinstance(error, imaplib.IMAP4.abort):
+        return True
+    message = str(error).upper()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+@dataclass
+class AIMDController:
+    """
+    Additive-increase/multiplicative-decrease limit: grows by `step` after each
+    healthy operation and is cut by `factor` on a throttling signal or a reply
+    slower than `slow_seconds`.
+    """
+
+    value: int
+    minimum: int
+    maximum: int
+    step: int = 1
+    factor: float = 0.5
+    slow_seconds: float = SLOW_REPLY_SECONDS
+
+    def success(self, seconds: float = 0.0) -> None:
+        if seconds > self.slow_seconds:
+            self.throttled()
+        else:
+            self.value = min(self.maximum, self.value + self.step)
+
+    def throttled(self) -> None:
+        self.value = max(self.minimum, int(self.value * self.factor))
+
+    @property
+    def backoff(self) -> float:
+        """Seconds to pause after a throttle: longer the further the limit was cut."""
+        return min(60.0, self.slow_seconds * self.maximum / max(self.value, 1) / 10)
+
+
+class AdaptiveLimits:
+    """
+    The cleaner's concurrency knobs (UID STORE chunk size, pipelined commands
+    in flight, parallel connections), each an AIMD controller. The learned
+    values are kept per account in a JSON state file between runs.
+    """
+
+    _file_lock = threading.Lock()
+
+    def __init__(self, values: Optional[Dict[str, int]] = None):
+        self.store_chunk = AIMDController(1000, minimum=50, maximum=5000, step=100)
+        self.pipeline = AIMDController(4, minimum=1, maximum=32)
+        self.connections = AIMDController(2, minimum=1, maximum=8)
+        self.controllers = {
+            "store_chunk": self.store_chunk,
+            "pipeline": self.pipeline,
+            "connections": self.connections,
+        }
+        for name, value in (values or {}).items():
+            if name in self.controllers:
+                controller = self.controllers[name]
+                controller.value = max(controller.minimum, min(controller.maximum, int(value)))
+
+    def values(self) -> Dict[str, int]:
+        return {name: controller.value for name, controller in self.controllers.items()}
+
+    @classmethod
+    def load(cls, state_file: Union[str, Path], account: str) -> "AdaptiveLimits":
+        path = Path(state_file)
+        with cls._file_lock:
+            state = json.loads(path.read_text()) if path.is_file() else {}
+        values = state.get(account or "default")
+        if values:
+            logger.info(f"Resuming from learned limits {values}")
+        return cls(values)
+
+    def save(self, state_file: Union[str, Path], account: str) -> None:
+        path = Path(state_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._file_lock:
+            state = json.loads(path.read_text()) if path.is_file() else {}
+            state[account or "default"] = self.values()
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(state, indent=2, sort_keys=True))
+            tmp.replace(path)
+
+    def describe(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.values().items())
@@ -0,0 +1,74 @@
+import socket
+import ssl
+import threading
+import time
+from typing import Optional
+
+from loguru import logger
+
+_shared_context: Optional["ResumingSSLContext"] = None
+_shared_lock = threading.Lock()
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """
+    Client SSLContext that offers the last TLS session seen for a host, so
+    reconnects and extra pool/worker connections resume instead of doing a
+    full handshake. Each wrapped socket records `handshake_seconds`.
+    """
+
+    def __new__(cls, protocol: int = ssl.PROTOCOL_TLS_CLIENT, *args, **kwargs):
+        context = super().__new__(cls, protocol, *args, **kwargs)
+        context._sessions = {}  # host -> ssl.SSLSession
+        context._sessions_lock = threading.Lock()
+        return context
+
+    def wrap_socket(self, sock: socket.socket, *args, server_hostname=None, session=None, **kwargs):
+        if session is None and server_hostname:
+            with self._sessions_lock:
+                session = self._sessions.get(server_hostname)
+        start = time.perf_counter()
+        wrapped = super().wrap_socket(
+            sock, *args, server_hostname=server_hostname, session=session, **kwargs
+        )
+        wrapped.handshake_seconds = time.perf_counter() - start
+        return wrapped
+
+    def remember_session(self, host: str, sock: socket.socket) -> None:
+        """
+        Keep the socket's session for `host`. Call it after the first exchange:
+        TLS 1.3 tickets arrive after the handshake, not during it.
+        """
+        session = getattr(sock, "session", None)
+        if isinstance(session, ssl.SSLSession):
+            with self._sessions_lock:
+                self._sessions[host] = session
+
+    def forget_sessions(self) -> None:
+        with self._sessions_lock:
+            self._sessions.clear()
+
+
+def shared_ssl_context() -> ResumingSSLContext:
+    """
+    One preconfigured context per process (CA bundle loaded once, TLS 1.2+).
+    """
+    global _shared_context
+    with _shared_lock:
+        if _shared_context is None:
+            context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.minimum_version = ssl.TLSVersion.TLSv1_2
+            context.load_default_certs(ssl.Purpose.SERVER_AUTH)
+            _shared_context = context
+            logger.debug("Created shared SSL context")
+        return _shared_context
+
+
+def handshake_seconds(sock: object) -> float:
+    """TLS handshake time recorded by ResumingSSLContext (0.0 if unknown)."""
+    seconds = getattr(sock, "handshake_seconds", 0.0)
+    return seconds if isinstance(seconds, float) else 0.0
+
+
+def session_reused(sock: object) -> bool:
+    return getattr(sock, "session_reused", False) is True
@@ -0,0 +1,166 @@
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple, Union
+
+DEFAULT_WINDOW_SIZE = 50000
+
+
+def uid_windows(
+    upper: int, window_size: int = DEFAULT_WINDOW_SIZE, lower: int = 1
+) -> Iterator[str]:
+    """
+    Yield UID ranges `1:size`, `size+1:2*size`, ... covering UIDs below `upper`
+    (starting at `lower` instead of 1 if given).
+    """
+    for start in range(lower, upper, window_size):
+        yield f"{start}:{min(start + window_size - 1, upper - 1)}"
+
+
+class UIDSet:
+    """
+    A set of IMAP UIDs stored as sorted, non-overlapping inclusive ranges in two
+    `array("I")` columns. A run of consecutive UIDs costs 8 bytes however long it
+    is, instead of one `bytes` object per message, and renders straight to an
+    IMAP sequence set such as `1:500,503,900:1200`.
+    """
+
+    __slots__ = ("_starts", "_ends")
+
+    def __init__(self, uids: Iterable[int] = ()):
+        self._starts = array("I")
+        self._ends = array("I")
+        for uid in sorted(set(uids)):
+            self._append(uid, uid)
+
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[Tuple[int, int]]) -> "UIDSet":
+        uid_set = cls()
+        for start, end in sorted(ranges):
+            uid_set.add_range(start, end)
+        return uid_set
+
+    @classmethod
+    def from_search(cls, data: Union[bytes, str, None]) -> "UIDSet":
+        """
+        Build from a SEARCH reply (`b"3 4 5 9"`). Servers return UIDs in ascending
+        order, so runs are extended in place without a per-id list.
+        """
+        uid_set = cls()
+        if not data:
+            return uid_set
+        if isinstance(data, str):
+            data = data.encode("ascii")
+        for token in data.split():
+            uid_set.add(int(token))
+        return uid_set
+
+    @classmethod
+    def parse(cls, sequence_set: str) -> "UIDSet":
+        """Parse an IMAP sequence set such as `1:5,9,12:14` (no `*`)."""
+        ranges = []
+        for part in sequence_set.split(","):
+            start, _, end = part.strip().partition(":")
+            ranges.append((int(start), int(end or start)))
+        return cls.from_ranges((min(r), max(r)) for r in ranges)
+
+    def _append(self, start: int, end: int) -> None:
+        """Add a range at or after the current maximum."""
+        if self._ends and start <= self._ends[-1] + 1:
+            self._ends[-1] = max(self._ends[-1], end)
+        else:
+            self._starts.append(start)
+            self._ends.append(end)
+
+    def add(self, uid: int) -> None:
+        self.add_range(uid, uid)
+
+    def add_range(self, start: int, end: int) -> None:
+        if not self._ends or start > self._ends[-1]:
+            self._append(start, end)
+            return
+        # Merge with every range that overlaps or touches [start, end]
+        lo = bisect_right(self._ends, start - 2)
+        hi = bisect_right(self._starts, end + 1)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = array("I", [start])
+        self._ends[lo:hi] = array("I", [end])
+
+    def update(self, other: "UIDSet") -> None:
+        """In-place union."""
+        for start, end in other.ranges():
+            self.add_range(start, end)
+
+    def ranges(self) -> Iterator[Tuple[int, int]]:
+        return zip(self._starts, self._ends)
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in self.ranges():
+            yield from range(start, end + 1)
+
+    def __len__(self) -> int:
+        return sum(self._ends) - sum(self._starts) + len(self._starts)
+
+    def __bool__(self) -> bool:
+        return bool(self._starts)
+
+    def __contains__(self, uid: int) -> bool:
+        index = bisect_right(self._starts, uid) - 1
+        return index >= 0 and uid <= self._ends[index]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, UIDSet):
+            return NotImplemented
+        return self._starts == other._starts and self._ends == other._ends
+
+    def __or__(self, other: "UIDSet") -> "UIDSet":
+        return UIDSet.from_ranges(list(self.ranges()) + list(other.ranges()))
+
+    def __sub__(self, other: "UIDSet") -> "UIDSet":
+        result = UIDSet()
+        others = list(other.ranges())
+        index = 0
+        for start, end in self.ranges():
+            while index < len(others) and others[index][1] < start:
+                index += 1
+            cursor = start
+            probe = index
+            while probe < len(others) and others[probe][0] <= end:
+                if others[probe][0] > cursor:
+                    result._append(cursor, others[probe][0] - 1)
+                cursor = max(cursor, others[probe][1] + 1)
+                probe += 1
+            if cursor <= end:
+                result._append(cursor, end)
+        return result
+
+    def __repr__(self) -> str:
+        return f"UIDSet({self.to_imap()!r})"
+
+    def to_imap(self) -> str:
+        return ",".join(
+            str(start) if start == end else f"{start}:{end}" for start, end in self.ranges()
+        )
+
+    def chunks(self, max_uids: int) -> Iterator["UIDSet"]:
+        """
+        Split into consecutive sets of at most `max_uids` UIDs each, e.g. for
+        batched UID STORE commands with bounded line length and reply size.
+        """
+        chunk = UIDSet()
+        count = 0
+        for start, end in self.ranges():
+            while start <= end:
+                take = min(end - start + 1, max_uids - count)
+                chunk._append(start, start + take - 1)
+                count += take
+                start += take
+                if count == max_uids:
+                    yield chunk
+                    chunk, count = UIDSet(), 0
+        if chunk:
+            yield chunk
+
+    def to_list(self) -> List[int]:
+        return list(self)
@@ -0,0 +1,374 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from loguru import logger
+
+from .budget import RunBudget
+from .icloud_mail_cleaner import ICloudCleaner
+from .uidset import uid_windows
+
+LEASE_SECONDS = 600.0
+MAX_ATTEMPTS = 3
+SENDERS_PER_SHARD = 50
+
+
+def plan_shards(
+    target_emails: Iterable[str],
+    folders: Sequence[str] = ("INBOX",),
+    senders_per_shard: int = SENDERS_PER_SHARD,
+    uid_ranges: Optional[Dict[str, List[Tuple[int, int]]]] = None,
+) -> List[dict]:
+    """
+    Split a cleaning job into shard payloads: one per folder, sender group and
+    (for folders in `uid_ranges`) UID range.
+    """
+    senders = list(dict.fromkeys(s.strip() for s in target_emails if s.strip()))
+    groups = [senders[i : i + senders_per_shard] for i in range(0, len(senders), senders_per_shard)]
+    shards = []
+    for folder in folders:
+        ranges = (uid_ranges or {}).get(folder) or [None]
+        for group in groups:
+            for uid_range in ranges:
+                shards.append({"folder": folder, "senders": group, "uid_range": uid_range})
+    return shards
+
+
+def folder_uid_ranges(cleaner: ICloudCleaner, folders: Sequence[str], window_size: int):
+    """UID ranges of `window_size` covering each folder up to its UIDNEXT."""
+    ranges = {}
+    for folder in folders:
+        windows = uid_windows(cleaner.uid_next(folder), window_size)
+        ranges[folder] = [tuple(int(n) for n in window.split(":")) for window in windows]
+    return ranges
+
+
+class WorkQueue:
+    """
+    Durable shard queue in a SQLite file that several processes (or hosts on a
+    shared filesystem) can use at once. Workers lease a shard for a limited
+    time and renew the lease while working; a shard whose lease runs out is
+    handed to the next worker, up to `max_attempts` times.
+    """
+
+    def __init__(self, path: Union[str, Path], max_attempts: int = MAX_ATTEMPTS):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS shards (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                lease_expires REAL,
+                result TEXT,
+                error TEXT,
+                updated REAL
+            );
+            CREATE INDEX IF NOT EXISTS shards_job_state ON shards (job, state);
+            """
+        )
+
+    def add_shards(self, job: str, payloads: Iterable[dict]) -> int:
+        now = time.time()
+        rows = [(job, json.dumps(payload), now) for payload in payloads]
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany(
+                "INSERT INTO shards (job, payload, updated) VALUES (?, ?, ?)", rows
+            )
+            self.conn.execute("COMMIT")
+        logger.info(f"Queued {len(rows)} shards for job {job}")
+        return len(rows)
+
+    def lease(self, job: str, worker: str, lease_seconds: float = LEASE_SECONDS) -> Optional[dict]:
+        """Lease the oldest pending (or expired) shard of `job`, or None when there is none."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases that used up their attempts are given up
+                self.conn.execute(
+                    "UPDATE shards SET state = 'failed', error = 'lease expired', updated = ? "
+                    "WHERE job = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, job, now, self.max_attempts),
+                )
+                row = self.conn.execute(
+                    "SELECT id, payload, attempts FROM shards WHERE job = ? AND "
+                    "(state = 'pending' OR (state = 'leased' AND lease_expires < ?)) "
+                    "ORDER BY id LIMIT 1",
+                    (job, now),
+                ).fetchone()
+                if row:
+                    self.conn.execute(
+                        "UPDATE shards SET state = 'leased', worker = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated = ? WHERE id = ?",
+                        (worker, now + lease_seconds, now, row[0]),
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "job": job, "payload": json.loads(row[1]), "attempts": row[2] + 1}
+
+    def _update_leased(self, sql: str, params: tuple, shard_id: int, worker: str) -> bool:
+        """Apply `sql` only while `worker` still holds the lease; False if it was lost."""
+        with self._lock:
+            cursor = self.conn.execute(
+                sql + " WHERE id = ? AND worker = ? AND state = 'leased'",
+                params + (shard_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, shard_id: int, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        now = time.time()
+        return self._update_leased(
+            "UPDATE shards SET lease_expires = ?, updated = ?",
+            (now + lease_seconds, now),
+            shard_id,
+            worker,
+        )
+
+    def complete(self, shard_id: int, worker: str, result: dict) -> bool:
+        return self._update_leased(
+            "UPDATE shards SET state = 'done', result = ?, updated = ?",
+            (json.dumps(result), time.time()),
+            shard_id,
+            worker,
+        )
+
+    def fail(self, shard_id: int, worker: str, error: str) -> bool:
+        """Give the shard back for another attempt, or mark it failed after the last one."""
+        return self._update_leased(
+            "UPDATE shards SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, updated = ?",
+            (self.max_attempts, error, time.time()),
+            shard_id,
+            worker,
+        )
+
+    def summary(self, job: str) -> dict:
+        """Shard counts by state, messages deleted so far and the errors of failed shards."""
+        with self._lock:
+            counts = dict(
+                self.conn.execute(
+                    "SELECT state, COUNT(*) FROM shards WHERE job = ? GROUP BY state", (job,)
+                ).fetchall()
+            )
+            results = self.conn.execute(
+                "SELECT result FROM shards WHERE job = ? AND state = 'done'", (job,)
+            ).fetchall()
+            errors = self.conn.execute(
+                "SELECT id, error FROM shards WHERE job = ? AND state = 'failed'", (job,)
+            ).fetchall()
+        return {
+            "job": job,
+            "states": counts,
+            "deleted": sum(json.loads(result)["deleted"] for (result,) in results),
+            "failed": {shard_id: error for shard_id, error in errors},
+        }
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class QueueServer(ThreadingHTTPServer):
+    """
+    Small HTTP front for a WorkQueue, for workers on hosts that cannot share
+    the SQLite file: POST /lease, /renew, /complete, /fail and GET /summary
+    with JSON bodies. Requests must carry `token` if one is set.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, queue: WorkQueue, host: str = "127.0.0.1", port: int = 8765, token=None):
+        self.queue = queue
+        self.token = token
+        super().__init__((host, port), _QueueHandler)
+
+
+class _QueueHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        logger.debug(f"Queue server: {format % args}")
+
+    def _reply(self, status: int, body) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _authorised(self) -> bool:
+        token = self.server.token
+        if token and self.headers.get("Authorization") != f"Bearer {token}":
+            self._reply(401, {"error": "unauthorised"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorised():
+            return
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path != "/summary":
+            return self._reply(404, {"error": "not found"})
+        job = urllib.parse.parse_qs(parsed.query).get("job", [""])[0]
+        self._reply(200, self.server.queue.summary(job))
+
+    def do_POST(self):
+        if not self._authorised():
+            return
+        queue = self.server.queue
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/lease":
+                reply = queue.lease(body["job"], body["worker"], body["lease_seconds"])
+            elif self.path == "/renew":
+                reply = queue.renew(body["id"], body["worker"], body["lease_seconds"])
+            elif self.path == "/complete":
+                reply = queue.complete(body["id"], body["worker"], body["result"])
+            elif self.path == "/fail":
+                reply = queue.fail(body["id"], body["worker"], body["error"])
+            else:
+                return self._reply(404, {"error": "not found"})
+        except (KeyError, TypeError, ValueError) as e:
+            return self._reply(400, {"error": f"bad request: {e}"})
+        self._reply(200, reply)
+
+
+class RemoteQueue:
+    """WorkQueue's worker-side methods over a QueueServer."""
+
+    def __init__(self, url: str, token: Optional[str] = None, timeout: float = 30.0):
+        self.url = url.rstrip("/")
+        self.headers = {"Content-Type": "application/json"}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+        self.timeout = timeout
+
+    def _call(self, path: str, body: Optional[dict] = None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, headers=self.headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def lease(self, job: str, worker: str, lease_seconds: float = LEASE_SECONDS) -> Optional[dict]:
+        return self._call("/lease", {"job": job, "worker": worker, "lease_seconds": lease_seconds})
+
+    def renew(self, shard_id: int, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        body = {"id": shard_id, "worker": worker, "lease_seconds": lease_seconds}
+        return self._call("/renew", body)
+
+    def complete(self, shard_id: int, worker: str, result: dict) -> bool:
+        return self._call("/complete", {"id": shard_id, "worker": worker, "result": result})
+
+    def fail(self, shard_id: int, worker: str, error: str) -> bool:
+        return self._call("/fail", {"id": shard_id, "worker": worker, "error": error})
+
+    def summary(self, job: str) -> dict:
+        return self._call("/summary?" + urllib.parse.urlencode({"job": job}))
+
+    def close(self) -> None:
+        pass
+
+
+def open_queue(location: str, token: Optional[str] = None) -> Union[WorkQueue, RemoteQueue]:
+    """A RemoteQueue for an http(s) URL, otherwise a WorkQueue on the SQLite file."""
+    if location.startswith(("http://", "https://")):
+        return RemoteQueue(location, token)
+    return WorkQueue(location)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_shard(cleaner: ICloudCleaner, payload: dict) -> dict:
+    """
+    Clean one shard's senders in its folder (and UID range) and summarise the
+    outcome. The config's `budget_*` limits do not apply: the lease bounds a
+    shard, and a shard cut short would be completed with senders left over.
+    """
+    start = time.perf_counter()
+    cleaner.ensure_connection()
+    if cleaner.mailbox != payload["folder"]:
+        cleaner.select_mailbox(payload["folder"])
+    uid_range = tuple(payload["uid_range"]) if payload.get("uid_range") else None
+    results = cleaner.clean_mailbox(
+        payload["senders"], close_mail_app=False, uid_range=uid_range, budget=RunBudget()
+    )
+    if cleaner.remaining:
+        # Hand the shard back (run_worker fails it) rather than complete it half done
+        raise RuntimeError(
+            f"Stopped early ({cleaner.remaining['reason']}) with "
+            f"{len(cleaner.remaining['senders'])} senders left"
+        )
+    return {
+        "deleted": sum(result["deleted"] for result in results),
+        "results": results,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def run_worker(
+    queue: Union[WorkQueue, RemoteQueue],
+    cleaner: ICloudCleaner,
+    job: str,
+    worker: Optional[str] = None,
+    lease_seconds: float = LEASE_SECONDS,
+    max_shards: Optional[int] = None,
+) -> int:
+    """
+    Lease and run shards of `job` until none is left (or `max_shards` are done),
+    renewing each lease in the background while the shard runs. Returns the
+    number of shards completed.
+    """
+    worker = worker or default_worker_id()
+    done = 0
+    while max_shards is None or done < max_shards:
+        shard = queue.lease(job, worker, lease_seconds)
+        if shard is None:
+            break
+        stop = threading.Event()
+
+        def heartbeat(shard_id=shard["id"]):
+            while not stop.wait(lease_seconds / 3):
+                if not queue.renew(shard_id, worker, lease_seconds):
+                    logger.warning(f"Lost the lease on shard {shard_id}")
+                    return
+
+        renewer = threading.Thread(target=heartbeat, daemon=True)
+        renewer.start()
+        try:
+            result = run_shard(cleaner, shard["payload"])
+        except Exception as e:
+            logger.error(f"Shard {shard['id']} failed (attempt {shard['attempts']}): {e}")
+            queue.fail(shard["id"], worker, str(e))
+            continue
+        finally:
+            stop.set()
+            renewer.join()
+        if queue.complete(shard["id"], worker, result):
+            done += 1
+            logger.info(f"Shard {shard['id']}: {result['deleted']} deleted in {result['seconds']}s")
+        else:
+            logger.warning(f"Shard {shard['id']} finished after its lease was lost")
+    return done
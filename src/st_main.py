@@ -1,10 +1,17 @@
-import datetime
+import atexit
 
 import pandas as pd
 import streamlit as st
-from icloud_mail_cleaner import ICloudCleaner
+from icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+from icloud_mail_cleaner.session_pool import SessionPool
+from icloud_mail_cleaner.telemetry import PostgrestSink, TelemetryWriter
 from st_supabase_connection import SupabaseConnection
 
+CONFIG_FILE = "config.ini"
+SESSION_IDLE_TIMEOUT = 600  # seconds before an unused iCloud login is closed
+USER_DATA_TTL = 300  # seconds a cached email list is trusted without re-querying
+TELEMETRY_SPOOL = "data/telemetry_spool.jsonl"  # telemetry not yet accepted by Supabase
+
 st.set_page_config(
     page_title="iCloud email cleaner",
     page_icon="📨",
@@ -16,18 +23,58 @@ st.set_page_config(
 )
 
 
+@st.cache_resource
+def get_supabase_connection():
+    # Built once per server process rather than on every rerun
+    return SupabaseConnection(
+        connection_name="ST-MAIN-APP",
+        type=SupabaseConnection,
+        ttl=None,
+        url=st.secrets["SUPABASE_URL"],
+        key=st.secrets["SUPABASE_KEY"],
+    )
+
+
+@st.cache_resource
+def get_session_pool():
+    return SessionPool(CONFIG_FILE, idle_timeout=SESSION_IDLE_TIMEOUT)
+
+
+@st.cache_resource
+def get_telemetry():
+    # One background writer per server process; whatever is queued is sent on exit
+    writer = TelemetryWriter(
+        PostgrestSink(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"]),
+        spool_file=TELEMETRY_SPOOL,
+    ).start()
+    atexit.register(writer.close)
+    return writer
+
+
+@st.cache_data(ttl=USER_DATA_TTL)
+def fetch_email_list(user_id):
+    """
+    Cached lookup of the user's list, one `profile_emails` row per address.
+    Returns (list, legacy): lists only in the old `profiles.email_list` array
+    come back with legacy=True so the next save writes every address.
+    """
+    client = get_supabase_connection().client
+    rows = client.table("profile_emails").select("email").eq("user_id", user_id).execute().data
+    if rows:
+        return [row["email"] for row in rows], False
+    data = client.table("profiles").select("email_list").eq("id", user_id).execute().data
+    email_list = (data[0]["email_list"] or []) if data else []
+    return email_list, True
+
+
 class ICloudCleanerApp:
     def __init__(self):
-        self.supabase_connection = SupabaseConnection(
-            connection_name="ST-MAIN-APP",
-            type=SupabaseConnection,
-            ttl=None,
-            url=st.secrets["SUPABASE_URL"],
-            key=st.secrets["SUPABASE_KEY"],
-        )
+        self.supabase_connection = get_supabase_connection()
         self.user = None
-        self.cleaner = None
         self.email_list = []
+        self.saved_email_list = []  # as last stored, so saves only send the changes
+        self.loaded_for = None
+        self.legacy_list = False
 
     def authenticate_user(self):
         # Use the SupabaseConnection component for authentication
@@ -40,7 +87,7 @@ class ICloudCleanerApp:
             type="password",
             help="Password is encrypted",
         )
-        if email and password:
+        if email and password and not self.user:
             self.user = self.supabase_connection.auth.sign_up(email=email, password=password)
         if self.user:
             self.load_user_data()
@@ -50,35 +97,30 @@ class ICloudCleanerApp:
             pass
 
     def load_user_data(self):
-        # Load user profile and email list from Supabase
-        if self.user:
-            result = (
-                self.supabase_connection.client.table("profiles")
-                .select("email_list")
-                .eq("id", self.user.id)
-                .execute()
-            )
-            data = result.data
-            if data:
-                self.email_list = data[0]["email_list"]
+        # Load the email list from Supabase once per signed-in user, so edits survive reruns
+        if self.user and self.loaded_for != self.user.id:
+            email_list, legacy = fetch_email_list(self.user.id)
+            self.email_list = list(email_list)
+            self.saved_email_list = [] if legacy else list(email_list)
+            self.legacy_list = legacy
+            self.loaded_for = self.user.id
 
     def save_user_data(self):
-        # Save user profile and email list to Supabase
+        # Queue only the added and removed addresses; written in the background
         if self.user:
-            self.supabase_connection.client.table("profiles").update(
-                {"email_list": self.email_list}
-            ).eq("id", self.user.id).execute()
-
-    def log_activity(self, total_emails_count):
-        # Log the email cleanup activity
+            telemetry = get_telemetry()
+            telemetry.sync_email_list(self.user.id, self.saved_email_list, self.email_list)
+            if self.legacy_list:
+                # Migrated to rows: empty the old array so it is never read again
+                telemetry.upsert("profiles", [{"id": self.user.id, "email_list": []}])
+                self.legacy_list = False
+            self.saved_email_list = list(self.email_list)
+            fetch_email_list.clear()
+
+    def log_activity(self, results, metrics):
+        # Queue the run's totals, per-sender results and command timings
         if self.user:
-            self.supabase_connection.client.table("activity_logs").insert(
-                {
-                    "user_id": self.user.id,
-                    "emails_deleted": total_emails_count,
-                    "timestamp": datetime.now(),
-                }
-            ).execute()
+            get_telemetry().record_run(self.user.id, results, metrics)
 
     def manage_email_list(self):
         # Upload a file with email addresses
@@ -130,14 +172,20 @@ class ICloudCleanerApp:
 
     def run_cleaner(self):
         # Run cleaning process
+        st.sidebar.header("iCloud Account")
+        icloud_username = st.sidebar.text_input("iCloud username")
+        icloud_password = st.sidebar.text_input("iCloud app password", type="password")
         if st.button("Clean Mailbox"):
-            if self.cleaner and self.email_list:
-                total_emails_count = self.cleaner.clean_mailbox(
-                    close_mail_app=True, target_emails=self.email_list
-                )
+            if icloud_username and icloud_password and self.email_list:
+                with get_session_pool().session(icloud_username, icloud_password) as cleaner:
+                    results = cleaner.clean_mailbox(
+                        close_mail_app=True, target_emails=self.email_list
+                    )
+                    metrics = cleaner.metrics
+                total_emails_count = sum(result["deleted"] for result in results)
                 st.success(f"Total emails deleted: {total_emails_count}")
                 # Log the activity
-                self.log_activity(total_emails_count)
+                self.log_activity(results, metrics)
             else:
                 st.error("Cleaner is not configured or email list is empty!")
 
@@ -149,5 +197,8 @@ class ICloudCleanerApp:
 
 
 if __name__ == "__main__":
-    app = ICloudCleanerApp()
+    # Keep the app (and its signed-in user and edited list) across reruns
+    if "app" not in st.session_state:
+        st.session_state["app"] = ICloudCleanerApp()
+    app = st.session_state["app"]
     app.main()
@@ -0,0 +1,48 @@
+from unittest.mock import Mock
+
+import pytest
+
+from src.icloud_mail_cleaner.icloud_mail_cleaner import ICloudCleaner
+
+
+class ScriptedConnection:
+    """Just enough of imaplib.IMAP4 to replay a server reply."""
+
+    def __init__(self, reply: bytes):
+        self.reply = reply
+        self.sent = b""
+        self.tagnum = 0
+        self.tagged_commands = {}
+
+    def _new_tag(self):
+        self.tagnum += 1
+        return b"T%d" % self.tagnum
+
+    def send(self, data):
+        self.sent += data
+
+    def readline(self):
+        line, _, self.reply = self.reply.partition(b"\n")
+        return line + b"\n" if line or self.reply else b""
+
+    def read(self, size):
+        data, self.reply = self.reply[:size], self.reply[size:]
+        return data
+
+
+@pytest.fixture
+def cleaner(tmp_path, monkeypatch):
+    """An ICloudCleaner on a mock connection that succeeds UID commands and never sleeps."""
+    config = tmp_path / "config.ini"
+    config.write_text(
+        "imap_server = imap.mail.me.com\nimap_port = 993\n"
+        f"[Logging]\nlog_file = {tmp_path / 'test.log'}\n"
+    )
+    cleaner = ICloudCleaner(str(config), mode="app", log_level="ERROR")
+    cleaner.email_connection = Mock()
+    cleaner.email_connection.uid.return_value = ("OK", [None])
+    cleaner.is_connected = True
+    monkeypatch.setattr("src.icloud_mail_cleaner.icloud_mail_cleaner.time.sleep", Mock())
+    # Budgeted runs keep a sender schedule under data/
+    monkeypatch.chdir(tmp_path)
+    return cleaner
@@ -0,0 +1,65 @@
+from unittest.mock import patch
+
+from src.icloud_mail_cleaner.batch import aggregate_reports, clean_account, load_manifest
+
+
+def test_load_manifest(tmp_path):
+    manifest = tmp_path / "accounts.ini"
+    manifest.write_text(
+        "max_workers = 3\n"
+        "[family]\nusername = fam\npassword_env = FAM_PW\n"
+        "target_emails_file = family.txt\nfolders = INBOX, Junk\n"
+        "[team]\nusername = team\ntarget_emails_file = team.txt\n"
+    )
+    family, team = load_manifest(manifest)
+    assert family["folders"] == ["INBOX", "Junk"]
+    assert family["password_env"] == "FAM_PW"
+    assert team["folders"] == ["INBOX"]
+
+
+def test_clean_account_cleans_every_folder(tmp_path):
+    targets = tmp_path / "targets.txt"
+    targets.write_text("a@example.com\n")
+    account = {
+        "name": "family",
+        "username": "fam",
+        "password_env": "FAM_PW",
+        "target_emails_file": str(targets),
+        "folders": ["INBOX", "Junk"],
+    }
+    with patch.dict("os.environ", {"FAM_PW": "secret"}), patch(
+        "src.icloud_mail_cleaner.batch.ICloudCleaner"
+    ) as cleaner_cls:
+        cleaner_cls.import_emails_from_file.return_value = ["a@example.com"]
+        cleaner = cleaner_cls.return_value
+        cleaner.clean_mailbox.return_value = [
+            {"sender": "a@example.com", "deleted": 2, "errors": []}
+        ]
+        report = clean_account(account, "config.ini")
+
+    assert report["deleted"] == 4
+    assert set(report["folders"]) == {"INBOX", "Junk"}
+    assert report["failure"] is None
+    cleaner.close_connection.assert_called_once()
+
+
+def test_clean_account_reports_missing_password():
+    account = {"name": "x", "username": "x", "password_env": "NOT_SET_PW",
+               "target_emails_file": "t.txt", "folders": ["INBOX"]}
+    report = clean_account(account, "config.ini")
+    assert report["deleted"] == 0
+    assert "NOT_SET_PW" in report["errors"][0]
+    assert "NOT_SET_PW" in report["failure"]
+
+
+def test_aggregate_reports():
+    reports = [
+        {"account": "b", "deleted": 0, "errors": ["login"], "failure": "login", "seconds": 1.0},
+        {"account": "a", "deleted": 2, "errors": [], "failure": None, "seconds": 2.0},
+        {"account": "c", "deleted": 1, "errors": ["INBOX/x@y: NO"], "failure": None, "seconds": 1.0},
+    ]
+    summary = aggregate_reports(reports, 2.5)
+    assert [r["account"] for r in summary["accounts"]] == ["a", "b", "c"]
+    assert summary["total_deleted"] == 3
+    assert summary["failed_accounts"] == ["b"]
+    assert summary["accounts_with_errors"] == ["c"]
@@ -0,0 +1,47 @@
+from src.icloud_mail_cleaner.benchmark import (
+    CASES,
+    Case,
+    compare,
+    load_baseline,
+    run_benchmarks,
+    save_baseline,
+    scaling_exponent,
+    synthetic_uids,
+)
+
+
+def test_every_case_runs_on_small_inputs():
+    results = run_benchmarks(sizes=(10, 100), repeats=1)
+    assert set(results) == {case.name for case in CASES}
+    assert all(set(timings) == {"10", "100"} for timings in results.values())
+
+
+def test_synthetic_uids_are_distinct():
+    uids = synthetic_uids(5000)
+    assert len(set(uids)) == len(uids) == 5000
+
+
+def test_quadratic_work_is_flagged_without_a_baseline():
+    def quadratic_dedupe(items):
+        unique = []
+        for item in items:
+            if item not in unique:
+                unique.append(item)
+        return unique
+
+    case = Case("dedupe", lambda n, scratch: list(range(n)), quadratic_dedupe)
+    results = run_benchmarks(sizes=(500, 4000), repeats=1, cases=[case])
+
+    assert scaling_exponent(results["dedupe"]) > 1.6
+    assert compare(results)[0].startswith("dedupe: time grows as n^")
+
+
+def test_slowdown_against_baseline(tmp_path):
+    path = tmp_path / "baseline.json"
+    save_baseline(path, {"uidset": {"1000": 0.010, "10000": 0.100}})
+    save_baseline(path, {"get_root": {"1000": 0.3}})  # merged, not replaced
+    baseline = load_baseline(path)
+    assert set(baseline["cases"]) == {"uidset", "get_root"}
+
+    regressions = compare({"uidset": {"1000": 0.012, "10000": 0.200}}, baseline)
+    assert regressions == ["uidset n=10000: 200.0 ms, baseline 100.0 ms (2.00x)"]
@@ -0,0 +1,82 @@
+from datetime import date
+from unittest.mock import Mock
+
+import pytest
+
+from src.icloud_mail_cleaner.budget import RunBudget, load_remaining, save_remaining
+from src.icloud_mail_cleaner.metrics import RunMetrics
+from src.icloud_mail_cleaner.schedule import DEFAULT_SCHEDULE_FILE, SenderSchedule, SenderStats
+from src.icloud_mail_cleaner.uidset import UIDSet
+
+
+@pytest.fixture
+def cleaner(cleaner):
+    cleaner.strategy = Mock()  # take the UID path
+    cleaner.search_many = Mock(
+        return_value=[UIDSet.from_ranges([(1, 10)]), UIDSet.from_ranges([(11, 20)]), UIDSet([21])]
+    )
+    cleaner.fetch_size = Mock(return_value=0)
+    cleaner.flag_deleted = Mock(side_effect=lambda uids: (uids, []))
+    return cleaner
+
+
+def test_from_config():
+    assert RunBudget.from_config({}) is None
+    budget = RunBudget.from_config({"budget_seconds": "60", "budget_messages": "500"})
+    assert (budget.seconds, budget.commands, budget.messages) == (60.0, None, 500)
+
+
+def test_command_budget():
+    metrics = RunMetrics()
+    metrics.record("UID SEARCH", 0.1)
+    metrics.record("UID STORE", 0.1)
+    assert RunBudget(commands=3).exhausted(metrics, 0) is None
+    assert RunBudget(commands=2).exhausted(metrics, 0) == "commands"
+
+
+def test_message_budget_truncates_and_leaves_remaining_work(cleaner):
+    senders = ["a@x.com", "b@x.com", "c@x.com"]
+
+    results = cleaner.clean_mailbox(senders, close_mail_app=False, budget=RunBudget(messages=15))
+
+    assert [r["deleted"] for r in results] == [10, 5]
+    assert cleaner.flag_deleted.call_args_list[1].args[0] == UIDSet.from_ranges([(11, 15)])
+    # The flagged mail is still expunged
+    cleaner.strategy.expunge.assert_called_once_with(
+        cleaner.email_connection, UIDSet.from_ranges([(1, 15)])
+    )
+    assert cleaner.remaining["reason"] == "messages"
+    assert cleaner.remaining["senders"] == ["b@x.com", "c@x.com"]
+    assert cleaner.remaining["flagged"] == 15
+
+
+def test_resume_and_deadline(cleaner, tmp_path):
+    budget = RunBudget(seconds=0)
+    cleaner.clean_mailbox(["a@x.com", "b@x.com"], close_mail_app=False, budget=budget)
+    assert cleaner.remaining["reason"] == "seconds"
+    assert cleaner.remaining["senders"] == ["a@x.com", "b@x.com"]
+
+    path = tmp_path / "remaining.json"
+    save_remaining(path, cleaner.remaining)
+    results = cleaner.clean_mailbox(close_mail_app=False, resume=load_remaining(path))
+
+    assert [r["sender"] for r in results] == ["a@x.com", "b@x.com"]
+    assert cleaner.remaining is None
+    save_remaining(path, cleaner.remaining)
+    assert path.exists() and load_remaining(path) is None
+
+
+def test_budgeted_run_checks_high_yield_senders_first(cleaner):
+    schedule = SenderSchedule(
+        {"a@x.com": SenderStats(checks=4, deleted=1), "b@x.com": SenderStats(checks=1, deleted=9)},
+        last_full_sweep=date.today().isoformat(),
+    )
+    schedule.save(DEFAULT_SCHEDULE_FILE)
+
+    results = cleaner.clean_mailbox(
+        ["a@x.com", "b@x.com"], close_mail_app=False, budget=RunBudget(messages=10)
+    )
+
+    assert [r["sender"] for r in results] == ["b@x.com"]
+    assert cleaner.remaining["senders"] == ["a@x.com"]
+    assert SenderSchedule.load(DEFAULT_SCHEDULE_FILE).stats["b@x.com"].checks == 2
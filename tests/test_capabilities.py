@@ -0,0 +1,65 @@
+from unittest.mock import Mock
+
+import pytest
+
+from src.icloud_mail_cleaner.capabilities import (
+    ServerStrategy,
+    clear_capability_cache,
+    probe_capabilities,
+)
+from src.icloud_mail_cleaner.uidset import UIDSet
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_capability_cache()
+    yield
+    clear_capability_cache()
+
+
+def test_probe_is_cached_per_host():
+    conn = Mock()
+    conn.capability.return_value = ("OK", [b"IMAP4rev1 UIDPLUS ESEARCH"])
+    first = probe_capabilities(conn, "imap.example.com")
+    second = probe_capabilities(conn, "imap.example.com")
+    assert first == second == frozenset({"IMAP4REV1", "UIDPLUS", "ESEARCH"})
+    conn.capability.assert_called_once()
+    probe_capabilities(conn, "imap.example.com", ttl=0)
+    assert conn.capability.call_count == 2
+
+
+def test_esearch_returns_compact_uid_set():
+    conn = Mock()
+    conn.uid.return_value = ("OK", [None])
+    conn.response.return_value = ("ESEARCH", [b'(TAG "A4") UID ALL 1:3,7'])
+    uids = ServerStrategy(frozenset({"ESEARCH"})).search(conn, '(FROM "a@b.com")')
+    assert uids == UIDSet.parse("1:3,7")
+    conn.uid.assert_called_once_with("SEARCH", 'RETURN (ALL) (FROM "a@b.com")')
+
+
+def test_expunge_and_move_fall_back_without_extensions():
+    conn = Mock()
+    uids = UIDSet.parse("5:6")
+    basic = ServerStrategy(frozenset())
+    basic.expunge(conn, uids)
+    conn.expunge.assert_called_once()
+    basic.move_to(conn, uids, "Archive")
+    assert [c.args[0] for c in conn.uid.call_args_list] == ["COPY", "STORE"]
+
+    conn = Mock()
+    rich = ServerStrategy(frozenset({"UIDPLUS", "MOVE"}))
+    rich.expunge(conn, uids)
+    rich.move_to(conn, uids, "Archive")
+    assert [c.args for c in conn.uid.call_args_list] == [
+        ("EXPUNGE", "5:6"),
+        ("MOVE", "5:6", "Archive"),
+    ]
+    assert "UID EXPUNGE" in rich.describe()
+
+
+def test_expunge_skips_an_empty_uid_set():
+    conn = Mock()
+    for strategy in (ServerStrategy(frozenset()), ServerStrategy(frozenset({"UIDPLUS"}))):
+        strategy.expunge(conn, UIDSet())
+    conn.expunge.assert_not_called()
+    conn.uid.assert_not_called()
@@ -0,0 +1,82 @@
+
+
+from src.icloud_mail_cleaner.capabilities import ServerStrategy
+
+
+def test_clean_mailbox_reports_each_sender_and_expunges_once(cleaner):
+    conn = cleaner.email_connection
+    conn.search.side_effect = [(None, [b"1 2"]), (None, [b""])]
+    conn.fetch.side_effect = [
+        (None, [b"1 (RFC822.SIZE 100)", b"2 (RFC822.SIZE 50)"]),
+        (None, [b"1 (UID 11)"]),
+        (None, [b"2 (UID 12)"]),
+    ]
+    seen = []
+
+    results = cleaner.clean_mailbox(
+        ["a@example.com", "b@example.com"], close_mail_app=False, on_result=seen.append
+    )
+
+    assert results == seen
+    assert [r["deleted"] for r in results] == [2, 0]
+    conn.expunge.assert_called_once()
+    assert cleaner.metrics.bytes_reclaimed == 150
+    assert cleaner.metrics.commands["SEARCH"][0] == 2
+
+
+def test_clean_mailbox_windowed_uses_uid_search_and_ranged_store(cleaner):
+    conn = cleaner.email_connection
+    conn.status.return_value = ("OK", [b'"INBOX" (UIDNEXT 7)'])
+    conn.uid.side_effect = [
+        ("OK", [b"1 2 3"]),  # UID SEARCH UID 1:3
+        ("OK", [b"1 (UID 1 RFC822.SIZE 10)"]),  # UID FETCH sizes
+        ("OK", [b""]),  # UID STORE
+        ("OK", [b""]),  # UID SEARCH UID 4:6
+    ]
+
+    (result,) = cleaner.clean_mailbox(["a@example.com"], close_mail_app=False, window_size=3)
+
+    assert result["deleted"] == 3
+    assert conn.uid.call_args_list[0].args == ("SEARCH", 'UID 1:3 (FROM "a@example.com")')
+    assert conn.uid.call_args_list[2].args == ("STORE", b"1:3", "+FLAGS.SILENT", "(\\Deleted)")
+    assert conn.uid.call_args_list[3].args == ("SEARCH", 'UID 4:6 (FROM "a@example.com")')
+
+
+def test_clean_mailbox_limited_to_uid_range(cleaner):
+    conn = cleaner.email_connection
+    conn.uid.side_effect = [
+        ("OK", [b"5 7"]),  # UID SEARCH UID 5:7
+        ("OK", [b"1 (UID 5 RFC822.SIZE 10)"]),  # UID FETCH sizes
+        ("OK", [b""]),  # UID STORE
+    ]
+
+    (result,) = cleaner.clean_mailbox(["a@example.com"], close_mail_app=False, uid_range=(5, 7))
+
+    assert result["deleted"] == 2
+    assert conn.uid.call_args_list[0].args == ("SEARCH", 'UID 5:7 (FROM "a@example.com")')
+    conn.status.assert_not_called()  # no UIDNEXT needed
+
+
+def test_clean_mailbox_skips_expunge_when_nothing_was_flagged(cleaner):
+    conn = cleaner.email_connection
+    cleaner.strategy = ServerStrategy(frozenset())
+    conn.uid.return_value = ("OK", [b""])  # UID SEARCH finds nothing
+
+    results = cleaner.clean_mailbox(["a@example.com"], close_mail_app=False)
+
+    assert [r["deleted"] for r in results] == [0]
+    conn.expunge.assert_not_called()
+
+
+def test_clean_mailbox_keeps_the_connection_timings(cleaner):
+    conn = cleaner.email_connection
+    cleaner.metrics.record("TLS (full)", 0.2)
+    cleaner.metrics.record("LOGIN", 0.1)
+    cleaner.metrics.record("SEARCH", 9.0)  # from an earlier run
+    conn.search.return_value = (None, [b""])
+
+    cleaner.clean_mailbox(["a@example.com"], close_mail_app=False)
+
+    commands = cleaner.metrics.commands
+    assert commands["TLS (full)"] == [1, 0.2] and commands["LOGIN"] == [1, 0.1]
+    assert commands["SEARCH"][0] == 1
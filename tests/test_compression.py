@@ -0,0 +1,52 @@
+import socket
+import zlib
+from unittest.mock import Mock
+
+import pytest
+
+from src.icloud_mail_cleaner.compression import DeflateTransport
+
+
+@pytest.fixture
+def sockets():
+    client, server = socket.socketpair()
+    yield client, server
+    client.close()
+    server.close()
+
+
+def make_conn(sock, capabilities=("IMAP4REV1", "COMPRESS=DEFLATE")):
+    conn = Mock(sock=sock, capabilities=capabilities)
+    conn._simple_command.return_value = ("OK", [b"DEFLATE active"])
+    return conn
+
+
+def test_uncompressed_traffic_is_counted(sockets):
+    client, _ = sockets
+    conn = make_conn(client, capabilities=("IMAP4REV1",))
+    conn.capability.return_value = ("OK", [b"IMAP4REV1 IDLE"])
+    conn.readline.return_value = b"* OK\r\n"
+    transport = DeflateTransport(conn)
+
+    assert transport.enable() is False
+    assert conn.readline() == b"* OK\r\n"
+    assert transport.counters() == (6, 6)
+
+
+def test_deflate_round_trip(sockets):
+    client, server = sockets
+    transport = DeflateTransport(make_conn(client))
+    assert transport.enable() is True
+
+    server_out = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    reply = b"* SEARCH " + b" ".join(str(i).encode() for i in range(2000)) + b"\r\nA1 OK\r\n"
+    server.sendall(server_out.compress(reply) + server_out.flush(zlib.Z_SYNC_FLUSH))
+    assert transport.readline().startswith(b"* SEARCH 0 1 2")
+    assert transport.read(7) == b"A1 OK\r\n"
+
+    transport.send(b"A2 NOOP\r\n")
+    server_in = zlib.decompressobj(-15)
+    assert server_in.decompress(server.recv(1024)) == b"A2 NOOP\r\n"
+
+    payload, wire = transport.counters()
+    assert wire < payload
@@ -0,0 +1,83 @@
+from unittest.mock import Mock
+
+from tenacity import RetryError
+
+from src.icloud_mail_cleaner.daemon import IdleDaemon
+from src.icloud_mail_cleaner.icloud_mail_cleaner import ICloudConnectionError
+from src.icloud_mail_cleaner.metrics import RunMetrics
+
+
+def header_reply(*messages):
+    data = []
+    for uid, sender in messages:
+        headers = f"From: {sender}\r\n\r\n".encode()
+        data += [(f"{uid} (UID {uid} BODY[HEADER.FIELDS (FROM)] {{{len(headers)}}}".encode(), headers), b")"]
+    return data
+
+
+def make_daemon(**kwargs):
+    cleaner = Mock(metrics=RunMetrics())
+    return IdleDaemon(cleaner, ["spam@shop.com"], **kwargs), cleaner.email_connection
+
+
+def test_catch_up_only_deletes_new_matching_uids():
+    daemon, conn = make_daemon(batch_size=10)
+    daemon.last_uid = 10
+    conn.uid.return_value = ("OK", header_reply((11, "Spam <SPAM@shop.com>"), (12, "friend@home.org")))
+
+    assert daemon.catch_up() == 1
+    conn.uid.assert_called_once_with("FETCH", "11:*", "(UID BODY.PEEK[HEADER.FIELDS (FROM)])")
+    daemon.cleaner.set_deleted.assert_called_once_with("11", silent=True)
+    daemon.cleaner.safe_expunge.assert_called_once()
+    assert daemon.last_uid == 12
+
+    # `12:*` on an unchanged mailbox returns UID 12 again, which is ignored
+    conn.uid.return_value = ("OK", header_reply((12, "friend@home.org")))
+    assert daemon.catch_up() == 0
+    assert daemon.deleted == 1
+
+
+def test_catch_up_flushes_in_batches():
+    daemon, conn = make_daemon(batch_size=2, expunge=False)
+    conn.uid.return_value = ("OK", header_reply(*[(uid, "spam@shop.com") for uid in (1, 2, 3)]))
+    daemon.catch_up()
+    assert [c.args[0] for c in daemon.cleaner.set_deleted.call_args_list] == ["1:2", "3"]
+    daemon.cleaner.safe_expunge.assert_not_called()
+
+
+def test_idle_returns_on_exists():
+    daemon, conn = make_daemon()
+    conn._new_tag.return_value = b"A1"
+    conn.sock.pending.return_value = 1
+    conn.readline.side_effect = [b"+ idling\r\n", b"* 5 EXISTS\r\n", b"A1 OK IDLE done\r\n"]
+
+    assert daemon.idle(30) is True
+    assert conn.send.call_args_list[-1].args == (b"DONE\r\n",)
+
+
+def test_idle_reads_exists_already_buffered_by_imaplib(monkeypatch):
+    daemon, conn = make_daemon()
+    daemon.cleaner.transport = None
+    conn._new_tag.return_value = b"A1"
+    conn.sock.pending.return_value = 0
+    conn.file.peek.return_value = b"* 5 EXISTS\r\n"
+    conn.readline.side_effect = [b"+ idling\r\n", b"* 5 EXISTS\r\n", b"A1 OK IDLE done\r\n"]
+    monkeypatch.setattr("src.icloud_mail_cleaner.daemon.select.select", Mock(side_effect=AssertionError))
+
+    assert daemon.idle(30) is True
+
+
+def test_run_keeps_reconnecting_after_connect_retries_run_out(monkeypatch):
+    daemon, conn = make_daemon()
+    monkeypatch.setattr(daemon._stop, "wait", Mock())
+
+    def give_up_then_stop():
+        if daemon.cleaner.ensure_connection.call_count == 1:
+            raise RetryError(Mock())
+        daemon.stop()
+        raise ICloudConnectionError("still down")
+
+    daemon.cleaner.ensure_connection.side_effect = give_up_then_stop
+
+    assert daemon.run() == 0
+    assert daemon.cleaner.ensure_connection.call_count == 2
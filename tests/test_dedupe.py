@@ -0,0 +1,83 @@
+from unittest.mock import Mock
+
+from src.icloud_mail_cleaner.dedupe import MessageIndex, remove_duplicates
+from src.icloud_mail_cleaner.metrics import RunMetrics
+from src.icloud_mail_cleaner.uidset import UIDSet
+
+
+def fetch_reply(*messages):
+    """imaplib-shaped UID FETCH reply: (uid, size, day, message_id or None) per message."""
+    data = []
+    for n, (uid, size, day, message_id) in enumerate(messages, 1):
+        header = f"Message-ID: <{message_id}>\r\n\r\n".encode() if message_id else b"\r\n"
+        prefix = f'{n} (UID {uid} RFC822.SIZE {size} INTERNALDATE "{day}-Jan-2026 10:00:00 +0000" '
+        data.append((f"{prefix}BODY[HEADER.FIELDS (MESSAGE-ID)] {{{len(header)}}}".encode(), header))
+        data.append(b")")
+    return data
+
+
+def test_index_groups_by_message_id_and_size():
+    index = MessageIndex()
+    index.add_fetch(
+        "INBOX",
+        fetch_reply(
+            (1, 100, 5, "a@x"),
+            (2, 100, 3, "a@x"),  # older copy of 1: kept
+            (3, 100, 3, "b@x"),
+            (4, 999, 3, "b@x"),  # same Message-ID, different size: not a duplicate
+            (5, 100, 3, None),
+        ),
+    )
+    index.add_fetch("Archive", fetch_reply((1, 100, 1, "a@x"), (2, 100, 1, "b@x")))
+
+    mask, groups = index.duplicates()
+
+    assert index.without_id == 1
+    assert groups == 2
+    deleted = {(index.folders[f], u) for f, u, m in zip(index.folder_ids, index.uids, mask) if m}
+    assert deleted == {("INBOX", 1), ("Archive", 1), ("Archive", 2)}
+
+
+def test_items_after_the_literal_are_parsed():
+    index = MessageIndex()
+    index.add_fetch(
+        "INBOX",
+        [
+            (b"1 (BODY[HEADER.FIELDS (MESSAGE-ID)] {17}", b"Message-ID:\r\n <a>"),
+            b' UID 7 RFC822.SIZE 10 INTERNALDATE "01-Jan-2026 10:00:00 +0000")',
+        ],
+    )
+    assert list(index.uids) == [7] and list(index.sizes) == [10]
+
+
+def test_remove_duplicates_deletes_per_folder():
+    cleaner = Mock(metrics=RunMetrics(), mailbox="INBOX")
+    cleaner.uid_next.return_value = 10
+    cleaner.email_connection.uid.side_effect = [
+        ("OK", fetch_reply((1, 100, 1, "a@x"), (2, 50, 1, "b@x"), (3, 100, 2, "a@x"))),
+        ("OK", fetch_reply((8, 50, 1, "b@x"))),
+    ]
+    cleaner.flag_deleted.side_effect = lambda uids: (uids, [])
+
+    report = remove_duplicates(cleaner, ["INBOX", "Archive"])
+
+    assert report["duplicates"] == report["deleted"] == 2
+    assert [c.args[0] for c in cleaner.flag_deleted.call_args_list] == [UIDSet([3]), UIDSet([8])]
+    assert cleaner.metrics.bytes_reclaimed == 150
+
+
+def test_remove_duplicates_when_nothing_is_flagged():
+    cleaner = Mock(metrics=RunMetrics(), mailbox="INBOX")
+    cleaner.uid_next.return_value = 10
+    cleaner.email_connection.uid.return_value = (
+        "OK",
+        fetch_reply((1, 100, 1, "a@x"), (2, 100, 2, "a@x")),
+    )
+    cleaner.flag_deleted.return_value = (UIDSet(), ["NO [LIMIT] slow down"])
+
+    report = remove_duplicates(cleaner)
+
+    assert report["duplicates"] == 1 and report["deleted"] == 0
+    assert report["errors"] == ["INBOX: NO [LIMIT] slow down"]
+    cleaner.safe_expunge.assert_not_called()
+    assert cleaner.metrics.bytes_reclaimed == 0
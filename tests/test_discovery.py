@@ -0,0 +1,44 @@
+from unittest.mock import Mock
+
+from src.icloud_mail_cleaner.discovery import discover_senders, summarise_senders
+from src.icloud_mail_cleaner.parsing import parse_header_fetch
+from src.icloud_mail_cleaner.uidset import uid_windows
+
+
+def fetch_reply(*messages):
+    data = []
+    for uid, size, headers in messages:
+        meta = f"{uid} (UID {uid} RFC822.SIZE {size} BODY[HEADER.FIELDS (FROM)] {{{len(headers)}}}"
+        data += [(meta.encode(), headers), b")"]
+    return data
+
+
+def test_uid_windows():
+    assert list(uid_windows(11, 5)) == ["1:5", "6:10"]
+    assert list(uid_windows(12, 5)) == ["1:5", "6:10", "11:11"]
+
+
+def test_parse_header_fetch_handles_size_after_literal():
+    data = [(b"1 (UID 7 BODY[HEADER.FIELDS (FROM)] {10}", b"From: a@b\r\n"), b" RFC822.SIZE 99)"]
+    assert list(parse_header_fetch(data)) == [(7, 99, b"From: a@b\r\n")]
+
+
+def test_discover_senders_aggregates_across_windows():
+    cleaner = Mock()
+    conn = cleaner.email_connection
+    cleaner.uid_next.return_value = 5
+    conn.uid.side_effect = [
+        ("OK", fetch_reply(
+            (1, 100, b"From: News <news@shop.com>\r\nList-Id: <x>\r\n\r\n"),
+            (2, 50, b"From: friend@home.org\r\n\r\n"),
+        )),
+        ("OK", fetch_reply((3, 300, b"From: NEWS@shop.com\r\n\r\n"))),
+    ]
+
+    report = discover_senders(cleaner, target_emails=["friend@home.org"], chunk_size=2)
+
+    shop = report.set_index("sender").loc["news@shop.com"]
+    assert (shop["messages"], shop["bytes"], shop["newsletter"]) == (2, 400, 1)
+    summary = summarise_senders(report)
+    assert list(summary["newsletter_candidates"]["sender"]) == ["news@shop.com"]
+    assert summary["top_domains_by_bytes"].iloc[0]["domain"] == "shop.com"
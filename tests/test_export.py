@@ -0,0 +1,98 @@
+import gzip
+import mailbox
+from unittest.mock import Mock
+
+import pytest
+
+from src.icloud_mail_cleaner.export import MaildirWriter, MboxWriter, MessageExporter
+from src.icloud_mail_cleaner.uidset import UIDSet
+
+MESSAGES = {
+    1: b"From: a@example.com\r\nSubject: one\r\n\r\nFrom here on\r\nbody\r\n",
+    2: b"From: a@example.com\r\nSubject: two\r\n\r\nshort",
+}
+
+
+def fake_cleaner(fail_uid=None):
+    def fetch_body_chunk(uid, offset, size):
+        if uid == fail_uid:
+            raise OSError("connection reset")
+        return MESSAGES[uid][offset : offset + size]
+
+    return Mock(fetch_body_chunk=Mock(side_effect=fetch_body_chunk))
+
+
+def test_mbox_export_streams_chunks_and_escapes_from_lines(tmp_path):
+    exporter = MessageExporter(MboxWriter(tmp_path / "archive.mbox", "gzip"), chunk_size=7)
+
+    exported = exporter.export(fake_cleaner(), UIDSet.from_ranges([(1, 2)]))
+    exporter.close()
+
+    assert exported.to_list() == [1, 2]
+    data = gzip.decompress((tmp_path / "archive.mbox.gz").read_bytes())
+    assert data.startswith(b"From MAILER-DAEMON ")
+    assert data.count(b"From MAILER-DAEMON ") == 2
+    assert b"\n>From here on\n" in data
+    assert b"\r" not in data
+
+
+def test_mbox_abort_keeps_finished_messages(tmp_path):
+    cleaner = fake_cleaner()
+
+    def fetch_body_chunk(uid, offset, size):
+        if uid == 2 and offset:
+            raise OSError("connection reset")  # message 2 fails half way
+        return MESSAGES[uid][offset : offset + size]
+
+    cleaner.fetch_body_chunk.side_effect = fetch_body_chunk
+    exporter = MessageExporter(MboxWriter(tmp_path / "archive.mbox", "gzip"), chunk_size=7)
+
+    exported = exporter.export(cleaner, UIDSet.from_ranges([(1, 2)]))
+    exporter.close()
+
+    assert exported.to_list() == [1]
+    data = gzip.decompress((tmp_path / "archive.mbox.gz").read_bytes())
+    assert data.count(b"From MAILER-DAEMON ") == 1
+    assert b"Subject: one" in data and b"Subject: two" not in data
+
+
+def test_maildir_export_only_returns_committed_uids(tmp_path):
+    writer = MaildirWriter(tmp_path / "archive", "none")
+    exporter = MessageExporter(writer, chunk_size=16, commit_every=1)
+
+    exported = exporter.export(fake_cleaner(fail_uid=1), UIDSet.from_ranges([(1, 2)]))
+
+    assert exported.to_list() == [2]
+    (message,) = mailbox.Maildir(tmp_path / "archive", create=False)
+    assert message["Subject"] == "two"
+    assert not list((tmp_path / "archive" / "tmp").iterdir())
+
+
+def test_clean_mailbox_deletes_only_exported_messages(cleaner):
+    cleaner.email_connection.uid.side_effect = [
+        ("OK", [b"1 2"]),  # UID SEARCH
+        ("OK", [b""]),  # UID FETCH sizes
+        ("OK", [b""]),  # UID STORE
+    ]
+    exporter = Mock()
+    exporter.export.return_value = UIDSet.from_ranges([(2, 2)])
+
+    (result,) = cleaner.clean_mailbox(["a@example.com"], close_mail_app=False, exporter=exporter)
+
+    assert result["deleted"] == 1
+    assert result["errors"] == ["1 messages not exported, left in mailbox"]
+    assert cleaner.email_connection.uid.call_args_list[2].args[1] == b"2"
+
+
+def test_zstd_needs_optional_package(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    writer = MboxWriter(tmp_path / "archive.mbox", "zstd")
+    writer.begin(1)
+    writer.write(MESSAGES[2])
+    writer.end()
+    assert writer.commit() == [1]
+    writer.close()
+    data = zstandard.ZstdDecompressor().decompressobj().decompress(
+        (tmp_path / "archive.mbox.zst").read_bytes()
+    )
+    assert data.endswith(b"short\n\n")
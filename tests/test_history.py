@@ -0,0 +1,55 @@
+import duckdb
+
+from src.icloud_mail_cleaner.history import RunHistory
+from src.icloud_mail_cleaner.metrics import RunMetrics
+
+
+def test_import_target_list_skips_duplicates():
+    history = RunHistory()
+    assert history.import_target_list(["a@x.com", "b@x.com", "a@x.com"]) == 2
+    assert history.import_target_list(["b@x.com", "c@x.com"]) == 1
+    assert history.load_target_list() == ["a@x.com", "b@x.com", "c@x.com"]
+
+
+def test_record_run_and_export(tmp_path):
+    history = RunHistory(tmp_path / "history.duckdb")
+    metrics = RunMetrics(bytes_reclaimed=150)
+    with metrics.timed("SEARCH"):
+        pass
+    results = [
+        {"sender": "a@x.com", "deleted": 2, "bytes": 150, "errors": []},
+        {"sender": "b@x.com", "deleted": 0, "bytes": 0, "errors": ["boom"]},
+    ]
+
+    run_id = history.record_run(results, metrics, account="me")
+
+    run = history.runs().iloc[0]
+    assert run["run_id"] == run_id
+    assert (run["deleted"], run["bytes_reclaimed"], run["errors"]) == (2, 150, 1)
+    paths = history.export_parquet(tmp_path / "export")
+    parquet = (tmp_path / "export" / "sender_results.parquet").as_posix()
+    senders = duckdb.sql(f"SELECT sender FROM '{parquet}' ORDER BY sender").df()
+    assert len(paths) == 4
+    assert list(senders["sender"]) == ["a@x.com", "b@x.com"]
+
+
+def test_legacy_emails_table_is_migrated_once(tmp_path):
+    path = tmp_path / "emails.duckdb"
+    with duckdb.connect(str(path)) as conn:
+        conn.execute(
+            """
+            CREATE TABLE emails (
+                id INTEGER PRIMARY KEY,
+                email TEXT UNIQUE NOT NULL,
+                added TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            INSERT INTO emails VALUES
+                (1, 'b@x.com', '2024-01-02'), (2, 'a@x.com', '2024-01-01');
+            """
+        )
+    history = RunHistory(path)
+    history.import_target_list(["a@x.com"])
+
+    assert history.migrate_legacy_emails() == 1
+    assert history.load_target_list() == ["b@x.com", "a@x.com"]
+    assert history.migrate_legacy_emails() == 0
@@ -0,0 +1,54 @@
+import mailbox
+
+from src.icloud_mail_cleaner.matcher import SenderMatcher
+from src.icloud_mail_cleaner.offline import clean_offline
+
+MBOX = (
+    b"From MAILER-DAEMON Mon Jan  1 00:00:00 2026\n"
+    b"From: News <News@Example.com>\nSubject: one\n\nbody\n>From the archive\n\n"
+    b"From MAILER-DAEMON Mon Jan  1 00:00:00 2026\n"
+    b"From: friend@example.org\nSubject: two\n\nkeep me\n\n"
+    b"From MAILER-DAEMON Mon Jan  1 00:00:00 2026\n"
+    b"From: news@example.com\r\nSubject: three\r\n\r\nbody\r\n"
+)
+
+
+def test_matcher_compares_addresses_case_insensitively():
+    matcher = SenderMatcher([" News@example.com ", ""])
+    assert len(matcher) == 1
+    assert matcher.match(b"From: Newsletter <NEWS@example.com>") == "news@example.com"
+    assert matcher.match(b"From: other@example.com") is None
+
+
+def test_clean_mbox_writes_filtered_copy_and_index(tmp_path):
+    source = tmp_path / "export.mbox"
+    source.write_bytes(MBOX)
+
+    (result,) = clean_offline(
+        source, ["news@example.com"], tmp_path / "kept.mbox", tmp_path / "index.csv"
+    )
+
+    assert result["sender"] == "news@example.com"
+    assert result["deleted"] == 2
+    kept = list(mailbox.mbox(tmp_path / "kept.mbox"))
+    assert [message["Subject"] for message in kept] == ["two"]
+    rows = (tmp_path / "index.csv").read_text().splitlines()
+    assert rows[0] == "offset,length,sender"
+    assert rows[1].startswith("0,") and len(rows) == 3
+    assert source.read_bytes() == MBOX
+
+
+def test_clean_maildir_uses_worker_processes(tmp_path):
+    source = mailbox.Maildir(tmp_path / "backup")
+    source.add(b"From: news@example.com\n\nbye\n")
+    source.add(b"From: friend@example.org\n\nhello\n")
+
+    (result,) = clean_offline(
+        tmp_path / "backup", ["news@example.com"], tmp_path / "kept", max_workers=2
+    )
+
+    assert result["deleted"] == 1
+    assert result["bytes"] == len(b"From: news@example.com\n\nbye\n")
+    (kept,) = mailbox.Maildir(tmp_path / "kept", create=False)
+    assert kept["From"] == "friend@example.org"
+    assert len(source) == 2
@@ -0,0 +1,77 @@
+import threading
+from unittest.mock import Mock, patch
+
+from src.icloud_mail_cleaner.discovery import discover_senders
+from src.icloud_mail_cleaner.parallel_scan import ParallelScanner, split_uid_space
+
+
+def test_split_uid_space_covers_every_uid_once():
+    assert split_uid_space(11, 3) == [(1, 4), (5, 7), (8, 10)]
+    assert split_uid_space(3, 8) == [(1, 1), (2, 2)]
+    assert split_uid_space(1, 4) == []
+    assert split_uid_space(21, 2, lower=11) == [(11, 15), (16, 20)]
+
+
+def make_cleaner(upper):
+    cleaner = Mock(mailbox="INBOX")
+    cleaner.uid_next.return_value = upper
+    cleaner.limits.connections.value = 2
+    return cleaner
+
+
+def test_scan_yields_ranges_in_order_and_retries_a_failed_range():
+    cleaner = make_cleaner(101)
+    extra = Mock()
+    failed = threading.Event()
+
+    def scan_range(session, first, last):
+        if first == 1 and not failed.is_set():
+            failed.set()
+            raise OSError("connection reset")
+        return (first, last)
+
+    with patch("src.icloud_mail_cleaner.parallel_scan.ICloudCleaner", return_value=extra):
+        with ParallelScanner(cleaner, ranges_per_session=2) as scanner:
+            results = list(scanner.scan("INBOX", scan_range))
+
+    assert [r.value for r in results] == [(1, 25), (26, 50), (51, 75), (76, 100)]
+    assert results[0].attempts == 2 and not any(r.error for r in results)
+    assert cleaner.metrics.record.call_count == 4
+    extra.close_connection.assert_called_once()
+
+
+def test_extra_session_refused_scans_with_fewer():
+    cleaner = make_cleaner(11)
+    extra = Mock()
+    extra.connect.side_effect = OSError("too many connections")
+
+    with patch("src.icloud_mail_cleaner.parallel_scan.ICloudCleaner", return_value=extra):
+        scanner = ParallelScanner(cleaner, sessions=3, ranges_per_session=1)
+        results = list(scanner.scan("INBOX", lambda session, first, last: last - first + 1))
+
+    assert [r.value for r in results] == [10]
+    cleaner.limits.connections.throttled.assert_called_once()
+
+
+def test_discover_senders_with_sessions_matches_serial():
+    def reply(command, window, items):
+        first, last = map(int, window.split(":"))
+        data = []
+        for uid in range(first, last + 1):
+            headers = f"From: sender{uid % 3}@x.com\r\n\r\n".encode()
+            meta = f"{uid} (UID {uid} RFC822.SIZE {uid} BODY[HEADER.FIELDS (FROM)] {{{len(headers)}}}"
+            data += [(meta.encode(), headers), b")"]
+        return "OK", data
+
+    reports = []
+    for sessions in (1, 2):
+        cleaner = make_cleaner(31)
+        cleaner.email_connection.uid.side_effect = reply
+        extra = Mock()
+        extra.email_connection.uid.side_effect = reply
+        with patch("src.icloud_mail_cleaner.parallel_scan.ICloudCleaner", return_value=extra):
+            reports.append(discover_senders(cleaner, chunk_size=4, sessions=sessions))
+
+    serial, parallel = (r.set_index("sender").sort_index() for r in reports)
+    assert serial.equals(parallel)
+    assert serial["messages"].sum() == 30
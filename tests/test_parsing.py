@@ -0,0 +1,65 @@
+import math
+
+from src.icloud_mail_cleaner.parsing import (
+    ParallelHeaderParser,
+    item_day,
+    item_size,
+    item_uid,
+    parse_header_chunk,
+    split_fetch,
+)
+
+HEADERS = (
+    b"From: =?utf-8?q?Caf=C3=A9?= <News@Shop.com>\r\n"
+    b"Subject: =?utf-8?b?SMOpbGxv?=\r\n"
+    b"Date: Thu, 01 Jan 2026 00:00:00 +0000\r\n"
+    b"List-Unsubscribe: <mailto:x>\r\n\r\n"
+)
+
+
+def reply(uid, headers):
+    meta = f"{uid} (UID {uid} RFC822.SIZE 42 BODY[HEADER.FIELDS (FROM)] {{{len(headers)}}}"
+    return [(meta.encode(), headers), b")"]
+
+
+def test_split_fetch_keeps_items_sent_after_the_literal():
+    data = [
+        (b"1 (UID 7 BODY[HEADER] {3}", b"a\r\n"),
+        b' RFC822.SIZE 99 INTERNALDATE " 1-Jan-2026 10:00:00 +0000")',
+        b"2 (UID 8 RFC822.SIZE 5)",
+    ]
+
+    (first, header), (second, literal) = split_fetch(data)
+
+    assert header == b"a\r\n" and literal == b""
+    assert (item_uid(first), item_size(first), item_day(first)) == (7, 99, b"1-Jan-2026")
+    assert (item_uid(second), item_size(second), item_day(second)) == (8, 5, None)
+
+
+def test_parse_header_chunk_decodes_and_normalises():
+    columns = parse_header_chunk(reply(7, HEADERS) + reply(8, b"Date: nonsense\r\n\r\n"))
+
+    assert list(columns["uid"]) == [7, 8]
+    assert list(columns["bytes"]) == [42, 42]
+    assert columns["sender"] == ["news@shop.com", ""]
+    assert columns["name"][0] == "Café"
+    assert columns["subject"][0] == "Héllo"
+    assert columns["date"][0] == 1767225600.0
+    assert math.isnan(columns["date"][1])
+    assert columns["newsletter"] == [True, False]
+
+
+def test_parallel_parser_returns_every_chunk_in_order():
+    chunks = [reply(uid, HEADERS) for uid in range(1, 6)]
+    parsed = []
+    with ParallelHeaderParser(max_workers=2, max_pending=2) as parser:
+        for data in chunks:
+            parsed += parser.submit(data)
+        parsed += list(parser.drain())
+    assert [list(columns["uid"]) for columns in parsed] == [[1], [2], [3], [4], [5]]
+
+
+def test_inline_parser_needs_no_pool():
+    with ParallelHeaderParser(max_workers=0) as parser:
+        (columns,) = parser.submit(reply(3, HEADERS))
+    assert columns["sender"] == ["news@shop.com"]
@@ -0,0 +1,100 @@
+from array import array
+from datetime import date
+from unittest.mock import Mock
+
+import numpy as np
+
+from src.icloud_mail_cleaner.metrics import RunMetrics
+from src.icloud_mail_cleaner.quota import (
+    in_uidset,
+    parse_size_fetch,
+    reclaim_quota,
+    select_for_quota,
+)
+from src.icloud_mail_cleaner.uidset import UIDSet
+
+TODAY = date(2026, 10, 19)
+
+
+def test_parse_size_fetch_fills_compact_arrays():
+    uids, sizes, days = array("I"), array("Q"), array("I")
+    parse_size_fetch(
+        [
+            b'1 (UID 11 RFC822.SIZE 5000 INTERNALDATE "01-Jan-2026 10:00:00 +0000")',
+            b'2 (INTERNALDATE " 2-Jan-2026 10:00:00 +0000" RFC822.SIZE 10 UID 12)',
+            b")",
+        ],
+        uids,
+        sizes,
+        days,
+    )
+    assert list(uids) == [11, 12]
+    assert list(sizes) == [5000, 10]
+    assert [date.fromordinal(d) for d in days] == [date(2026, 1, 1), date(2026, 1, 2)]
+
+
+def test_in_uidset_matches_ranges():
+    uids = np.array([1, 2, 5, 9, 10], dtype=np.uint32)
+    members = in_uidset(uids, UIDSet.from_ranges([(2, 5), (10, 12)]))
+    assert members.tolist() == [False, True, True, False, True]
+    assert in_uidset(uids, UIDSet()).tolist() == [False] * 5
+
+
+def test_select_for_quota_takes_fewest_largest_messages():
+    sizes = np.array([100, 900, 500, 500, 50], dtype=np.uint64)
+    days = np.array([5, 5, 9, 1, 1], dtype=np.uint32)
+    candidates = np.array([True, False, True, True, True])
+
+    assert select_for_quota(sizes, days, candidates, 600).tolist() == [3, 2]
+    assert select_for_quota(sizes, days, candidates, 10_000).tolist() == [3, 2, 0, 4]
+
+
+def test_select_for_quota_selects_nothing_without_a_target():
+    sizes = np.array([100, 900], dtype=np.uint64)
+    days = np.array([5, 5], dtype=np.uint32)
+    candidates = np.array([True, True])
+
+    assert select_for_quota(sizes, days, candidates, 0).tolist() == []
+    assert select_for_quota(sizes, days, candidates, -1).tolist() == []
+
+
+def test_reclaim_quota_deletes_through_cleaner():
+    cleaner = Mock(metrics=RunMetrics(), mailbox="INBOX")
+    cleaner.search_uids.return_value = UIDSet([11, 12])
+    cleaner.uid_next.return_value = 14
+    cleaner.email_connection.uid.return_value = (
+        "OK",
+        [
+            b'1 (UID 11 RFC822.SIZE 3000000 INTERNALDATE "01-Oct-2026 10:00:00 +0000")',
+            b'2 (UID 12 RFC822.SIZE 10 INTERNALDATE "01-Oct-2026 10:00:00 +0000")',
+            b'3 (UID 13 RFC822.SIZE 9000000 INTERNALDATE "01-Jan-2020 10:00:00 +0000")',
+        ],
+    )
+    cleaner.flag_deleted.side_effect = lambda uids: (uids, [])
+
+    report = reclaim_quota(cleaner, 2, ["a@example.com"], today=TODAY)
+
+    assert report["selected"] == report["deleted"] == 1
+    assert report["candidates"] == 2
+    cleaner.flag_deleted.assert_called_once_with(UIDSet([11]))
+    assert cleaner.metrics.bytes_reclaimed == 3000000
+
+    dry = reclaim_quota(cleaner, 10, ["a@example.com"], older_than_days=365, dry_run=True, today=TODAY)
+    assert dry["candidates"] == 3
+    assert dry["selected"] == 2 and dry["deleted"] == 0
+
+
+def test_reclaim_quota_without_target_mail_or_flagged_messages():
+    cleaner = Mock(metrics=RunMetrics(), mailbox="INBOX")
+    cleaner.search_uids.return_value = UIDSet()
+    cleaner.uid_next.return_value = 2
+    cleaner.email_connection.uid.return_value = (
+        "OK",
+        [b'1 (UID 1 RFC822.SIZE 9000000 INTERNALDATE "01-Jan-2020 10:00:00 +0000")'],
+    )
+    cleaner.flag_deleted.return_value = (UIDSet(), ["NO [LIMIT] slow down"])
+
+    assert reclaim_quota(cleaner, 1, ["a@example.com"], today=TODAY)["candidates"] == 0
+    report = reclaim_quota(cleaner, 1, ["a@example.com"], larger_than=1, today=TODAY)
+    assert report["deleted"] == 0 and report["errors"] == ["NO [LIMIT] slow down"]
+    cleaner.safe_expunge.assert_not_called()
@@ -0,0 +1,103 @@
+import gzip
+import time
+
+from src.icloud_mail_cleaner.replay import (
+    ReplayConnection,
+    SessionRecorder,
+    load_recording,
+    redact_address,
+)
+from src.icloud_mail_cleaner.response import RawResponses
+from src.icloud_mail_cleaner.uidset import UIDSet
+from tests.conftest import ScriptedConnection
+
+SENDER = "news@shop.example.com"
+
+
+class SlowConnection(ScriptedConnection):
+    """Takes `delay` seconds to produce each tagged completion."""
+
+    def __init__(self, reply: bytes, delay: float = 0.0):
+        super().__init__(reply)
+        self.welcome = b"* OK ready for alice@icloud.com"
+        self.capabilities = ("IMAP4REV1", "UIDPLUS")
+        self.delay = delay
+
+    def readline(self):
+        line = super().readline()
+        if line.startswith(b"T"):
+            time.sleep(self.delay)
+        return line
+
+
+def record(path, delay=0.0):
+    conn = SlowConnection(
+        b"T1 OK LOGIN completed\r\n"
+        b"* 3 EXISTS\r\n"
+        b"T2 OK [READ-WRITE] SELECT completed\r\n"
+        b"* SEARCH 3 4 9\r\n"
+        b"T3 OK SEARCH completed\r\n"
+        b"* 1 FETCH (UID 3 BODY[HEADER.FIELDS (FROM)] {29}\r\nFrom: news@shop.example.com\r\n)\r\n"
+        b"T4 OK FETCH completed\r\n",
+        delay,
+    )
+    recorder = SessionRecorder(path, secrets=["alice", "hunter2"])
+    recorder.attach(conn)
+    responses = RawResponses(conn)
+    responses.command("LOGIN", "alice", '"hunter2"')
+    responses.command("SELECT", "INBOX")
+    responses.uid_search(f'FROM "{SENDER}"')
+    responses.uid_fetch("3", "(BODY.PEEK[HEADER.FIELDS (FROM)])")
+    recorder.close()
+
+
+def test_recording_is_redacted(tmp_path):
+    path = tmp_path / "session.imap.gz"
+    record(path)
+
+    raw = gzip.decompress(path.read_bytes())
+    assert b"shop.example" not in raw and b"alice" not in raw and b"hunter2" not in raw
+    header, exchanges = load_recording(path)
+    assert header["capabilities"] == ["IMAP4REV1", "UIDPLUS"]
+    assert [e["command"] for e in exchanges] == [
+        "LOGIN <redacted>",
+        "SELECT INBOX",
+        f'UID SEARCH FROM "{redact_address(SENDER)}"',
+        "UID FETCH 3 (BODY.PEEK[HEADER.FIELDS (FROM)])",
+    ]
+    assert len(redact_address(SENDER)) == len(SENDER)
+
+
+def test_replay_serves_imaplib_and_raw_responses(tmp_path):
+    path = tmp_path / "session.imap.gz"
+    record(path)
+    sender = redact_address(SENDER)
+
+    conn = ReplayConnection(path, speed=None)
+    assert conn.login("bob", "other password")[0] == "OK"
+    assert conn.select("INBOX") == ("OK", [b"3"])
+    assert conn.uid("SEARCH", f'FROM "{sender}"') == ("OK", [b"3 4 9"])
+    response = RawResponses(conn).uid_fetch("3", "(BODY.PEEK[HEADER.FIELDS (FROM)])")
+    assert list(response.uids) == [3]
+    assert bytes(next(response.literals())) == f"From: {sender}\r\n".encode()
+    assert conn.uid("SEARCH", "ALL")[0] == "NO"  # never recorded
+    assert conn.logout()[0] == "BYE"
+
+
+def test_replay_timing_can_be_accelerated(tmp_path):
+    path = tmp_path / "session.imap.gz"
+    record(path, delay=0.2)
+    query = f'FROM "{redact_address(SENDER)}"'
+
+    timings = []
+    for speed in (1.0, 10.0):
+        conn = ReplayConnection(path, speed=None)
+        conn.login("bob", "pw")
+        conn.select("INBOX")
+        conn.speed = speed
+        start = time.perf_counter()
+        conn.uid("SEARCH", query)
+        timings.append(time.perf_counter() - start)
+
+    assert timings[0] >= 0.19
+    assert timings[1] < 0.15
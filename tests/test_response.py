@@ -0,0 +1,44 @@
+import imaplib
+
+import pytest
+
+from src.icloud_mail_cleaner.response import RawResponses
+from src.icloud_mail_cleaner.uidset import UIDSet
+from tests.conftest import ScriptedConnection
+
+
+def test_fetch_columns_and_literal_views():
+    header = b"From: a@b\r\nSubject: UID 99\r\n\r\n"
+    conn = ScriptedConnection(
+        b"* 1 FETCH (UID 7 BODY[HEADER.FIELDS (FROM SUBJECT)] {%d}\r\n" % len(header)
+        + header
+        + b" RFC822.SIZE 120)\r\n"
+        b"* 4 EXISTS\r\n"
+        b"* 2 FETCH (RFC822.SIZE 5 UID 8 BODY[HEADER.FIELDS (FROM SUBJECT)] {0}\r\n)\r\n"
+        b"T1 OK FETCH completed\r\n"
+    )
+
+    response = RawResponses(conn).uid_fetch("7:8", "(RFC822.SIZE BODY.PEEK[HEADER])")
+
+    assert conn.sent == b"T1 UID FETCH 7:8 (RFC822.SIZE BODY.PEEK[HEADER])\r\n"
+    assert list(response.uids) == [7, 8]
+    assert list(response.sizes) == [120, 5]
+    first, second = response.literals()
+    assert isinstance(first, memoryview) and first == header
+    assert second.nbytes == 0
+
+
+def test_search_and_esearch_replies():
+    conn = ScriptedConnection(b"* SEARCH 3 4 5 9\r\nT1 OK\r\n")
+    assert RawResponses(conn).uid_search("ALL") == UIDSet([3, 4, 5, 9])
+
+    conn = ScriptedConnection(b'* ESEARCH (TAG "T1") UID ALL 1:500,731\r\nT1 OK\r\n')
+    uids = RawResponses(conn).uid_search('FROM "x"', esearch=True)
+    assert conn.sent == b'T1 UID SEARCH RETURN (ALL) FROM "x"\r\n'
+    assert len(uids) == 501
+
+
+def test_tagged_failure_raises():
+    conn = ScriptedConnection(b"T1 NO [CANNOT] nope\r\n")
+    with pytest.raises(imaplib.IMAP4.error, match="NO"):
+        RawResponses(conn).uid_search("ALL")
@@ -0,0 +1,114 @@
+from datetime import date
+from unittest.mock import Mock
+
+from configobj import ConfigObj
+
+from src.icloud_mail_cleaner.budget import RunBudget
+from src.icloud_mail_cleaner.icloud_mail_cleaner import EmailDeletionError
+from src.icloud_mail_cleaner.metrics import RunMetrics
+from src.icloud_mail_cleaner.rules import apply_rules, load_rules, parse_rule, plan_rules
+from src.icloud_mail_cleaner.uidset import UIDSet
+
+TODAY = date(2026, 10, 19)
+
+
+def test_load_rules_from_config():
+    config = ConfigObj(
+        [
+            "[Rules]",
+            "[[big]]",
+            "from_domain = y.com",
+            "larger_than_mb = 5",
+        ]
+    )
+    (rule,) = load_rules(config)
+    assert rule.name == "big"
+    assert {(p.field, p.value) for p in rule.predicates} == {
+        ("from_domain", "y.com"),
+        ("larger_than", 5 * 1024 * 1024),
+    }
+
+
+def test_single_rule_is_pushed_down_entirely():
+    rule = parse_rule("old", {"from": "x@y.com", "older_than_days": "30"})
+    (plan,) = plan_rules([rule])
+    assert plan.criteria(TODAY) == '(FROM "x@y.com" BEFORE 19-Sep-2026)'
+    assert plan.fetch_fields() == []
+
+
+def test_rules_sharing_an_anchor_share_one_search():
+    old = parse_rule("old", {"from": "x@y.com", "older_than_days": "30"})
+    big = parse_rule("big", {"from": "x@y.com", "larger_than": "1000"})
+    regex = parse_rule("regex", {"subject_regex": "^digest"})
+    plans = plan_rules([old, big, old, regex])
+    assert len(plans) == 2
+    shared, scan = plans
+    assert shared.criteria(TODAY) == '(FROM "x@y.com")'
+    assert shared.fetch_fields() == ["INTERNALDATE", "RFC822.SIZE"]
+    assert scan.criteria(TODAY) == "ALL"
+
+
+def test_apply_rules_checks_locally_and_stores_in_batch():
+    cleaner = Mock(metrics=RunMetrics(), config={})
+    cleaner.uid_next.return_value = 13
+    cleaner.search_uids.return_value = UIDSet([11, 12])
+    cleaner.email_connection.uid.return_value = (
+        "OK",
+        [
+            b'1 (UID 11 RFC822.SIZE 5000 INTERNALDATE "01-Jan-2026 10:00:00 +0000")',
+            b'2 (UID 12 RFC822.SIZE 10 INTERNALDATE "18-Oct-2026 10:00:00 +0000")',
+        ],
+    )
+    old = parse_rule("old", {"from": "x@y.com", "older_than_days": "30"})
+    big = parse_rule("big", {"from": "x@y.com", "larger_than": "1000"})
+
+    results = apply_rules(cleaner, [old, big], today=TODAY)
+
+    assert [(r["rule"], r["matched"]) for r in results] == [("old", 1), ("big", 1)]
+    cleaner.search_uids.assert_called_once_with('(FROM "x@y.com")', "1:12")
+    cleaner.email_connection.uid.assert_called_once_with(
+        "FETCH", "11:12", "(UID INTERNALDATE RFC822.SIZE)"
+    )
+    cleaner.set_deleted.assert_called_once_with("11", silent=True)
+    cleaner.safe_expunge.assert_called_once()
+
+
+def test_apply_rules_reads_items_after_the_literal_and_keeps_store_errors():
+    cleaner = Mock(metrics=RunMetrics(), config={})
+    cleaner.uid_next.return_value = 13
+    cleaner.search_uids.return_value = UIDSet([11, 12])
+    cleaner.email_connection.uid.return_value = (
+        "OK",
+        [
+            (b"1 (UID 11 BODY[HEADER.FIELDS (SUBJECT)] {15}", b"Subject: hi\r\n\r\n"),
+            b" RFC822.SIZE 5000)",
+            (b"2 (UID 12 BODY[HEADER.FIELDS (SUBJECT)] {15}", b"Subject: yo\r\n\r\n"),
+            b" RFC822.SIZE 10)",
+        ],
+    )
+    cleaner.set_deleted.side_effect = EmailDeletionError("NO [LIMIT] slow down")
+    big = parse_rule("big", {"from": "x@y.com", "larger_than": "1000"})
+    greeting = parse_rule("greeting", {"from": "x@y.com", "subject_regex": "^hi$"})
+
+    results = apply_rules(cleaner, [big, greeting], today=TODAY)
+
+    assert [r["matched"] for r in results] == [1, 1]
+    cleaner.set_deleted.assert_called_once_with("11", silent=True)
+    assert [r["errors"] for r in results] == [["NO [LIMIT] slow down"]] * 2
+    cleaner.safe_expunge.assert_not_called()
+
+
+def test_apply_rules_scans_uid_windows_within_the_budget():
+    cleaner = Mock(metrics=RunMetrics(), config={})
+    cleaner.uid_next.return_value = 31
+    cleaner.search_uids.side_effect = [UIDSet([5]), UIDSet([15]), UIDSet([25])]
+    old = parse_rule("old", {"from": "x@y.com", "older_than_days": "30"})
+
+    (result,) = apply_rules(
+        cleaner, [old], today=TODAY, window_size=10, budget=RunBudget(messages=2)
+    )
+
+    assert [c.args[1] for c in cleaner.search_uids.call_args_list] == ["1:10", "11:20"]
+    assert (result["matched"], result["stopped"]) == (2, "messages")
+    cleaner.email_connection.uid.assert_not_called()  # nothing to check locally
+    cleaner.set_deleted.assert_called_once_with("5,15", silent=True)
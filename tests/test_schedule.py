@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+from src.icloud_mail_cleaner.schedule import SenderSchedule, SenderStats
+
+TODAY = date(2026, 10, 19)
+
+
+def result(sender, deleted=0, errors=()):
+    return {"sender": sender, "deleted": deleted, "bytes": 0, "errors": list(errors)}
+
+
+def test_dormant_senders_are_probed_exponentially():
+    stats = SenderStats(checks=5, misses=5, last_checked=(TODAY - timedelta(days=3)).isoformat())
+    assert stats.probe_days == 4
+    assert not stats.due(TODAY)
+    assert stats.due(TODAY + timedelta(days=1))
+    assert SenderStats(misses=40).probe_days == 64
+
+
+def test_plan_orders_by_yield_and_skips_dormant_senders():
+    schedule = SenderSchedule(
+        {
+            "busy@x.com": SenderStats(checks=2, deleted=40, last_checked=TODAY.isoformat()),
+            "rare@x.com": SenderStats(checks=2, deleted=2, last_checked=TODAY.isoformat()),
+            "dead@x.com": SenderStats(checks=9, misses=9, last_checked=TODAY.isoformat()),
+        },
+        last_full_sweep=TODAY.isoformat(),
+    )
+
+    due, full_sweep = schedule.plan(["rare@x.com", "dead@x.com", "Busy@x.com ", "new@x.com"], TODAY)
+
+    assert due == ["new@x.com", "Busy@x.com", "rare@x.com"]
+    assert not full_sweep
+    due, full_sweep = schedule.plan(["dead@x.com"], TODAY + timedelta(days=28))
+    assert due == ["dead@x.com"] and full_sweep
+
+
+def test_record_and_reload(tmp_path):
+    schedule = SenderSchedule()
+    schedule.record(
+        [result("a@x.com", deleted=3), result("b@x.com"), result("c@x.com", errors=["NO"])],
+        full_sweep=True,
+        today=TODAY,
+    )
+    schedule.save(tmp_path / "schedule.json")
+
+    loaded = SenderSchedule.load(tmp_path / "schedule.json")
+    assert loaded.last_full_sweep == TODAY.isoformat()
+    assert loaded.stats["a@x.com"] == SenderStats(1, 1, 3, 0, TODAY.isoformat(), TODAY.isoformat())
+    assert loaded.stats["b@x.com"].misses == 1
+    assert "c@x.com" not in loaded.stats
@@ -0,0 +1,92 @@
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.icloud_mail_cleaner.session_pool import SessionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SessionPool(tmp_path / "config.ini", idle_timeout=60)
+
+    def new_cleaner():
+        cleaner = Mock(is_connected=False)
+        cleaner.connect.side_effect = lambda *args: setattr(cleaner, "is_connected", True)
+        return cleaner
+
+    with patch.object(pool, "_new_cleaner", side_effect=new_cleaner):
+        yield pool
+    pool.close_all()
+
+
+def test_session_is_reused_for_same_user(pool):
+    with pool.session("user", "secret") as first:
+        pass
+    with pool.session("user", "secret") as second:
+        pass
+    assert first is second
+    first.connect.assert_called_once_with("user", "secret", None, None)
+
+
+def test_sessions_are_per_user(pool):
+    with pool.session("alice", "secret") as alice, pool.session("bob", "secret") as bob:
+        assert alice is not bob
+    assert len(pool) == 2
+
+
+def test_idle_sessions_are_evicted(pool):
+    with pool.session("user", "secret") as cleaner:
+        pass
+    with patch("src.icloud_mail_cleaner.session_pool.time.monotonic", return_value=1e12):
+        assert pool.evict_idle() == 1
+    cleaner.close_connection.assert_called_once()
+    assert len(pool) == 0
+
+
+def test_sessions_are_per_port(pool):
+    with pool.session("user", "secret", "imap.example.com", 993) as tls:
+        pass
+    with pool.session("user", "secret", "imap.example.com", 143) as plain:
+        pass
+    assert tls is not plain
+    plain.connect.assert_called_once_with("user", "secret", "imap.example.com", 143)
+
+
+def test_idle_sessions_are_evicted_without_further_use(tmp_path):
+    pool = SessionPool(tmp_path / "config.ini", idle_timeout=0, evict_every=0.01)
+    cleaner = Mock(is_connected=True)
+    with patch.object(pool, "_new_cleaner", return_value=cleaner):
+        with pool.session("user", "secret"):
+            pass
+
+    for _ in range(200):
+        if not len(pool):
+            break
+        time.sleep(0.01)
+    pool.close_all()
+    assert len(pool) == 0
+    cleaner.close_connection.assert_called_once()
+
+
+def test_session_being_claimed_is_not_evicted(pool):
+    with pool.session("user", "secret") as cleaner:
+        pass
+    (pooled,) = pool._sessions.values()
+    lock = pooled.lock
+
+    class EvictFirstLock:
+        # The evictor runs after session() has picked the entry but before it holds the lock
+        def __enter__(self):
+            pooled.last_used = time.monotonic() - 3600
+            assert pool.evict_idle() == 0
+            return lock.__enter__()
+
+        def __exit__(self, *exc):
+            return lock.__exit__(*exc)
+
+    pooled.lock = EvictFirstLock()
+    with pool.session("user", "secret") as again:
+        assert again is cleaner
+    cleaner.close_connection.assert_not_called()
+    assert len(pool) == 1 and pooled.users == 0
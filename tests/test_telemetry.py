@@ -0,0 +1,125 @@
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.icloud_mail_cleaner.metrics import RunMetrics
+from src.icloud_mail_cleaner.telemetry import PostgrestSink, TelemetryWriter
+
+
+class PostgrestStandIn(BaseHTTPRequestHandler):
+    """Upserts and eq./in. deletes on in-memory tables, PostgREST style."""
+
+    def log_message(self, *args):
+        pass
+
+    def _table(self):
+        parsed = urllib.parse.urlparse(self.path)
+        name = parsed.path.rsplit("/", 1)[-1]
+        return self.server.tables.setdefault(name, []), urllib.parse.parse_qs(parsed.query)
+
+    def _fail(self):
+        self.server.requests.append((self.command, self.path))
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return True
+        return False
+
+    def do_POST(self):
+        if self._fail():
+            return
+        rows, query = self._table()
+        keys = query["on_conflict"][0].split(",")
+        for row in json.loads(self.rfile.read(int(self.headers["Content-Length"]))):
+            rows[:] = [r for r in rows if any(r[k] != row[k] for k in keys)] + [row]
+        self.send_response(201)
+        self.end_headers()
+
+    def do_DELETE(self):
+        if self._fail():
+            return
+        rows, query = self._table()
+
+        def matches(row):
+            for column, (condition,) in query.items():
+                op, _, value = condition.partition(".")
+                values = json.loads("[" + value[1:-1] + "]") if op == "in" else [value]
+                if str(row[column]) not in values:
+                    return False
+            return True
+
+        rows[:] = [r for r in rows if not matches(r)]
+        self.send_response(204)
+        self.end_headers()
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PostgrestStandIn)
+    server.tables, server.requests, server.failures = {}, [], 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def writer(server, tmp_path):
+    sink = PostgrestSink(f"http://127.0.0.1:{server.server_port}", "anon-key")
+    return TelemetryWriter(sink, spool_file=tmp_path / "spool.jsonl", flush_seconds=60)
+
+
+def test_run_is_written_as_bulk_upserts(server, writer):
+    metrics = RunMetrics()
+    metrics.record("UID SEARCH", 0.2)
+    results = [
+        {"sender": "a@x.com", "deleted": 3, "bytes": 300, "errors": []},
+        {"sender": "b@x.com", "deleted": 0, "bytes": 0, "errors": ["boom"]},
+    ]
+
+    writer.record_run("user-1", results, metrics)
+    writer.record_run("user-1", results[:1])
+    assert server.requests == []  # nothing sent until a flush
+    assert writer.flush() == 5
+
+    assert [r["emails_deleted"] for r in server.tables["activity_logs"]] == [3, 3]
+    assert len(server.tables["sender_results"]) == 3
+    assert server.tables["command_timings"][0]["command"] == "UID SEARCH"
+
+
+def test_email_list_edits_are_sent_as_deltas(server, writer):
+    writer.sync_email_list("user-1", [], ["a@x.com", "b@x.com", "c@x.com"])
+    writer.flush()
+    writer.sync_email_list("user-1", ["a@x.com", "b@x.com", "c@x.com"], ["b@x.com", "d@x.com"])
+    writer.flush()
+
+    assert sorted(r["email"] for r in server.tables["profile_emails"]) == ["b@x.com", "d@x.com"]
+    posted = [path for method, path in server.requests if method == "POST"]
+    assert len(posted) == 2  # one bulk insert per save, only the new address the second time
+
+
+def test_failed_flush_spools_and_resends_in_order(server, writer, monkeypatch):
+    monkeypatch.setattr(TelemetryWriter._send.retry, "sleep", lambda seconds: None)
+    server.failures = 3  # every retry of the first request fails
+    writer.sync_email_list("user-1", [], ["a@x.com"])
+
+    assert writer.flush() == 0
+    assert writer.spool_file.is_file()
+    assert "profile_emails" not in server.tables
+
+    writer.sync_email_list("user-1", ["a@x.com"], [])
+    assert writer.flush() == 2
+    assert not writer.spool_file.exists()
+    assert server.tables["profile_emails"] == []
+
+
+def test_background_thread_flushes_on_close(server, writer):
+    writer.start()
+    writer.record_run("user-1", [{"sender": "a@x.com", "deleted": 1, "errors": []}])
+    writer.close()
+    assert len(server.tables["activity_logs"]) == 1
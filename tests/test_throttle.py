@@ -0,0 +1,113 @@
+import imaplib
+from unittest.mock import Mock
+
+import pytest
+from tenacity import RetryError, retry, stop_after_attempt
+
+from src.icloud_mail_cleaner.icloud_mail_cleaner import EmailDeletionError
+from src.icloud_mail_cleaner.response import RawResponses
+from src.icloud_mail_cleaner.throttle import AdaptiveLimits, AIMDController, is_throttle
+from src.icloud_mail_cleaner.uidset import UIDSet
+from tests.conftest import ScriptedConnection
+
+
+def test_aimd_grows_additively_and_halves_on_throttle():
+    controller = AIMDController(10, minimum=2, maximum=12, step=1, slow_seconds=1.0)
+    controller.success(0.1)
+    controller.success(0.1)
+    controller.success(0.1)
+    assert controller.value == 12
+    controller.throttled()
+    assert controller.value == 6
+    controller.success(2.5)  # slow reply counts as throttling
+    assert controller.value == 3
+
+
+def test_is_throttle():
+    assert is_throttle(imaplib.IMAP4.error("NO [LIMIT] too many commands"))
+    assert is_throttle(imaplib.IMAP4.abort("socket error: EOF"))
+    assert not is_throttle(imaplib.IMAP4.error("BAD [PARSE] syntax"))
+    assert not is_throttle(imaplib.IMAP4.error("NO [AUTHENTICATIONFAILED] bye for now"))
+
+
+def test_limits_are_remembered_per_account(tmp_path):
+    state = tmp_path / "limits.json"
+    limits = AdaptiveLimits()
+    limits.store_chunk.throttled()
+    limits.save(state, "a@icloud.com")
+    AdaptiveLimits({"pipeline": 99}).save(state, "b@icloud.com")
+
+    assert AdaptiveLimits.load(state, "a@icloud.com").store_chunk.value == 500
+    assert AdaptiveLimits.load(state, "b@icloud.com").pipeline.value == 32
+    assert AdaptiveLimits.load(state, "c@icloud.com").values() == AdaptiveLimits().values()
+
+
+def test_flag_deleted_shrinks_chunks_when_throttled(cleaner):
+    cleaner.limits = AdaptiveLimits({"store_chunk": 200})
+    cleaner.set_deleted = Mock(
+        side_effect=[EmailDeletionError("NO [UNAVAILABLE] slow down"), None, None]
+    )
+
+    flagged, errors = cleaner.flag_deleted(UIDSet.from_ranges([(1, 200)]))
+
+    assert errors == []
+    assert len(flagged) == 200
+    assert [c.args[0] for c in cleaner.set_deleted.call_args_list] == ["1:200", "1:100", "101:200"]
+
+
+def test_flag_deleted_backs_off_on_store_no_reply(cleaner):
+    cleaner.limits = AdaptiveLimits({"store_chunk": 200})
+    conn = cleaner.email_connection
+    conn.uid.side_effect = [
+        ("NO", [b"[LIMIT] slow down"]),
+        ("OK", [None]),
+        ("BAD", [b"[PARSE] bad UID set"]),
+        ("BAD", [b"[PARSE] bad UID set"]),
+        ("BAD", [b"[PARSE] bad UID set"]),
+    ]
+
+    flagged, errors = cleaner.flag_deleted(UIDSet.from_ranges([(1, 200)]))
+
+    assert [c.args[1] for c in conn.uid.call_args_list] == [b"1:200", b"1:100"] + [b"101:200"] * 3
+    assert flagged == UIDSet.from_ranges([(1, 100)])
+    assert len(errors) == 1 and "PARSE" in errors[0]
+
+
+def test_is_throttle_sees_through_retry_error():
+    @retry(stop=stop_after_attempt(1))
+    def store():
+        raise imaplib.IMAP4.error("NO [UNAVAILABLE] try later")
+
+    with pytest.raises(RetryError) as raised:
+        store()
+    assert is_throttle(raised.value)
+
+
+def test_search_many_pipelines_and_keeps_failures_per_query(cleaner):
+    conn = ScriptedConnection(
+        b"* SEARCH 1 2\r\nT1 OK\r\nT2 NO [LIMIT] busy\r\n* SEARCH 7\r\nT3 OK\r\n"
+    )
+    cleaner.responses = RawResponses(conn)
+
+    found = cleaner.search_many(['FROM "a"', 'FROM "b"', 'FROM "c"'])
+
+    assert conn.sent.count(b"UID SEARCH") == 3
+    assert found[0] == UIDSet([1, 2]) and found[2] == UIDSet([7])
+    assert "LIMIT" in str(found[1])
+    assert cleaner.limits.pipeline.value == 2
+
+
+def test_failed_search_batch_only_fails_its_own_senders(cleaner):
+    conn = ScriptedConnection(b"* SEARCH 3\r\nT2 OK\r\n* SEARCH 4\r\nT3 OK\r\n")
+    cleaner.responses = RawResponses(conn)
+    cleaner.limits = AdaptiveLimits({"pipeline": 1})
+    cleaner.username, cleaner.password = "me@icloud.com", "secret"
+    cleaner._connect = Mock(side_effect=lambda: setattr(cleaner, "is_connected", True))
+
+    found = list(cleaner._sender_searches(["café@x.com", "a@x.com", "b@x.com"]))
+
+    assert "café" not in conn.sent.decode()
+    assert conn.sent.count(b"UID SEARCH") == 2
+    assert found[1] == UIDSet([3]) and found[2] == UIDSet([4])
+    assert "Pipelined search failed" in str(found[0])
+    cleaner._connect.assert_called_once()
@@ -0,0 +1,45 @@
+import socket
+import ssl
+from unittest.mock import Mock, patch
+
+from src.icloud_mail_cleaner.metrics import RunMetrics
+from src.icloud_mail_cleaner.tls import (
+    ResumingSSLContext,
+    handshake_seconds,
+    session_reused,
+    shared_ssl_context,
+)
+
+
+def test_shared_context_is_created_once():
+    assert shared_ssl_context() is shared_ssl_context()
+    assert shared_ssl_context().minimum_version >= ssl.TLSVersion.TLSv1_2
+
+
+def test_stored_session_is_offered_on_reconnect():
+    context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    session = Mock(spec=ssl.SSLSession)
+    context.remember_session("imap.mail.me.com", Mock(session=session))
+    wrapped = Mock()
+    with patch.object(ssl.SSLContext, "wrap_socket", return_value=wrapped) as wrap:
+        sock = context.wrap_socket(socket.socket(), server_hostname="imap.mail.me.com")
+        sock.close()
+    assert wrap.call_args.kwargs["session"] is session
+    assert isinstance(wrapped.handshake_seconds, float)
+
+    context.forget_sessions()
+    with patch.object(ssl.SSLContext, "wrap_socket", return_value=Mock()) as wrap:
+        context.wrap_socket(Mock(), server_hostname="imap.mail.me.com")
+    assert wrap.call_args.kwargs["session"] is None
+
+
+def test_unknown_sockets_report_no_handshake():
+    assert handshake_seconds(Mock()) == 0.0
+    assert session_reused(Mock()) is False
+
+
+def test_metrics_record_adds_to_command_totals():
+    metrics = RunMetrics()
+    metrics.record("TLS (full)", 0.25)
+    metrics.record("TLS (full)", 0.25)
+    assert metrics.command_rows() == [{"command": "TLS (full)", "calls": 2, "seconds": 0.5}]
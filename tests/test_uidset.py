@@ -0,0 +1,32 @@
+from src.icloud_mail_cleaner.uidset import UIDSet, uid_windows
+
+
+def test_from_search_builds_ranges():
+    uids = UIDSet.from_search(b"3 4 5 9 10 12")
+    assert uids.to_imap() == "3:5,9:10,12"
+    assert len(uids) == 6
+    assert 4 in uids and 6 not in uids
+
+
+def test_add_merges_out_of_order_ranges():
+    uids = UIDSet([10, 1, 3])
+    uids.add(2)
+    uids.add_range(5, 9)
+    assert uids.to_imap() == "1:3,5:10"
+    assert UIDSet.parse("1:3,5:10") == uids
+
+
+def test_union_and_difference():
+    a = UIDSet.parse("1:10,20:30")
+    b = UIDSet.parse("5:6,25:40")
+    assert (a | b).to_imap() == "1:10,20:40"
+    assert (a - b).to_imap() == "1:4,7:10,20:24"
+
+
+def test_chunks_bound_uid_count():
+    chunks = [c.to_imap() for c in UIDSet.parse("1:5,8:9").chunks(3)]
+    assert chunks == ["1:3", "4:5,8", "9"]
+
+
+def test_uid_windows():
+    assert list(uid_windows(11, 5)) == ["1:5", "6:10"]
@@ -0,0 +1,122 @@
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import Mock
+
+import pytest
+
+from src.icloud_mail_cleaner.workqueue import (
+    QueueServer,
+    RemoteQueue,
+    WorkQueue,
+    plan_shards,
+    run_worker,
+)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite", max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_plan_shards_by_sender_group_folder_and_uid_range():
+    shards = plan_shards(
+        ["a@x", "b@x", "c@x", "a@x"], ["INBOX", "Archive"], 2, {"Archive": [(1, 10), (11, 20)]}
+    )
+    assert [(s["folder"], s["senders"], s["uid_range"]) for s in shards] == [
+        ("INBOX", ["a@x", "b@x"], None),
+        ("INBOX", ["c@x"], None),
+        ("Archive", ["a@x", "b@x"], (1, 10)),
+        ("Archive", ["a@x", "b@x"], (11, 20)),
+        ("Archive", ["c@x"], (1, 10)),
+        ("Archive", ["c@x"], (11, 20)),
+    ]
+
+
+def test_expired_lease_is_retried_then_failed(queue):
+    queue.add_shards("job", [{"folder": "INBOX", "senders": ["a@x"]}])
+
+    first = queue.lease("job", "w1", lease_seconds=-1)  # crashes: lease already expired
+    second = queue.lease("job", "w2", lease_seconds=60)
+    assert first["id"] == second["id"] and second["attempts"] == 2
+    assert queue.lease("job", "w3") is None
+    assert not queue.complete(first["id"], "w1", {"deleted": 1})  # stale worker is refused
+    assert queue.fail(second["id"], "w2", "boom")
+
+    summary = queue.summary("job")
+    assert summary["states"] == {"failed": 1}
+    assert summary["failed"] == {first["id"]: "boom"}
+
+
+def test_run_worker_cleans_every_shard(queue):
+    queue.add_shards(
+        "job",
+        [
+            {"folder": "INBOX", "senders": ["a@x"], "uid_range": None},
+            {"folder": "Archive", "senders": ["b@x"], "uid_range": [1, 500]},
+        ],
+    )
+    cleaner = Mock(mailbox="INBOX", remaining=None)
+    cleaner.clean_mailbox.side_effect = lambda senders, **kwargs: [
+        {"sender": s, "deleted": 2, "bytes": 0, "errors": []} for s in senders
+    ]
+
+    assert run_worker(queue, cleaner, "job", worker="w1") == 2
+
+    cleaner.select_mailbox.assert_called_once_with("Archive")
+    assert cleaner.clean_mailbox.call_args_list[1].kwargs["uid_range"] == (1, 500)
+    assert queue.summary("job")["deleted"] == 4
+
+
+def test_shard_cut_short_is_given_back(queue):
+    queue.add_shards("job", [{"folder": "INBOX", "senders": ["a@x", "b@x"]}])
+    cleaner = Mock(mailbox="INBOX", remaining=None)
+
+    def clean_mailbox(senders, **kwargs):
+        assert kwargs["budget"].exhausted(Mock(commands={}), 0) is None  # no config budget
+        cleaner.remaining = {"reason": "seconds", "senders": ["b@x"]}
+        return [{"sender": "a@x", "deleted": 1, "bytes": 0, "errors": []}]
+
+    cleaner.clean_mailbox.side_effect = clean_mailbox
+
+    assert run_worker(queue, cleaner, "job", worker="w1") == 0
+    summary = queue.summary("job")  # retried, then failed: never completed half done
+    assert summary["states"] == {"failed": 1}
+    assert "1 senders left" in next(iter(summary["failed"].values()))
+    assert cleaner.clean_mailbox.call_count == 2
+
+
+def test_remote_queue_over_http(queue):
+    server = QueueServer(queue, port=0, token="secret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        remote = RemoteQueue(url, token="secret")
+        queue.add_shards("job", [{"folder": "INBOX", "senders": ["a@x"]}])
+
+        shard = remote.lease("job", "remote-1", 60)
+        assert shard["payload"]["senders"] == ["a@x"]
+        assert remote.renew(shard["id"], "remote-1", 60)
+        assert remote.complete(shard["id"], "remote-1", {"deleted": 3})
+        assert remote.summary("job")["deleted"] == 3
+        with pytest.raises(Exception, match="401"):
+            RemoteQueue(url).lease("job", "intruder")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_malformed_request_body_is_a_bad_request(queue):
+    server = QueueServer(queue, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/lease"
+        for body in (b"{not json", b"[1, 2]"):
+            with pytest.raises(urllib.error.HTTPError) as raised:
+                urllib.request.urlopen(urllib.request.Request(url, data=body), timeout=5)
+            assert raised.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()